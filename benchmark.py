@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks of per-request learning model operations
+"""
+import os
+import sys
+import timeit
+
+from django.conf import settings
+import django
+
+DEFAULT_SETTINGS = dict(
+    INSTALLED_APPS=(
+        'django.contrib.contenttypes',
+        'django_learnit',
+    ),
+    DATABASES={
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3'
+        }
+    },
+)
+
+
+def report(name, number, *timings):
+    """
+    Prints the time per call of each (label, seconds) timing
+    """
+    sys.stdout.write('%s\n' % name)
+
+    for label, seconds in timings:
+        sys.stdout.write('  %-24s %8.2fus\n' % (label, seconds * 1e6 / number))
+
+
+def benchmark_classes_metadata(number=10000):
+    """
+    Class metadata calls of a NER labelling request, compiled on every
+    call versus memoized on the learning model instance
+    """
+    from django_learnit.learning.ner import NamedEntityRecognizerModel
+
+    class BenchmarkModel(NamedEntityRecognizerModel):
+        name = 'benchmark'
+        classes = tuple(('CLASS%d' % i, 'Class %d' % i) for i in range(8))
+
+    model = BenchmarkModel()
+
+    def request(get_metadata):
+        metadata = get_metadata()
+        metadata.classes
+        metadata.classes_with_colors
+        metadata.hash
+        get_metadata().classes
+
+    report(
+        'classes metadata per request',
+        number,
+        ('compiled', timeit.timeit(
+            lambda: request(model.build_classes_metadata), number=number)),
+        ('memoized', timeit.timeit(
+            lambda: request(model.get_classes_metadata), number=number)))
+
+
+def benchmark_label_validation(number=10000):
+    """
+    Label validation with a linear scan of the choices versus
+    a lookup in the classes metadata
+    """
+    from django import forms
+    from django_learnit.forms.classifier import ClassChoiceField
+    from django_learnit.learning.classifier import ClassesMetadata
+
+    classes = tuple(('CLASS%d' % i, 'Class %d' % i) for i in range(50))
+
+    choice_field = forms.ChoiceField(choices=classes)
+    class_field = ClassChoiceField(choices=classes)
+    class_field.classes_metadata = ClassesMetadata(classes)
+
+    report(
+        'label validation',
+        number,
+        ('choices scan', timeit.timeit(
+            lambda: choice_field.valid_value('CLASS49'), number=number)),
+        ('classes metadata', timeit.timeit(
+            lambda: class_field.valid_value('CLASS49'), number=number)))
+
+
+def benchmark_ner_formset_validation(number=100, n_tokens=500):
+    """
+    Validation of a NER labelling submission, cleaning a form per token
+    versus the single pass over the submitted labels
+    """
+    from functools import (
+        partial,
+        wraps)
+    from django.forms import formset_factory
+    from django_learnit.forms.ner import (
+        NamedEntityRecognizerForm,
+        NamedEntityRecognizerFormSet)
+    from django_learnit.learning.classifier import ClassesMetadata
+
+    classes = tuple(('CLASS%d' % i, 'Class %d' % i) for i in range(8))
+    classes_metadata = ClassesMetadata(classes)
+
+    data = {
+        'form-TOTAL_FORMS': str(n_tokens),
+        'form-INITIAL_FORMS': str(n_tokens)
+    }
+
+    for i in range(n_tokens):
+        data['form-%d-label' % i] = 'CLASS%d' % (i % 8)
+
+    formset_class = formset_factory(
+        wraps(NamedEntityRecognizerForm)(partial(
+            NamedEntityRecognizerForm,
+            classes=classes,
+            classes_metadata=classes_metadata)),
+        formset=NamedEntityRecognizerFormSet,
+        extra=0)
+
+    def per_form():
+        formset = formset_class(data, n_tokens=n_tokens)
+        assert formset.is_valid()
+
+    def single_pass():
+        formset = formset_class(
+            data, n_tokens=n_tokens, classes_metadata=classes_metadata)
+        assert formset.is_valid()
+
+    report(
+        'NER formset validation (%d tokens)' % n_tokens,
+        number,
+        ('per form', timeit.timeit(per_form, number=number)),
+        ('single pass', timeit.timeit(single_pass, number=number)))
+
+
+def benchmark():
+    if not settings.configured:
+        settings.configure(**DEFAULT_SETTINGS)
+
+    if hasattr(django, 'setup'):
+        django.setup()
+
+    parent = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, parent)
+
+    benchmark_classes_metadata()
+    benchmark_label_validation()
+    benchmark_ner_formset_validation()
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import LabelledDocument
+from .models import (
+    LabelledDocument,
+    LabelRevision)
 
 
 admin.site.register(LabelledDocument)
+admin.site.register(LabelRevision)
@@ -1,8 +1,10 @@
 from django.apps import AppConfig
 
 from .library import (
-    get_installed_libraries,
-    get_registered_learning_models)
+    LearningModelRegistry,
+    get_libraries,
+    get_registered_learning_models,
+    log_library_import_times)
 
 
 class LearnItConfig(AppConfig):
@@ -13,12 +15,15 @@ class LearnItConfig(AppConfig):
         Initialize an empty learning models reference
         """
         super(LearnItConfig, self).__init__(*args, **kwargs)
-        self.learning_models = {}
+        self.learning_models = LearningModelRegistry()
 
     def ready(self):
         """
-        Autodiscover `learnit` modules when django app is ready
-        and register learning models libraries
+        Register learning models libraries when django app is ready,
+        autodiscovering `learning_models` modules unless libraries are
+        set in settings or in a manifest
         """
-        libraries = get_installed_libraries()
+        libraries = get_libraries()
         self.learning_models = get_registered_learning_models(libraries)
+
+        log_library_import_times()
@@ -0,0 +1,131 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.encoding import force_bytes
+
+
+class DocumentCache(object):
+    """
+    Two levels cache of documents and their tokens.
+
+    Entries are kept for the lifetime of the instance, usually a request,
+    and in the `LEARNIT_DOCUMENT_CACHE` cache backend, `default` when not
+    set, across requests when a timeout is given. Entries are keyed by
+    document content type, primary key and version, the value of a
+    version field of the document such as its modification date, so that
+    a modified document is never served from the cache. Without version
+    field, cached entries only expire with the timeout.
+    """
+
+    def __init__(self, cache_alias=None):
+        self.cache_alias = cache_alias or getattr(
+            settings, 'LEARNIT_DOCUMENT_CACHE', 'default')
+
+        self.local = {}
+        self.versions = {}
+
+    def get_cache(self):
+        """
+        Returns the cross-request cache backend
+        """
+        return caches[self.cache_alias]
+
+    def make_key(self, content_type, pk, version, *parts):
+        """
+        Returns the cache key of the document entry
+        """
+        key = ':'.join(str(part) for part in (content_type.pk, pk, version) + parts)
+
+        return 'django_learnit:document:%(hash)s' % {
+            'hash': hashlib.md5(force_bytes(key)).hexdigest()
+        }
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Returns the entry of the key, computing and storing it
+        with `compute()` when missing
+        """
+        if key in self.local:
+            return self.local[key]
+
+        value = None
+
+        if timeout:
+            value = self.get_cache().get(key)
+
+        if value is None:
+            value = compute()
+
+            if timeout:
+                self.get_cache().set(key, value, timeout)
+
+        self.local[key] = value
+        return value
+
+    def get_document(self, queryset, pk, version_field=None, timeout=None):
+        """
+        Returns the queryset document of the primary key.
+        Raises `DoesNotExist` when not part of the queryset.
+
+        The document membership and version are checked with a narrow
+        query on the primary key, the full row is read from the cache.
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        model = queryset.model
+        content_type = ContentType.objects.get_for_model(model)
+
+        rows = queryset.filter(pk=pk).values_list(version_field or 'pk')[:1]
+
+        if not rows:
+            raise model.DoesNotExist(
+                "%(model)s matching query does not exist." % {
+                    'model': model._meta.object_name
+                })
+
+        version = rows[0][0] if version_field else None
+        self.versions[(content_type.pk, str(pk))] = version
+
+        return self.get_or_set(
+            self.make_key(content_type, pk, version),
+            lambda: queryset.get(pk=pk),
+            timeout=timeout)
+
+    def get_tokens(self, learning_model, document, compute, timeout=None):
+        """
+        Returns the tokens of the document for the learning model,
+        computing them with `compute()` when missing. Tokens are shared
+        by the learning models having the same tokenizer key. Tokens of
+        objects other than model instances are not cached.
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        if not hasattr(document, '_meta'):
+            return compute()
+
+        content_type = ContentType.objects.get_for_model(document)
+        version = self.versions.get((content_type.pk, str(document.pk)))
+
+        return self.get_or_set(
+            self.make_key(
+                content_type, document.pk, version, 'tokens',
+                learning_model.get_tokenizer_key()),
+            compute,
+            timeout=timeout)
+
+
+def get_request_document_cache(request):
+    """
+    Returns the document cache shared by the views of the request,
+    or a new document cache without request
+    """
+    if request is None:
+        return DocumentCache()
+
+    document_cache = getattr(request, '_learnit_document_cache', None)
+
+    if document_cache is None:
+        document_cache = request._learnit_document_cache = DocumentCache()
+
+    return document_cache
@@ -0,0 +1,99 @@
+import os
+import threading
+
+try:
+    import asyncio
+    from inspect import isawaitable
+except ImportError:  # Python < 3.5
+    asyncio = None
+
+    def isawaitable(value):
+        return False
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+# Event loop of each thread resolving awaitables
+_event_loops = threading.local()
+
+
+def get_event_loop():
+    """
+    Returns the event loop of the current thread, created on first use
+    and kept open for the next awaitables. Forked processes create their
+    own event loop.
+    """
+    loop = getattr(_event_loops, 'loop', None)
+
+    if loop is None or loop.is_closed() or _event_loops.pid != os.getpid():
+        loop = _event_loops.loop = asyncio.new_event_loop()
+        _event_loops.pid = os.getpid()
+
+    return loop
+
+
+def resolve_awaitable(value):
+    """
+    Runs an awaitable value to completion in the event loop of the current
+    thread and returns its result. Other values are returned as is.
+
+    The calling thread is blocked until the awaitable completes: the
+    synchronous views of this package do not serve other requests
+    meanwhile.
+    """
+    if not isawaitable(value):
+        return value
+
+    return get_event_loop().run_until_complete(value)
+
+
+def uses_server_side_cursors(using):
+    """
+    Returns whether `QuerySet.iterator()` streams rows with a server-side
+    cursor on the database, i.e. PostgreSQL with Django 1.11+
+    """
+    from django.db import connections
+
+    connection = connections[using]
+
+    return (
+        connection.vendor == 'postgresql' and
+        hasattr(connection, 'chunked_cursor') and
+        not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'))
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def get_fork_context():
+    """
+    Returns the multiprocessing module or context starting processes
+    by forking, or None when forking is unavailable on the platform
+    """
+    import multiprocessing
+
+    get_context = getattr(multiprocessing, 'get_context', None)
+
+    if get_context is None:  # Python 2
+        return multiprocessing if hasattr(os, 'fork') else None
+
+    try:
+        return get_context('fork')
+    except ValueError:
+        return None
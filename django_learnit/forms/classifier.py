@@ -1,16 +1,42 @@
 from django import forms
+from django.utils.encoding import force_text
+
+
+class ClassesMetadataFieldMixin(object):
+    """
+    Validates choices in constant time against the `ClassesMetadata`
+    of the learning model when set
+    """
+    classes_metadata = None
+
+    def valid_value(self, value):
+        if self.classes_metadata is not None:
+            return force_text(value) in self.classes_metadata.text_label_index
+
+        return super(ClassesMetadataFieldMixin, self).valid_value(value)
+
+
+class ClassChoiceField(ClassesMetadataFieldMixin, forms.ChoiceField):
+    pass
+
+
+class MultipleClassChoiceField(ClassesMetadataFieldMixin, forms.MultipleChoiceField):
+    pass
 
 
 class ClassifierChoicesMixin(object):
 
     def __init__(self, classes, *args, **kwargs):
+        classes_metadata = kwargs.pop('classes_metadata', None)
+
         super(ClassifierChoicesMixin, self).__init__(*args, **kwargs)
         self.fields['label'].choices = classes
+        self.fields['label'].classes_metadata = classes_metadata
 
 
 class SingleLabelClassifierForm(ClassifierChoicesMixin, forms.Form):
-    label = forms.ChoiceField(widget=forms.RadioSelect())
+    label = ClassChoiceField(widget=forms.RadioSelect())
 
 
 class MultiLabelClassifierForm(ClassifierChoicesMixin, forms.Form):
-    label = forms.MultipleChoiceField(widget=forms.CheckboxSelectMultiple())
+    label = MultipleClassChoiceField(widget=forms.CheckboxSelectMultiple())
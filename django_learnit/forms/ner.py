@@ -1,7 +1,97 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.formsets import (
+    DEFAULT_MAX_NUM,
+    BaseFormSet)
+from django.forms.utils import ErrorDict
+from django.utils.encoding import force_text
+from django.utils.translation import ungettext
 
-from .classifier import ClassifierChoicesMixin
+from .classifier import (
+    ClassChoiceField,
+    ClassifierChoicesMixin)
 
 
 class NamedEntityRecognizerForm(ClassifierChoicesMixin, forms.Form):
-    label = forms.ChoiceField(widget=forms.Select())
+    label = ClassChoiceField(widget=forms.Select())
+
+
+class NamedEntityRecognizerFormSet(BaseFormSet):
+    """
+    Formset of one `NamedEntityRecognizerForm` per document token.
+
+    The number of tokens is given per instance so that the formset class
+    can be reused across documents. When the `ClassesMetadata` is given,
+    submitted labels are validated in a single pass over the data against
+    the metadata text labels, without instantiating and cleaning a form
+    per token. Forms are still built lazily for rendering.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.n_tokens = kwargs.pop('n_tokens', None)
+        self.classes_metadata = kwargs.pop('classes_metadata', None)
+
+        super(NamedEntityRecognizerFormSet, self).__init__(*args, **kwargs)
+
+        if self.n_tokens is not None:
+            self.min_num = self.max_num = self.n_tokens
+            self.absolute_max = self.n_tokens + DEFAULT_MAX_NUM
+
+        self._cleaned_data = None
+
+    @property
+    def cleaned_data(self):
+        if self.classes_metadata is None:
+            return super(NamedEntityRecognizerFormSet, self).cleaned_data
+
+        self.errors
+        return self._cleaned_data
+
+    def is_valid(self):
+        if self.classes_metadata is None:
+            return super(NamedEntityRecognizerFormSet, self).is_valid()
+
+        return self.is_bound and not any(self.errors) and not self.non_form_errors()
+
+    def full_clean(self):
+        if self.classes_metadata is None:
+            return super(NamedEntityRecognizerFormSet, self).full_clean()
+
+        self._errors = []
+        self._non_form_errors = self.error_class()
+        self._cleaned_data = []
+
+        if not self.is_bound:
+            return
+
+        text_label_index = self.classes_metadata.text_label_index
+        error_messages = ClassChoiceField().error_messages
+        total_form_count = self.total_form_count()
+
+        for i in range(total_form_count):
+            value = self.data.get('%s-label' % self.add_prefix(i))
+            errors = ErrorDict()
+
+            if value in (None, ''):
+                errors['label'] = self.error_class([error_messages['required']])
+            else:
+                value = force_text(value)
+
+                if value in text_label_index:
+                    self._cleaned_data.append({'label': value})
+                else:
+                    errors['label'] = self.error_class([
+                        error_messages['invalid_choice'] % {'value': value}])
+
+            self._errors.append(errors)
+
+        try:
+            if self.n_tokens is not None and total_form_count != self.n_tokens:
+                raise ValidationError(ungettext(
+                    "Please submit %d label.",
+                    "Please submit %d labels.", self.n_tokens) % self.n_tokens,
+                    code='invalid_labels_count')
+
+            self.clean()
+        except ValidationError as e:
+            self._non_form_errors = self.error_class(e.error_list)
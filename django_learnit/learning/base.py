@@ -1,5 +1,39 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..compat import (
+    resolve_awaitable,
+    uses_server_side_cursors)
 from ..exceptions import ImproperlyConfigured
 
+from .evaluation import EvaluationMixin
+from .features import FeatureStoreMixin
+from .index import IndexedSamplingMixin
+from .pool import CachedPoolMixin
+from .profiling import StageMetrics
+from .reservation import DocumentReservationMixin
+from .sampling import (
+    INDEXED_SAMPLING,
+    POOLED_SAMPLING,
+    RANDOM_SAMPLING,
+    SHUFFLED_SAMPLING,
+    STRATIFIED_SAMPLING,
+    ShuffledSamplingMixin,
+    StratifiedSamplingMixin)
+from .sharding import ShardedPoolMixin
+
+
+logger = logging.getLogger(__name__)
+
 
 class LearningModelBuilderMixin(object):
     """
@@ -7,7 +41,23 @@ class LearningModelBuilderMixin(object):
 
     Feature extraction, model definition and all machine learning related stuff
     is up to the developer. We don't assume anything here, leaving it extendable.
+
+    Builds are scheduled by the `learnit_schedule_builds` command when
+    `rebuild_label_delta` labels were written or `rebuild_interval`
+    seconds elapsed since the last succeeded build.
+
+    Build and prediction stages are measured with the `stage()` context
+    manager, and stored with the build run when built by `run_build()`.
     """
+    rebuild_label_delta = None
+    rebuild_interval = None
+
+    # Seconds after which a running build is considered dead
+    build_timeout = 24 * 60 * 60
+
+    # Directory of the cProfile captures of the stages, profiling disabled
+    # when neither set nor the `LEARNIT_PROFILE_DIR` setting
+    profile_dir = None
 
     def load_model(self):
         """
@@ -31,13 +81,186 @@ class LearningModelBuilderMixin(object):
         """
         Builds and saves the model
         """
+        with self.stage('loading') as metrics:
+            labelled_documents = self.get_labelled_documents_queryset()
+
+            # Evaluated here, so that fitting is measured without the query
+            metrics.rows = len(labelled_documents)
+
+        with self.stage('fitting'):
+            self.model = self.build_model(labelled_documents)
+
+        with self.stage('saving'):
+            self.save_model()
+
+    def get_profile_dir(self):
+        """
+        Returns the directory of the stages cProfile captures,
+        or None when profiling is disabled
+        """
+        return self.profile_dir or getattr(settings, 'LEARNIT_PROFILE_DIR', None)
+
+    def get_stage_state(self):
+        """
+        Returns the thread local stages state of the learning model, so that
+        the stages of concurrent builds and predictions are not mixed
+        """
+        return self.__dict__.setdefault('_stage_state', threading.local())
+
+    def stage_finished(self, metrics):
+        """
+        Called with the `StageMetrics` of each finished stage
+        """
+        logger.debug(
+            "%(name)s: %(stage)s stage took %(wall_time).3fs", {
+                'name': self.get_name(),
+                'stage': metrics.name,
+                'wall_time': metrics.wall_time
+            })
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measures the wall time, CPU time and peak RSS of the enclosed
+        build or prediction stage, yielding its `StageMetrics` whose
+        `rows` may be set by the stage.
+
+        Outermost stages are captured with cProfile to the profile
+        directory when set.
+        """
+        state = self.get_stage_state()
+        depth = getattr(state, 'depth', 0)
+        metrics = StageMetrics(name, depth=depth, rows=rows)
+
+        recorded_stages = getattr(state, 'recorded_stages', None)
+        if recorded_stages is not None:
+            recorded_stages.append(metrics)
+
+        profile_dir = self.get_profile_dir() if depth == 0 else None
+        profiler = cProfile.Profile() if profile_dir else None
+
+        state.depth = depth + 1
+        metrics.start()
+
+        if profiler:
+            profiler.enable()
+
+        try:
+            yield metrics
+        finally:
+            if profiler:
+                profiler.disable()
+
+            metrics.stop()
+            state.depth = depth
+
+            if profiler:
+                if not os.path.isdir(profile_dir):
+                    os.makedirs(profile_dir)
+
+                metrics.profile_path = os.path.join(
+                    profile_dir, '%(name)s-%(stage)s-%(timestamp)s.prof' % {
+                        'name': self.get_name(),
+                        'stage': name,
+                        'timestamp': timezone.now().strftime('%Y%m%d%H%M%S%f')
+                    })
+                profiler.dump_stats(metrics.profile_path)
+
+            self.stage_finished(metrics)
+
+    def should_rebuild(self):
+        """
+        Returns whether a rebuild threshold is reached
+        and the learning model is not being built
+        """
+        from ..models import BuildRun
+
+        if self.rebuild_label_delta is None and self.rebuild_interval is None:
+            return False
+
+        now = timezone.now()
+        model_name = self.get_name()
+
+        if BuildRun.objects.is_running(
+                model_name, now - timedelta(seconds=self.build_timeout)):
+            return False
+
+        last_build_run = BuildRun.objects.get_last_succeeded(model_name)
         labelled_documents = self.get_labelled_documents_queryset()
 
-        self.model = self.build_model(labelled_documents)
-        self.save_model()
+        if last_build_run is None:
+            return labelled_documents.exists()
+
+        if self.rebuild_interval is not None and \
+                now - last_build_run.started >= timedelta(seconds=self.rebuild_interval):
+            return True
+
+        if self.rebuild_label_delta is not None:
+            changed = labelled_documents\
+                .filter(modified__gte=last_build_run.started)[:self.rebuild_label_delta]
+
+            return changed.count() >= self.rebuild_label_delta
+
+        return False
+
+    def record_run(self, kind, run, labels=0):
+        """
+        Calls `run` with a `BuildRun` of the `kind`, recording its status
+        and stages, and returns the `BuildRun` once finished
+        """
+        from ..models import (
+            BuildRun,
+            BuildStage)
+
+        build_run = BuildRun.objects.create(
+            model_name=self.get_name(),
+            kind=kind,
+            labels=labels)
+
+        state = self.get_stage_state()
+        state.recorded_stages = []
+
+        try:
+            run(build_run)
+        except Exception:
+            build_run.status = BuildRun.FAILED
+            build_run.error = traceback.format_exc()
+        else:
+            build_run.status = BuildRun.SUCCEEDED
+        finally:
+            recorded_stages = state.recorded_stages
+            del state.recorded_stages
+
+        build_run.finished = timezone.now()
+        build_run.save()
+
+        BuildStage.objects.create_for_build_run(build_run, recorded_stages)
+
+        return build_run
 
+    def run_build(self):
+        """
+        Builds and evaluates the model, recording the build, its stages
+        and its scores in a `BuildRun` returned once finished
+        """
+        from ..models import BuildRun
+
+        def run(build_run):
+            self.build()
+
+            if self.evaluation_folds:
+                with self.stage('evaluation'):
+                    self.evaluate(build_run=build_run)
+
+        return self.record_run(
+            BuildRun.BUILD, run, labels=self.get_labelled_documents_queryset().count())
 
-class LearningModel(LearningModelBuilderMixin):
+
+class LearningModel(ShuffledSamplingMixin, StratifiedSamplingMixin,
+                    CachedPoolMixin, IndexedSamplingMixin,
+                    ShardedPoolMixin, DocumentReservationMixin,
+                    FeatureStoreMixin, EvaluationMixin,
+                    LearningModelBuilderMixin):
     """
     Base learning model identified by a name
     and holding a document queryset
@@ -47,6 +270,23 @@ class LearningModel(LearningModelBuilderMixin):
     verbose_name = ''
     description = ''
 
+    # Number of next documents buffered per annotator session
+    prefetch_size = 0
+
+    # Heavy document fields only loaded by `iter_documents` when requested
+    defer_fields = ()
+
+    # Whether labelling forms are initialized with stored predictions
+    prelabelling = False
+
+    # Seconds documents and tokens are cached across requests, None to
+    # only cache them for the request
+    document_cache_timeout = None
+
+    # Document field changing with the document, e.g. a modification
+    # date, versioning the cached documents and tokens
+    document_version_field = None
+
     @classmethod
     def get_name(cls):
         """
@@ -106,16 +346,201 @@ class LearningModel(LearningModelBuilderMixin):
 
         return queryset.exclude(pk__in=labelled_ids)
 
-    def get_random_unlabelled_document(self):
+    def iter_documents(self, batch_size=1000, only=None, queryset=None):
+        """
+        Iterates over the documents, or the given queryset, in primary key
+        order without loading them all in memory.
+
+        Only the `only` fields are loaded when given, otherwise the
+        `defer_fields` are deferred. Rows are streamed with a server-side
+        cursor when the database supports it, otherwise fetched in keyset
+        batches of `batch_size` documents.
+        """
+        if queryset is None:
+            queryset = self.get_queryset()
+
+        if only is not None:
+            queryset = queryset.only(*only)
+        elif self.defer_fields:
+            queryset = queryset.defer(*self.defer_fields)
+
+        queryset = queryset.order_by('pk')
+
+        if uses_server_side_cursors(queryset.db):
+            for document in queryset.iterator():
+                yield document
+            return
+
+        last_pk = None
+
+        while True:
+            batch = queryset
+
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+
+            documents = list(batch[:batch_size])
+
+            if not documents:
+                break
+
+            for document in documents:
+                yield document
+
+            if len(documents) < batch_size:
+                break
+
+            last_pk = documents[-1].pk
+
+    def iter_label_values(self, batch_size=1000):
         """
-        Returns a random unlabelled document
+        Yields (document id, deserialized value) of the labelled documents
+        of the queryset ordered by document id, fetched in keyset batches
+        of `batch_size` values
         """
+        values = self.get_labelled_documents_queryset()\
+            .filter(document_id__in=self.get_queryset().values('pk'))\
+            .order_by('document_id')\
+            .values_list('document_id', 'value')
+
+        last_document_id = None
+
+        while True:
+            batch = values
+
+            if last_document_id is not None:
+                batch = batch.filter(document_id__gt=last_document_id)
+
+            rows = list(batch[:batch_size])
+
+            for document_id, value in rows:
+                try:
+                    yield document_id, json.loads(value)
+                except ValueError:
+                    yield document_id, {}
+
+            if len(rows) < batch_size:
+                break
+
+            last_document_id = rows[-1][0]
+
+    def get_random_unlabelled_document(self, annotator=None):
+        """
+        Returns a random unlabelled document, in the shard
+        of the annotator first when sharded
+        """
+        queryset = self.exclude_leased_documents(
+            self.get_unlabelled_documents_queryset(), annotator)
+
         # Return a random unlabelled document or None
-        try:
-            return self.get_unlabelled_documents_queryset()\
-                .order_by('?')[0]
-        except IndexError:
-            return None
+        documents = self.get_random_pool_documents(queryset, 1, annotator)
+
+        return documents[0] if documents else None
+
+    def pick_unlabelled_document(self, annotator=None):
+        """
+        Returns an unlabelled document for the annotator
+        depending on the `sampling` mode
+        """
+        if self.sampling == SHUFFLED_SAMPLING and annotator is not None:
+            return self.get_shuffled_unlabelled_document(annotator)
+        elif self.sampling == STRATIFIED_SAMPLING:
+            return self.get_stratified_unlabelled_document(annotator)
+        elif self.sampling == POOLED_SAMPLING:
+            return self.get_pooled_unlabelled_document(annotator)
+        elif self.sampling == INDEXED_SAMPLING:
+            return self.get_indexed_unlabelled_document(annotator)
+
+        return self.get_random_unlabelled_document(annotator)
+
+    def get_next_unlabelled_document(self, annotator=None):
+        """
+        Returns the next unlabelled document to label for the annotator,
+        leased to the annotator when `lease_duration` is set
+        """
+        if self.lease_duration and annotator is not None:
+            return self.get_leased_unlabelled_document(annotator)
+
+        return self.pick_unlabelled_document(annotator)
+
+    def get_next_unlabelled_document_id(self, annotator=None):
+        """
+        Returns the ID of the next unlabelled document to label for the
+        annotator, served from the pool without querying the documents
+        when using pooled sampling without leases
+        """
+        if self.sampling == POOLED_SAMPLING and not (self.lease_duration and annotator is not None):
+            return self.get_pooled_unlabelled_document_id(annotator)
+
+        document = self.get_next_unlabelled_document(annotator)
+
+        return document.pk if document is not None else None
+
+    def get_next_unlabelled_documents(self, annotator=None, count=1):
+        """
+        Returns up to `count` distinct next unlabelled documents
+        to label for the annotator
+        """
+        uses_leases = self.lease_duration and annotator is not None
+
+        # Random documents are picked at once
+        if self.sampling == RANDOM_SAMPLING:
+            queryset = self.exclude_leased_documents(
+                self.get_unlabelled_documents_queryset(), annotator)
+            documents = self.get_random_pool_documents(queryset, count, annotator)
+
+            if uses_leases:
+                documents = [
+                    document for document in documents
+                    if self.acquire_lease(document, annotator)
+                ]
+
+            return documents
+
+        documents = []
+
+        for i in range(count):
+            document = self.get_next_unlabelled_document(annotator)
+
+            if document is None or document in documents:
+                break
+
+            documents.append(document)
+
+        return documents
+
+    def sync_sampling(self):
+        """
+        Synchronizes the stored sampling data of the `sampling` mode
+        """
+        if self.sampling == SHUFFLED_SAMPLING:
+            self.sync_sort_keys()
+        elif self.sampling == STRATIFIED_SAMPLING:
+            self.sync_strata_counts()
+        elif self.sampling == POOLED_SAMPLING:
+            self.reconcile_unlabelled_pool()
+
+        if self.get_shards() > 1:
+            self.sync_shard_bounds()
+
+    def document_labelled(self, document):
+        """
+        Called when a document is labelled for the first time
+        """
+        if self.sampling == STRATIFIED_SAMPLING:
+            self.update_stratum_counts(document)
+            self.count_new_strata_documents()
+        elif self.sampling == POOLED_SAMPLING:
+            self.remove_from_pool(document.pk)
+        elif self.sampling == INDEXED_SAMPLING:
+            self.remove_from_unlabelled_index(document.pk)
+
+    def labels_changed(self, events):
+        """
+        Called by the events dispatcher with a batch of `LabelEvent`
+        of the learning model labels writes
+        """
+        pass
 
     def is_classifier(self):
         """
@@ -133,6 +558,69 @@ class LearningModel(LearningModelBuilderMixin):
 
     def predict(self, documents):
         """
-        Predict output for documents
+        Predict output for documents, or an awaitable resolving to it,
+        run to completion in the event loop of the calling thread
         """
         raise NotImplementedError()
+
+    def get_prediction_value(self, prediction):
+        """
+        Returns the labelling form initial data of a `predict` output
+        """
+        return prediction
+
+    def store_predictions(self, batch_size=1000):
+        """
+        Predicts the unlabelled documents in batches of `batch_size`
+        and stores the predictions used for prelabelling.
+        Returns the number of stored predictions.
+        """
+        documents = self.iter_documents(
+            batch_size=batch_size,
+            queryset=self.get_unlabelled_documents_queryset())
+
+        stored = 0
+        batch = []
+
+        with self.stage('prediction') as metrics:
+            for document in documents:
+                batch.append(document)
+
+                if len(batch) == batch_size:
+                    stored += self.store_batch_predictions(batch)
+                    batch = []
+
+            stored += self.store_batch_predictions(batch)
+            metrics.rows = stored
+
+        return stored
+
+    def run_predictions(self, batch_size=1000):
+        """
+        Stores the predictions of the unlabelled documents, recording
+        the run and its stages in a `BuildRun` returned once finished
+        """
+        from ..models import BuildRun
+
+        return self.record_run(
+            BuildRun.PREDICTION, lambda build_run: self.store_predictions(batch_size))
+
+    def store_batch_predictions(self, documents):
+        """
+        Predicts and stores the predictions of the documents
+        and returns their number
+        """
+        from ..models import (
+            DocumentPrediction,
+            LabelledDocument)
+
+        if not documents:
+            return 0
+
+        values = [
+            LabelledDocument.serialize_value(self.get_prediction_value(prediction))
+            for prediction in resolve_awaitable(self.predict(documents))
+        ]
+
+        return len(DocumentPrediction.objects.replace_for_documents(
+            self.get_name(), documents, values))
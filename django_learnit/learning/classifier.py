@@ -1,6 +1,93 @@
+import hashlib
+from collections import (
+    OrderedDict,
+    defaultdict)
+
+from django.utils.encoding import force_text
+
+from ..compat import (
+    numpy,
+    sparse)
 from ..exceptions import ImproperlyConfigured
 
 from .base import LearningModel
+from .evaluation import (
+    count_matches,
+    get_scores)
+
+
+def hash_classes(classes):
+    """
+    Returns a hash of the classes tuples
+    """
+    text = repr([[force_text(value) for value in c] for c in classes])
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+class ClassesMetadata(object):
+    """
+    Immutable classes definition compiled once, with label to index and
+    index to label maps for constant time validation and label encoding.
+
+    Labels are also indexed by their text value, as submitted by forms.
+    """
+    __slots__ = (
+        'classes', 'classes_with_colors', 'labels', 'label_index',
+        'text_label_index', 'hash')
+
+    def __init__(self, classes, classes_with_colors=None):
+        classes = tuple(tuple(c) for c in classes)
+
+        if classes_with_colors is not None:
+            classes_with_colors = tuple(tuple(c) for c in classes_with_colors)
+
+        labels = tuple(c[0] for c in classes)
+
+        set_attribute = super(ClassesMetadata, self).__setattr__
+        set_attribute('classes', classes)
+        set_attribute('classes_with_colors', classes_with_colors)
+        set_attribute('labels', labels)
+        set_attribute('label_index', dict((label, i) for i, label in enumerate(labels)))
+        set_attribute('text_label_index', dict(
+            (force_text(label), i) for i, label in enumerate(labels)))
+        set_attribute('hash', hash_classes(classes_with_colors or classes))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ClassesMetadata is immutable")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.label_index or force_text(label) in self.text_label_index
+
+    def index(self, label):
+        """
+        Returns the index of the label or its text value.
+        Raises `KeyError` for unknown labels.
+        """
+        try:
+            return self.label_index[label]
+        except (KeyError, TypeError):
+            return self.text_label_index[force_text(label)]
+
+    def label(self, index):
+        """
+        Returns the label at the index
+        """
+        return self.labels[index]
+
+    def encode(self, labels):
+        """
+        Returns the list of indexes of the labels
+        """
+        return [self.index(label) for label in labels]
+
+    def decode(self, indexes):
+        """
+        Returns the list of labels at the indexes
+        """
+        return [self.labels[i] for i in indexes]
 
 
 class GenericClassifierMixin(object):
@@ -9,9 +96,9 @@ class GenericClassifierMixin(object):
     """
     classes = ()
 
-    def get_classes(self):
+    def get_declared_classes(self):
         """
-        Returns the classifier output classes
+        Returns the declared classifier classes
         """
         if not self.classes:
             raise ImproperlyConfigured("%(cls)s is missing labels." % {
@@ -20,6 +107,45 @@ class GenericClassifierMixin(object):
 
         return self.classes
 
+    def build_classes_metadata(self):
+        """
+        Returns the compiled `ClassesMetadata`
+        """
+        return ClassesMetadata(self.get_declared_classes())
+
+    def get_classes_metadata_sources(self):
+        """
+        Returns the attributes the classes metadata is built from.
+        The metadata is rebuilt when one of them is replaced.
+        """
+        return (self.classes,)
+
+    def get_classes_metadata(self):
+        """
+        Returns the `ClassesMetadata`, built once per instance
+        """
+        sources = self.get_classes_metadata_sources()
+        cached = self.__dict__.get('_classes_metadata')
+
+        if cached is None or any(a is not b for a, b in zip(cached[0], sources)):
+            cached = (sources, self.build_classes_metadata())
+            self._classes_metadata = cached
+
+        return cached[1]
+
+    def get_classes(self):
+        """
+        Returns the classifier output classes
+        """
+        return self.get_classes_metadata().classes
+
+    def get_classes_hash(self):
+        """
+        Returns a hash of the classes definition, used to key
+        cached fragments depending on the classes
+        """
+        return self.get_classes_metadata().hash
+
 
 class ClassifierModel(GenericClassifierMixin, LearningModel):
     """
@@ -27,3 +153,122 @@ class ClassifierModel(GenericClassifierMixin, LearningModel):
     more labels for each document
     """
     multilabel = False
+
+    def get_prediction_value(self, prediction):
+        """
+        Returns the labelling form initial data of the predicted label
+        """
+        return {'label': prediction}
+
+    def get_value_label_indexes(self, value):
+        """
+        Returns the set of class indexes of a label value,
+        unknown labels being ignored
+        """
+        classes_metadata = self.get_classes_metadata()
+        label = value.get('label') if isinstance(value, dict) else None
+
+        if not self.multilabel:
+            label = [label]
+
+        indexes = set()
+
+        for item in label or ():
+            try:
+                indexes.add(classes_metadata.index(item))
+            except KeyError:
+                pass
+
+        return indexes
+
+    def score_predictions(self, pairs):
+        """
+        Returns the document level scores of each class
+        """
+        from ..models import BuildMetric
+
+        counts = defaultdict(lambda: [0, 0, 0])
+
+        for true_value, predicted_value in pairs:
+            count_matches(
+                counts,
+                set((i,) for i in self.get_value_label_indexes(true_value)),
+                set((i,) for i in self.get_value_label_indexes(predicted_value)))
+
+        labels = self.get_classes_metadata().labels
+        scores = get_scores(counts, range(len(labels)))
+
+        return {
+            BuildMetric.DOCUMENT: OrderedDict(
+                (labels[i], label_scores) for i, label_scores in scores.items())
+        }
+
+    def iter_labels(self):
+        """
+        Yields (document id, label) of the labelled documents
+        of the queryset ordered by document id
+        """
+        for document_id, value in self.iter_label_values():
+            yield document_id, value.get('label') if isinstance(value, dict) else None
+
+    def get_label_matrix(self):
+        """
+        Returns the labelled documents ids and their labels encoded in the
+        classes order, row aligned with the ids:
+
+        - a vector of class indexes, -1 for unknown labels
+        - a sparse CSR indicator matrix of documents by classes when
+          `multilabel`, unknown labels being ignored
+
+        Requires NumPy, and SciPy when `multilabel`.
+        """
+        if numpy is None or (self.multilabel and sparse is None):
+            raise ImproperlyConfigured("Label matrices require NumPy and SciPy.")
+
+        with self.stage('loading') as metrics:
+            document_ids, labels = self.build_label_matrix()
+            metrics.rows = len(document_ids)
+
+        return document_ids, labels
+
+    def build_label_matrix(self):
+        """
+        Returns the labelled documents ids and their encoded labels
+        """
+        classes_metadata = self.get_classes_metadata()
+        document_ids = []
+
+        if not self.multilabel:
+            indexes = []
+
+            for document_id, label in self.iter_labels():
+                document_ids.append(document_id)
+
+                try:
+                    indexes.append(classes_metadata.index(label))
+                except KeyError:
+                    indexes.append(-1)
+
+            return numpy.array(document_ids), numpy.array(indexes, dtype=numpy.intp)
+
+        indptr = [0]
+        indices = []
+
+        for document_id, labels in self.iter_labels():
+            document_ids.append(document_id)
+            row = set()
+
+            for label in labels or ():
+                try:
+                    row.add(classes_metadata.index(label))
+                except KeyError:
+                    pass
+
+            indices.extend(sorted(row))
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (numpy.ones(len(indices), dtype=numpy.int8), indices, indptr),
+            shape=(len(document_ids), len(classes_metadata)))
+
+        return numpy.array(document_ids), matrix
@@ -0,0 +1,312 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.utils.encoding import force_bytes
+
+from ..compat import (
+    get_fork_context,
+    resolve_awaitable)
+from ..exceptions import ImproperlyConfigured
+
+from .sampling import stable_hash
+
+
+# Learning model and fold inputs of the evaluation being run,
+# inherited by the forked fold workers
+_evaluation = {}
+
+# Database connections inherited from the parent process, kept referenced
+# so that they are not closed by the fold workers
+_inherited_connections = []
+
+
+def _init_fold_worker():
+    """
+    Detaches the fold worker from the database connections of the parent
+    process, opening its own connections when querying
+    """
+    for connection in connections.all():
+        _inherited_connections.append(connection.connection)
+        connection.connection = None
+
+
+def _run_fold(fold):
+    """
+    Returns the prediction values of a fold in a fold worker
+    """
+    learning_model = _evaluation['learning_model']
+    training, testing = _evaluation['folds'][fold]
+
+    return learning_model.get_fold_prediction_values(training, testing)
+
+
+def get_scores(counts, labels):
+    """
+    Returns the precision, recall, F1 and support of each label
+    from its (true positives, false positives, false negatives) counts
+    """
+    scores = OrderedDict()
+
+    for label in labels:
+        tp, fp, fn = counts.get(label, (0, 0, 0))
+
+        precision = float(tp) / (tp + fp) if tp + fp else 0.
+        recall = float(tp) / (tp + fn) if tp + fn else 0.
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.
+
+        scores[label] = {
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'support': tp + fn
+        }
+
+    return scores
+
+
+def count_matches(counts, true_labels, predicted_labels):
+    """
+    Adds the true positives, false positives and false negatives of the
+    true and predicted sets of items, keyed by label, to the counts
+    """
+    for item in predicted_labels:
+        counts[item[-1]][0 if item in true_labels else 1] += 1
+
+    for item in true_labels - predicted_labels:
+        counts[item[-1]][2] += 1
+
+
+def get_entities(labels, outside=None):
+    """
+    Returns the set of (start, end, label) spans of consecutive
+    tokens sharing a label other than `outside`
+    """
+    entities = set()
+    start = 0
+
+    for i in range(1, len(labels) + 1):
+        if i == len(labels) or labels[i] != labels[start]:
+            if labels[start] != outside:
+                entities.add((start, i, labels[start]))
+            start = i
+
+    return entities
+
+
+class EvaluationMixin(object):
+    """
+    Adds cross-validated evaluation of the learning model.
+
+    Labelled documents are split in `folds` by a stable hash of their ID,
+    so that each document stays in its fold as labels are added. The
+    predictions of each fold are cached with a fingerprint of the labels
+    and documents, and only recomputed when they changed. Folds are run
+    in `evaluation_processes` forked processes.
+
+    Builds are evaluated by `run_build()` when `evaluation_folds` is set.
+    """
+    evaluation_folds = None
+    evaluation_processes = 1
+    evaluation_seed = ''
+
+    # Increment to invalidate the cached fold predictions when
+    # the model changes
+    evaluation_version = 1
+
+    def get_document_fold(self, document_id, folds):
+        """
+        Returns the fold of the document
+        """
+        assignments = self.__dict__.setdefault('_fold_assignments', {})
+        key = (self.evaluation_seed, folds, document_id)
+        fold = assignments.get(key)
+
+        if fold is None:
+            fold = assignments[key] = stable_hash(
+                self.evaluation_seed, self.get_name(), 'fold', document_id) % folds
+
+        return fold
+
+    def get_evaluation_labelled_documents(self):
+        """
+        Returns the labelled documents of the queryset ordered
+        by document id, with their documents
+        """
+        return list(
+            self.get_labelled_documents_queryset()
+                .filter(document_id__in=self.get_queryset().values('pk'))
+                .order_by('document_id')
+                .prefetch_related('document'))
+
+    def get_evaluation_fingerprint(self, folds, labelled_documents):
+        """
+        Returns a hash of the evaluation inputs: folds, labels
+        and documents contents
+        """
+        md5 = hashlib.md5(force_bytes(
+            '%s:%s:%s' % (self.evaluation_version, self.evaluation_seed, folds)))
+
+        for labelled_document in labelled_documents:
+            md5.update(force_bytes('%s:%s:%s\0' % (
+                labelled_document.document_id,
+                labelled_document.value,
+                self.get_document_content_hash(labelled_document.document))))
+
+        return md5.hexdigest()
+
+    def get_fetched_labelled_documents_queryset(self, labelled_documents):
+        """
+        Returns a queryset of the fetched labelled documents, evaluated
+        from them, so that `build_model` receives a queryset as when built
+        by `build()`. Iterating or counting it does not query the database,
+        while chaining a new query does.
+        """
+        queryset = self.get_labelled_documents_queryset().filter(
+            pk__in=[labelled_document.pk for labelled_document in labelled_documents])
+        queryset._result_cache = list(labelled_documents)
+        queryset._prefetch_done = True
+
+        return queryset
+
+    def fit_and_predict(self, labelled_documents, documents):
+        """
+        Builds a model from the list of labelled documents and returns its
+        predictions of the documents, leaving the learning model `model`
+        unchanged.
+
+        Fold workers run in forked processes: the labelled documents
+        and documents are fetched beforehand, and `build_model` receives
+        them as an evaluated queryset.
+        """
+        had_model = 'model' in self.__dict__
+        model = self.__dict__.get('model')
+        self.model = self.build_model(
+            self.get_fetched_labelled_documents_queryset(labelled_documents))
+
+        try:
+            return resolve_awaitable(self.predict(documents))
+        finally:
+            if had_model:
+                self.model = model
+            else:
+                del self.model
+
+    def get_fold_prediction_values(self, training, testing):
+        """
+        Returns the prediction values of the testing labelled documents
+        of a model built from the training labelled documents
+        """
+        predictions = self.fit_and_predict(
+            training, [labelled_document.document for labelled_document in testing])
+
+        return [self.get_prediction_value(prediction) for prediction in predictions]
+
+    def get_fold_predictions(self, folds, labelled_documents, processes=1):
+        """
+        Returns the (document id, prediction value) pairs of all folds,
+        computing the folds missing from the cache
+        """
+        from ..models import EvaluationFold
+
+        model_name = self.get_name()
+        fingerprint = self.get_evaluation_fingerprint(folds, labelled_documents)
+
+        splits = {}
+        predictions = {}
+
+        for fold in range(folds):
+            cached = EvaluationFold.objects.get_predictions(
+                model_name, folds, fold, fingerprint)
+
+            if cached is not None:
+                predictions[fold] = cached
+                continue
+
+            training = []
+            testing = []
+
+            for labelled_document in labelled_documents:
+                if self.get_document_fold(labelled_document.document_id, folds) == fold:
+                    testing.append(labelled_document)
+                else:
+                    training.append(labelled_document)
+
+            if testing:
+                splits[fold] = (training, testing)
+
+        pending = sorted(splits)
+        context = get_fork_context() if processes > 1 and len(pending) > 1 else None
+
+        if context is None:
+            values = [self.get_fold_prediction_values(*splits[fold]) for fold in pending]
+        else:
+            _evaluation.update(learning_model=self, folds=splits)
+
+            try:
+                pool = context.Pool(
+                    min(processes, len(pending)), initializer=_init_fold_worker)
+
+                try:
+                    values = pool.map(_run_fold, pending)
+                finally:
+                    pool.close()
+                    pool.join()
+            finally:
+                _evaluation.clear()
+
+        for fold, fold_values in zip(pending, values):
+            # Round trip through JSON for fresh and cached predictions to match
+            pairs = json.loads(json.dumps([
+                (labelled_document.document_id, value)
+                for labelled_document, value in zip(splits[fold][1], fold_values)
+            ]))
+
+            EvaluationFold.objects.set_predictions(
+                model_name, folds, fold, fingerprint, pairs)
+
+            predictions[fold] = [tuple(pair) for pair in pairs]
+
+        return [pair for fold in sorted(predictions) for pair in predictions[fold]]
+
+    def score_predictions(self, pairs):
+        """
+        Returns the scores by level and label of the (true value,
+        predicted value) pairs, as returned by `evaluate()`
+        """
+        raise NotImplementedError()
+
+    def evaluate(self, folds=None, processes=None, build_run=None):
+        """
+        Cross-validates the learning model and returns its precision,
+        recall, F1 and support by level and label:
+
+            {level: {label: {'precision': ..., 'recall': ..., 'f1': ..., 'support': ...}}}
+
+        Scores are stored for the build run when given.
+        """
+        from ..models import BuildMetric
+
+        folds = folds or self.evaluation_folds
+
+        if not isinstance(folds, int) or folds < 2:
+            raise ImproperlyConfigured("%(cls)s evaluation requires at least 2 folds." % {
+                'cls': self.__class__.__name__
+            })
+
+        labelled_documents = self.get_evaluation_labelled_documents()
+        predictions = dict(self.get_fold_predictions(
+            folds, labelled_documents, processes or self.evaluation_processes))
+
+        scores = self.score_predictions([
+            (labelled_document.deserialize_value(),
+             predictions[labelled_document.document_id])
+            for labelled_document in labelled_documents
+            if labelled_document.document_id in predictions
+        ])
+
+        if build_run is not None:
+            BuildMetric.objects.create_for_build_run(build_run, scores)
+
+        return scores
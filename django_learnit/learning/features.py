@@ -0,0 +1,568 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.encoding import force_bytes
+
+from ..compat import (
+    fcntl,
+    numpy)
+from ..exceptions import ImproperlyConfigured
+
+
+class FeatureStore(object):
+    """
+    On disk cache of per document feature vectors.
+
+    Vectors of a feature extractor version are rows of a single append-only
+    array file `<path>/<version>/vectors.bin`, loaded memory-mapped so that
+    cached features of a large corpus are paged in by the OS instead of
+    being read in memory. An append-only index file of (document id,
+    content hash, row) records maps documents to their rows, the last
+    record of a document winning. An entry is only valid for the document
+    content hash and the feature extractor version it was computed with.
+
+    Rows and records are appended in single writes to files opened in
+    append mode, so that concurrent writers never overwrite each other,
+    and records of other writers are read on index misses. Vectors all have
+    the dimension and `dtype` of the first stored vector, and content
+    hashes up to 32 bytes, e.g. MD5 hex digests.
+
+    Rows of replaced and deleted entries are reclaimed by `compact()`,
+    which rewrites the live rows and their index then renames them in
+    place. Reads and writes hold a shared lock of the version files, and
+    compaction an exclusive one, where `fcntl` is available.
+    """
+    INDEX_DTYPE = [('document_id', '<i8'), ('content_hash', 'S32'), ('row', '<i8')]
+
+    def __init__(self, path, version, dtype=None):
+        if numpy is None:
+            raise ImproperlyConfigured("The feature store requires NumPy.")
+
+        self.path = path
+        self.version = str(version)
+        self.dtype = dtype
+
+        self.index_dtype = numpy.dtype(self.INDEX_DTYPE)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._index = {}
+        self._index_offset = 0
+        self._index_inode = None
+        self._meta = None
+        self._vectors = None
+
+    def get_version_path(self):
+        """
+        Returns the directory of the version files
+        """
+        return os.path.join(self.path, self.version)
+
+    def get_file_path(self, name):
+        """
+        Returns the path of a file of the version
+        """
+        return os.path.join(self.get_version_path(), name)
+
+    @contextmanager
+    def file_lock(self, exclusive=False):
+        """
+        Holds a shared, or exclusive, lock of the version files
+        """
+        if fcntl is None or not os.path.isdir(self.get_version_path()):
+            yield
+            return
+
+        fd = os.open(self.get_file_path('lock'), os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    def check_replaced(self):
+        """
+        Resets the loaded index and vectors when the index file
+        was replaced by a compaction
+        """
+        try:
+            inode = os.stat(self.get_file_path('index.bin')).st_ino
+        except (IOError, OSError):
+            return
+
+        if self._index_inode is not None and inode != self._index_inode:
+            self._reset()
+
+    def get_meta(self):
+        """
+        Returns the (dtype, dimension) of the vectors, or None
+        when nothing is stored yet
+        """
+        if self._meta is None:
+            try:
+                with open(self.get_file_path('meta.json')) as f:
+                    meta = json.load(f)
+            except (IOError, OSError, ValueError):
+                return None
+
+            self._meta = (numpy.dtype(str(meta['dtype'])), meta['dimension'])
+
+        return self._meta
+
+    def set_meta(self, vector):
+        """
+        Stores the dtype and dimension of the vectors from the first
+        vector, and returns the (dtype, dimension) of the vectors
+        """
+        meta = self.get_meta()
+
+        if meta is None:
+            version_path = self.get_version_path()
+
+            if not os.path.isdir(version_path):
+                try:
+                    os.makedirs(version_path)
+                except OSError:  # Created concurrently
+                    if not os.path.isdir(version_path):
+                        raise
+
+            dtype = numpy.dtype(self.dtype or vector.dtype)
+
+            # Written to a temporary file then renamed, so that concurrent
+            # readers never load a partially written file
+            fd, tmp_path = tempfile.mkstemp(dir=version_path, suffix='.tmp')
+
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'dtype': dtype.str, 'dimension': len(vector)}, f)
+
+            os.rename(tmp_path, self.get_file_path('meta.json'))
+
+            self._meta = None
+            meta = self.get_meta()
+
+        if len(vector) != meta[1]:
+            raise ValueError("Feature vectors must have %d dimensions, not %d." % (
+                meta[1], len(vector)))
+
+        return meta
+
+    def load_index(self):
+        """
+        Reads the index records appended since the last read
+        and returns the index
+        """
+        try:
+            with open(self.get_file_path('index.bin'), 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+
+                if self._index_inode is not None and inode != self._index_inode:
+                    self._reset()
+
+                self._index_inode = inode
+                f.seek(self._index_offset)
+                data = f.read()
+        except (IOError, OSError):
+            return self._index
+
+        # Ignore a record being written
+        size = len(data) - len(data) % self.index_dtype.itemsize
+        records = numpy.frombuffer(data[:size], dtype=self.index_dtype)
+
+        for document_id, content_hash, row in records.tolist():
+            self._index[document_id] = (content_hash, row)
+
+        self._index_offset += size
+
+        return self._index
+
+    def get_vectors(self, min_rows=0):
+        """
+        Returns the memory-mapped vectors, mapped again
+        when they have less than `min_rows` rows
+        """
+        if self._vectors is None or len(self._vectors) < min_rows:
+            dtype, dimension = self.get_meta()
+            row_size = dtype.itemsize * dimension
+            rows = os.path.getsize(self.get_file_path('vectors.bin')) // row_size
+
+            self._vectors = numpy.memmap(
+                self.get_file_path('vectors.bin'), dtype=dtype, mode='r',
+                shape=(rows, dimension)) if rows else numpy.empty((0, dimension), dtype)
+
+        return self._vectors
+
+    def get_rows(self, keys):
+        """
+        Returns the rows of the (document id, content hash) keys,
+        None for the keys not cached
+        """
+        with self._lock, self.file_lock():
+            return self._get_rows(keys)
+
+    def _get_rows(self, keys):
+        with self._lock:
+            self.check_replaced()
+            index = self._index
+
+            # Read the records of other writers on misses
+            if any(index.get(int(document_id), (None,))[0] != force_bytes(content_hash)
+                   for document_id, content_hash in keys):
+                index = self.load_index()
+
+            rows = []
+
+            for document_id, content_hash in keys:
+                entry = index.get(int(document_id))
+
+                if entry is None or entry[0] != force_bytes(content_hash) or entry[1] < 0:
+                    rows.append(None)
+                else:
+                    rows.append(entry[1])
+
+            return rows
+
+    def append(self, name, data):
+        """
+        Appends the bytes to a file of the version in a single write
+        and returns the file size after the write
+        """
+        fd = os.open(
+            self.get_file_path(name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            os.write(fd, data)
+            return os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+
+    def get(self, document_id, content_hash):
+        """
+        Returns the memory-mapped vector of the document,
+        or None when not cached
+        """
+        with self._lock, self.file_lock():
+            row = self._get_rows([(document_id, content_hash)])[0]
+
+            if row is None:
+                return None
+
+            return self.get_vectors(row + 1)[row]
+
+    def set_many(self, items):
+        """
+        Stores the vectors of the (document id, content hash, vector) items,
+        replacing the entries of other content hashes
+        """
+        if not items:
+            return
+
+        vectors = [numpy.asarray(vector).ravel() for document_id, content_hash, vector in items]
+        dtype, dimension = self.set_meta(vectors[0])
+
+        for vector in vectors[1:]:
+            if len(vector) != dimension:
+                raise ValueError("Feature vectors must have %d dimensions, not %d." % (
+                    dimension, len(vector)))
+
+        data = numpy.vstack(vectors).astype(dtype, copy=False).tobytes()
+
+        with self._lock, self.file_lock():
+            # Vectors first, so that indexed rows are always written
+            end = self.append('vectors.bin', data) // (dtype.itemsize * dimension)
+            first_row = end - len(items)
+
+            records = numpy.array([
+                (document_id, force_bytes(content_hash), first_row + i)
+                for i, (document_id, content_hash, vector) in enumerate(items)
+            ], dtype=self.index_dtype)
+
+            self.append('index.bin', records.tobytes())
+            self.load_index()
+
+    def set(self, document_id, content_hash, vector):
+        """
+        Stores the vector of the document, replacing the entries of other
+        content hashes, and returns it memory-mapped
+        """
+        self.set_many([(document_id, content_hash, vector)])
+
+        return self.get(document_id, content_hash)
+
+    def get_or_compute(self, document_id, content_hash, compute):
+        """
+        Returns the cached vector of the document, computing
+        and storing it with `compute()` when not cached
+        """
+        vector = self.get(document_id, content_hash)
+
+        if vector is None:
+            vector = self.set(document_id, content_hash, compute())
+
+        return vector
+
+    def get_or_compute_matrix(self, keys, compute):
+        """
+        Returns the cached vectors of the (document id, content hash) keys
+        stacked in a matrix, computing and storing the missing vectors of
+        the key indexes with `compute(indexes)`
+        """
+        rows = self.get_rows(keys)
+        missing = [i for i, row in enumerate(rows) if row is None]
+
+        if missing:
+            self.set_many([
+                keys[i] + (vector,) for i, vector in zip(missing, compute(missing))
+            ])
+
+        if not keys:
+            return numpy.empty((0, 0))
+
+        with self._lock, self.file_lock():
+            rows = self._get_rows(keys)
+
+            return self.get_vectors(max(rows) + 1)[rows]
+
+    def delete(self, document_id):
+        """
+        Deletes the entries of the document
+        """
+        if self.get_meta() is None:
+            return
+
+        records = numpy.array([(document_id, b'', -1)], dtype=self.index_dtype)
+
+        with self._lock, self.file_lock():
+            self.append('index.bin', records.tobytes())
+            self.load_index()
+
+    def write_temporary(self, chunks):
+        """
+        Writes the bytes chunks to a temporary file of the version
+        and returns its path
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.get_version_path(), suffix='.tmp')
+
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+        return tmp_path
+
+    def compact(self, batch_size=10000):
+        """
+        Rewrites the vectors of the live entries and their index, reclaiming
+        the rows of replaced and deleted entries, and returns the number of
+        reclaimed rows. Vectors are copied `batch_size` rows at a time.
+        """
+        if self.get_meta() is None:
+            return 0
+
+        with self._lock, self.file_lock(exclusive=True):
+            self._reset()
+            index = self.load_index()
+            records = self._index_offset // self.index_dtype.itemsize
+
+            live = sorted(
+                (row, document_id, content_hash)
+                for document_id, (content_hash, row) in index.items()
+                if row >= 0)
+
+            vectors = self.get_vectors()
+            reclaimed = len(vectors) - len(live)
+
+            if not reclaimed and records == len(live):
+                return 0
+
+            vectors_path = self.write_temporary(
+                vectors[[row for row, document_id, content_hash in live[i:i + batch_size]]].tobytes()
+                for i in range(0, len(live), batch_size))
+            index_path = self.write_temporary([numpy.array([
+                (document_id, content_hash, i)
+                for i, (row, document_id, content_hash) in enumerate(live)
+            ], dtype=self.index_dtype).tobytes()])
+
+            # Vectors first, so that indexed rows are always written
+            os.rename(vectors_path, self.get_file_path('vectors.bin'))
+            os.rename(index_path, self.get_file_path('index.bin'))
+
+            self._reset()
+
+        return reclaimed
+
+    def prune(self):
+        """
+        Deletes the entries of other feature extractor versions
+        and returns the number of deleted versions
+        """
+        if not os.path.isdir(self.path):
+            return 0
+
+        deleted = 0
+
+        for version in os.listdir(self.path):
+            if version != self.version:
+                shutil.rmtree(os.path.join(self.path, version), ignore_errors=True)
+                deleted += 1
+
+        return deleted
+
+
+class FeatureStoreMixin(object):
+    """
+    Adds cached per document feature vectors.
+
+    `extract_features` computes the vector of a document. Vectors are
+    cached in a `FeatureStore` under `feature_store_root`, or the
+    `LEARNIT_FEATURE_STORE_ROOT` setting, as `feature_dtype` arrays by
+    document id, document content hash and `feature_extractor_version`,
+    which must be changed along with the feature extraction.
+
+    The content hash covers the `document_version_field` when set,
+    otherwise the `feature_fields`, all concrete fields when empty.
+    """
+    feature_store_root = None
+    feature_extractor_version = '1'
+    feature_dtype = 'float32'
+
+    # Document fields the features are extracted from
+    feature_fields = ()
+
+    # Number of documents the deferred hashed fields are fetched for
+    # per query
+    content_hash_batch_size = 500
+
+    def extract_features(self, document):
+        """
+        Returns the feature vector of the document
+        """
+        raise NotImplementedError()
+
+    def get_content_hash_fields(self, opts):
+        """
+        Returns the document fields covered by the content hash
+        """
+        if self.document_version_field:
+            return [opts.get_field(self.document_version_field)]
+
+        if self.feature_fields:
+            return [opts.get_field(name) for name in self.feature_fields]
+
+        return list(opts.concrete_fields)
+
+    def get_document_content_hashes(self, documents):
+        """
+        Returns the content hashes of the documents. Hashed fields deferred
+        in a document are fetched, without loading them in the document,
+        so that a document hashes the same whichever fields are loaded.
+        """
+        documents = list(documents)
+
+        if not documents:
+            return []
+
+        opts = documents[0]._meta
+        attnames = [field.attname for field in self.get_content_hash_fields(opts)]
+
+        deferred = sorted(set(
+            attname for document in documents for attname in attnames
+            if attname not in document.__dict__))
+        fetched = {}
+
+        if deferred:
+            pks = [document.pk for document in documents]
+            manager = opts.concrete_model._base_manager
+
+            for i in range(0, len(pks), self.content_hash_batch_size):
+                rows = manager\
+                    .filter(pk__in=pks[i:i + self.content_hash_batch_size])\
+                    .values_list('pk', *deferred)
+
+                for row in rows:
+                    fetched[row[0]] = dict(zip(deferred, row[1:]))
+
+        hashes = []
+
+        for document in documents:
+            md5 = hashlib.md5()
+            values = fetched.get(document.pk, {})
+
+            for attname in attnames:
+                if attname in document.__dict__:
+                    value = document.__dict__[attname]
+                else:
+                    value = values.get(attname)
+
+                md5.update(force_bytes(attname))
+                md5.update(b'=')
+                md5.update(force_bytes(value))
+                md5.update(b'\0')
+
+            hashes.append(md5.hexdigest())
+
+        return hashes
+
+    def get_document_content_hash(self, document):
+        """
+        Returns the content hash of the document
+        """
+        return self.get_document_content_hashes([document])[0]
+
+    def get_feature_store(self):
+        """
+        Returns the feature store of the learning model
+        Raises `ImproperlyConfigured` when no root is set
+        """
+        root = self.feature_store_root or \
+            getattr(settings, 'LEARNIT_FEATURE_STORE_ROOT', None)
+
+        if not root:
+            raise ImproperlyConfigured("%(cls)s is missing a feature store root." % {
+                'cls': self.__class__.__name__
+            })
+
+        path = os.path.join(root, self.get_name())
+        version = str(self.feature_extractor_version)
+        store = getattr(self, '_feature_store', None)
+
+        if store is None or store.path != path or store.version != version or \
+                store.dtype != self.feature_dtype:
+            store = self._feature_store = FeatureStore(
+                path, version, dtype=self.feature_dtype)
+
+        return store
+
+    def get_features(self, document):
+        """
+        Returns the cached feature vector of the document
+        """
+        return self.get_feature_store().get_or_compute(
+            document.pk,
+            self.get_document_content_hash(document),
+            lambda: self.extract_features(document))
+
+    def get_features_matrix(self, documents):
+        """
+        Returns the feature vectors of the documents stacked in a matrix,
+        extracting and storing the missing vectors at once
+        """
+        documents = list(documents)
+
+        with self.stage('featurization') as metrics:
+            matrix = self.get_feature_store().get_or_compute_matrix(
+                [
+                    (document.pk, content_hash)
+                    for document, content_hash in zip(
+                        documents, self.get_document_content_hashes(documents))
+                ],
+                lambda indexes: [self.extract_features(documents[i]) for i in indexes])
+            metrics.rows = matrix.shape[0]
+
+        return matrix
@@ -0,0 +1,206 @@
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+try:
+    array('q')
+    ID_TYPECODE = 'q'
+except ValueError:  # Python 2
+    ID_TYPECODE = 'l'
+
+
+class UnlabelledIndex(object):
+    """
+    In-memory index of unlabelled document IDs.
+
+    IDs are appended in increasing order to a compact array, so that an ID
+    is found by bisection, and removed IDs are flagged in a bitmap instead
+    of being deleted from the array.
+    """
+
+    def __init__(self, synced=None):
+        self.ids = array(ID_TYPECODE)
+        self.removed = bytearray()
+        self.remaining = 0
+        self.lock = threading.RLock()
+
+        # Last loaded ID and whether every ID up to now is loaded
+        self.last_id = None
+        self.complete = False
+
+        # Latest label modification date seen and time of the last refresh
+        self.synced = synced
+        self.refreshed = time.time()
+
+    def __len__(self):
+        return self.remaining
+
+    def extend(self, document_ids):
+        """
+        Appends IDs greater than the indexed ones
+        """
+        with self.lock:
+            self.ids.extend(document_ids)
+            self.removed.extend(bytearray((len(self.ids) + 7) // 8 - len(self.removed)))
+            self.remaining += len(document_ids)
+
+    def is_removed(self, position):
+        return self.removed[position >> 3] & (1 << (position & 7))
+
+    def remove(self, document_id):
+        """
+        Flags the ID as removed, returns whether it was indexed
+        """
+        with self.lock:
+            position = bisect_left(self.ids, document_id)
+
+            if position == len(self.ids) or self.ids[position] != document_id:
+                return False
+
+            if not self.is_removed(position):
+                self.removed[position >> 3] |= 1 << (position & 7)
+                self.remaining -= 1
+
+            return True
+
+    def pick(self, attempts=16):
+        """
+        Returns a random ID not removed, or None when there is none
+        """
+        with self.lock:
+            if not self.remaining:
+                return None
+
+            size = len(self.ids)
+
+            for i in range(attempts):
+                position = random.randrange(size)
+
+                if not self.is_removed(position):
+                    return self.ids[position]
+
+            # Mostly removed, scan from a random position
+            start = random.randrange(size)
+
+            for i in range(size):
+                position = (start + i) % size
+
+                if not self.is_removed(position):
+                    return self.ids[position]
+
+            return None
+
+
+class IndexedSamplingMixin(object):
+    """
+    Adds random sampling from a per process in-memory index of unlabelled
+    document IDs.
+
+    Every unlabelled ID is loaded lazily, by queries of `index_chunk_size`
+    IDs in primary key order, so that random picks are spread over the
+    whole primary key range. The index is refreshed incrementally at most
+    every `index_refresh_interval` seconds: documents labelled since the
+    last refresh, from `LabelledDocument.modified`, are removed and new
+    documents are loaded from the last indexed ID.
+    """
+    index_chunk_size = 10000
+    index_refresh_interval = 10
+    index_pick_attempts = 10
+
+    def get_unlabelled_index(self):
+        """
+        Returns the unlabelled index of the process
+        """
+        index = self.__dict__.get('_unlabelled_index')
+
+        if index is None:
+            index = self._unlabelled_index = UnlabelledIndex(
+                synced=self.get_labelled_documents_queryset()
+                .order_by('-modified')
+                .values_list('modified', flat=True)
+                .first())
+
+        return index
+
+    def load_unlabelled_index_chunk(self, index):
+        """
+        Loads the next unlabelled IDs chunk, returns the number of loaded IDs
+        """
+        queryset = self.get_unlabelled_documents_queryset().order_by('pk')
+
+        if index.last_id is not None:
+            queryset = queryset.filter(pk__gt=index.last_id)
+
+        document_ids = list(
+            queryset.values_list('pk', flat=True)[:self.index_chunk_size])
+
+        if document_ids:
+            index.extend(document_ids)
+            index.last_id = document_ids[-1]
+
+        index.complete = len(document_ids) < self.index_chunk_size
+
+        return len(document_ids)
+
+    def refresh_unlabelled_index(self, index):
+        """
+        Removes the documents labelled since the last refresh and allows
+        loading documents created since
+        """
+        labelled = self.get_labelled_documents_queryset()
+
+        if index.synced is not None:
+            labelled = labelled.filter(modified__gte=index.synced)
+
+        labelled = labelled.values_list('document_id', 'modified')
+
+        for document_id, modified in labelled.iterator():
+            index.remove(document_id)
+            index.synced = max(index.synced or modified, modified)
+
+        index.complete = False
+        index.refreshed = time.time()
+
+    def remove_from_unlabelled_index(self, document_id):
+        """
+        Removes the document from the index of the process
+        """
+        self.get_unlabelled_index().remove(document_id)
+
+    def get_indexed_unlabelled_document(self, annotator=None):
+        """
+        Returns a random unlabelled document from the index.
+        Falls back to a random unlabelled document when picked documents
+        are all leased.
+        """
+        index = self.get_unlabelled_index()
+
+        with index.lock:
+            if time.time() - index.refreshed >= self.index_refresh_interval:
+                self.refresh_unlabelled_index(index)
+
+            while not index.complete:
+                self.load_unlabelled_index_chunk(index)
+
+        unlabelled = self.get_unlabelled_documents_queryset()
+
+        for attempt in range(self.index_pick_attempts):
+            document_id = index.pick()
+
+            if document_id is None:
+                return None
+
+            document = self.exclude_leased_documents(unlabelled, annotator)\
+                .filter(pk=document_id)\
+                .first()
+
+            if document is not None:
+                return document
+
+            # Labelled since the last refresh, otherwise leased
+            if not unlabelled.filter(pk=document_id).exists():
+                index.remove(document_id)
+
+        return self.get_random_unlabelled_document(annotator)
@@ -1,5 +1,18 @@
+from collections import (
+    OrderedDict,
+    defaultdict)
+
+from ..compat import numpy
+from ..exceptions import ImproperlyConfigured
+
 from .base import LearningModel
-from .classifier import GenericClassifierMixin
+from .classifier import (
+    ClassesMetadata,
+    GenericClassifierMixin)
+from .evaluation import (
+    count_matches,
+    get_entities,
+    get_scores)
 
 
 class NamedEntityRecognizerModel(GenericClassifierMixin, LearningModel):
@@ -10,6 +23,10 @@ class NamedEntityRecognizerModel(GenericClassifierMixin, LearningModel):
     outside_class_display = 'Outside'
     outside_color = '#CCCCCC'
 
+    # Identifies the tokenizer of `get_tokens`, learning models with the same
+    # key sharing cached tokens. Tokens are not shared when not set.
+    tokenizer_key = None
+
     default_colors = [
         '#AB47BC',
         '#F44336',
@@ -21,17 +38,25 @@ class NamedEntityRecognizerModel(GenericClassifierMixin, LearningModel):
         '#4E342E'
     ]
 
-    def get_classes(self):
+    def build_classes_metadata(self):
         """
-        Returns classes with preprended oustide class
+        Returns the compiled `ClassesMetadata` with preprended outside class
         """
-        out_classes = ()
-        classes = super(NamedEntityRecognizerModel, self).get_classes()
+        classes_with_colors = self.build_classes_with_colors()
 
-        for c in classes:
-            out_classes += (c[:2],)
+        return ClassesMetadata(
+            tuple(c[:2] for c in classes_with_colors),
+            classes_with_colors=classes_with_colors)
 
-        return ((self.outside_class, self.outside_class_display),) + out_classes
+    def get_classes_metadata_sources(self):
+        """
+        Adds outside class and colors attributes to the metadata sources
+        """
+        return super(NamedEntityRecognizerModel, self).get_classes_metadata_sources() + (
+            self.outside_class,
+            self.outside_class_display,
+            self.outside_color,
+            self.default_colors)
 
     def get_tokens(self, document):
         """
@@ -40,25 +65,170 @@ class NamedEntityRecognizerModel(GenericClassifierMixin, LearningModel):
         The numbers of tokens must be exactly the same for labelling task and
         model training task.
 
-        Here, you usually return the output of the model tokenizer.
+        Here, you usually return the output of the model tokenizer, or an
+        awaitable resolving to it when the tokenizer is an async client.
+        An awaitable is run to completion in the event loop of the calling
+        thread, blocking the request until the tokens are received.
         """
         raise NotImplementedError()
 
-    def get_classes_with_colors(self):
+    def get_tokenizer_key(self):
+        """
+        Returns the key identifying the tokenizer of `get_tokens`,
+        the learning model name unless `tokenizer_key` is set
+        """
+        if self.tokenizer_key:
+            return 'tokenizer:%(key)s' % {'key': self.tokenizer_key}
+
+        return 'model:%(name)s' % {'name': self.get_name()}
+
+    def build_classes_with_colors(self):
         """
         Returns classes with their associated colors
         If there's no explicit color, pick one in the `default_colors` list
         """
         i = 0
-        out_classes = ()
-        classes = super(NamedEntityRecognizerModel, self).get_classes()
+        out_classes = []
+
+        for c in self.get_declared_classes():
+            c = tuple(c)
 
-        for c in classes:
             if len(c) != 3:
                 c += (self.default_colors[i],)
                 i += 1
-            out_classes += (c,)
+            out_classes.append(c)
 
         return (
             (self.outside_class, self.outside_class_display, self.outside_color),
-        ) + out_classes
+        ) + tuple(out_classes)
+
+    def get_classes_with_colors(self):
+        """
+        Returns classes with their associated colors
+        """
+        return self.get_classes_metadata().classes_with_colors
+
+    def get_prediction_value(self, prediction):
+        """
+        Returns the labelling formset initial data of the predicted
+        tokens labels
+        """
+        return [{'label': label} for label in prediction]
+
+    def get_value_label_indexes(self, value):
+        """
+        Returns the list of class indexes of the tokens labels value,
+        None for unknown labels
+        """
+        classes_metadata = self.get_classes_metadata()
+        indexes = []
+
+        for item in value if isinstance(value, list) else ():
+            try:
+                indexes.append(classes_metadata.index(item['label']))
+            except (KeyError, TypeError):
+                indexes.append(None)
+
+        return indexes
+
+    def score_predictions(self, pairs):
+        """
+        Returns the token level and entity level scores of each class
+        but the outside class
+        """
+        from ..models import BuildMetric
+
+        outside = self.get_classes_metadata().index(self.outside_class)
+        token_counts = defaultdict(lambda: [0, 0, 0])
+        entity_counts = defaultdict(lambda: [0, 0, 0])
+
+        for true_value, predicted_value in pairs:
+            true_labels = self.get_value_label_indexes(true_value)
+            predicted_labels = self.get_value_label_indexes(predicted_value)
+
+            count_matches(
+                token_counts,
+                set(item for item in enumerate(true_labels) if item[1] != outside),
+                set(item for item in enumerate(predicted_labels) if item[1] != outside))
+
+            count_matches(
+                entity_counts,
+                get_entities(true_labels, outside),
+                get_entities(predicted_labels, outside))
+
+        labels = self.get_classes_metadata().labels
+        indexes = [i for i in range(len(labels)) if i != outside]
+
+        return OrderedDict(
+            (level, OrderedDict(
+                (labels[i], label_scores)
+                for i, label_scores in get_scores(counts, indexes).items()))
+            for level, counts in (
+                (BuildMetric.TOKEN, token_counts),
+                (BuildMetric.ENTITY, entity_counts)))
+
+    def get_training_sequences(self, batch_size=1000, ragged=False, pad_value=-2):
+        """
+        Returns the labelled documents ids and their token labels encoded
+        in the classes order, -1 for unknown labels, as NumPy arrays:
+
+        - `(document_ids, labels, lengths)` where `labels` is a matrix of
+          sequences padded with `pad_value`, -2 by default, which must be
+          distinct from the classes indexes and unknown labels
+        - `(document_ids, labels, offsets)` when `ragged`, where `labels`
+          is the flat concatenation of sequences, the sequence `i` being
+          `labels[offsets[i]:offsets[i + 1]]`
+
+        Labels are read and encoded in batches of `batch_size` documents.
+        """
+        if numpy is None:
+            raise ImproperlyConfigured("Training sequences require NumPy.")
+
+        classes_metadata = self.get_classes_metadata()
+
+        if -1 <= pad_value < len(classes_metadata):
+            raise ValueError(
+                "The padding value %d is an unknown label or a class index." % pad_value)
+
+        def encode(item):
+            try:
+                return classes_metadata.index(item['label'])
+            except (KeyError, TypeError):
+                return -1
+
+        with self.stage('loading') as metrics:
+            document_ids = []
+            lengths = []
+            chunks = []
+            batch = []
+
+            for document_id, value in self.iter_label_values(batch_size=batch_size):
+                if not isinstance(value, list):
+                    value = []
+
+                document_ids.append(document_id)
+                lengths.append(len(value))
+                batch.extend(encode(item) for item in value)
+
+                if len(document_ids) % batch_size == 0:
+                    chunks.append(numpy.array(batch, dtype=numpy.intp))
+                    batch = []
+
+            chunks.append(numpy.array(batch, dtype=numpy.intp))
+
+            document_ids = numpy.array(document_ids)
+            lengths = numpy.array(lengths, dtype=numpy.intp)
+            labels = numpy.concatenate(chunks)
+            metrics.rows = len(document_ids)
+
+        if ragged:
+            offsets = numpy.zeros(len(lengths) + 1, dtype=numpy.intp)
+            numpy.cumsum(lengths, out=offsets[1:])
+
+            return document_ids, labels, offsets
+
+        max_length = lengths.max() if len(lengths) else 0
+        padded = numpy.full((len(lengths), max_length), pad_value, dtype=numpy.intp)
+        padded[numpy.arange(max_length) < lengths[:, None]] = labels
+
+        return document_ids, padded, lengths
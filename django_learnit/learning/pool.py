@@ -0,0 +1,253 @@
+import random
+from bisect import (
+    bisect_left,
+    bisect_right)
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Prime stride of the pop order permutations, coprime with any number
+# of blocks and block size
+PERMUTATION_STRIDE = 2654435761
+
+# Removed flags per bitset word, so that words fit the signed 64 bits
+# integers incremented by cache backends
+REMOVED_WORD_BITS = 62
+
+
+class CachedPoolMixin(object):
+    """
+    Adds a pool of unlabelled document IDs kept in the cache backend.
+
+    The pool holds the unlabelled document IDs in sorted blocks of
+    `pool_block_size` IDs, and a counter atomically incremented by the
+    cache backend to pop the next ID, so that annotators are served without
+    querying the whole unlabelled documents table. Pops go through the
+    blocks, and the IDs of a block, in a random order derived from a seed
+    of the pool. Labelled documents are flagged as removed in a bitset of
+    their block.
+
+    The pool is only built, from the database, by `reconcile_unlabelled_pool`
+    with the `learnit_sync_sampling` command, which deletes the entries of
+    the previous pool. Random unlabelled documents are served while the
+    pool is missing or exhausted.
+
+    `get_pooled_unlabelled_document_id` serves the next ID from the cache
+    only, leaving the document to be loaded by the labelling view.
+    """
+    pool_block_size = 1000
+
+    def get_pool_cache(self):
+        """
+        Returns the `LEARNIT_POOL_CACHE` cache backend, `default` when not set
+        """
+        return caches[getattr(settings, 'LEARNIT_POOL_CACHE', 'default')]
+
+    def get_pool_key(self, *parts):
+        """
+        Returns the cache key of a pool entry
+        """
+        return ':'.join(
+            ('django_learnit', 'pool', self.get_name()) + tuple(str(part) for part in parts))
+
+    def get_pool_removed_key(self, generation, block, position):
+        """
+        Returns the cache key of the removed flags word of a block position
+        """
+        return self.get_pool_key(generation, 'removed', block, position // REMOVED_WORD_BITS)
+
+    def reconcile_unlabelled_pool(self):
+        """
+        Rebuilds the pool from the unlabelled documents of the database,
+        streamed a block at a time, and returns its size
+        """
+        cache = self.get_pool_cache()
+
+        # A new generation, so that concurrent pops never mix two pools
+        current_key = self.get_pool_key('current')
+        previous = cache.get(current_key)
+        generation_key = self.get_pool_key('generation')
+        cache.add(generation_key, 0, None)
+        generation = cache.incr(generation_key)
+
+        queryset = self.get_unlabelled_documents_queryset()\
+            .order_by('pk')\
+            .values_list('pk', flat=True)
+        starts = []
+        size = 0
+        block = None
+
+        while True:
+            if block:
+                block = list(queryset.filter(pk__gt=block[-1])[:self.pool_block_size])
+            else:
+                block = list(queryset[:self.pool_block_size])
+
+            if not block:
+                break
+
+            cache.set(self.get_pool_key(generation, 'block', len(starts)), block, None)
+            starts.append(block[0])
+            size += len(block)
+
+            if len(block) < self.pool_block_size:
+                break
+
+        cache.set_many({
+            self.get_pool_key(generation, 'starts'): starts,
+            self.get_pool_key(generation, 'cursor'): 0
+        }, None)
+        cache.set(
+            current_key,
+            (generation, size, len(starts), random.randrange(PERMUTATION_STRIDE)),
+            None)
+
+        if previous is not None:
+            self.delete_pool_generation(*previous)
+
+        return size
+
+    def delete_pool_generation(self, generation, size, blocks, seed):
+        """
+        Deletes the blocks, removed flags and cursor of a pool generation
+        """
+        words = (self.pool_block_size + REMOVED_WORD_BITS - 1) // REMOVED_WORD_BITS
+        keys = [
+            self.get_pool_key(generation, 'starts'),
+            self.get_pool_key(generation, 'cursor')
+        ]
+
+        for block in range(blocks):
+            keys.append(self.get_pool_key(generation, 'block', block))
+            keys.extend(
+                self.get_pool_key(generation, 'removed', block, word)
+                for word in range(words))
+
+        self.get_pool_cache().delete_many(keys)
+
+    def get_pool_position(self, current, count):
+        """
+        Returns the (block, position in block) of the `count`-th pop of the
+        pool, or None when the last block has no such position
+        """
+        generation, size, blocks, seed = current
+        slot, rank = count % blocks, count // blocks
+        block = (slot * PERMUTATION_STRIDE + seed) % blocks
+        length = min(self.pool_block_size, size - block * self.pool_block_size)
+
+        if rank >= length:
+            return None
+
+        return block, (rank * PERMUTATION_STRIDE + seed) % length
+
+    def remove_from_pool(self, document_id):
+        """
+        Flags the document as removed from the current pool
+        """
+        cache = self.get_pool_cache()
+        current = cache.get(self.get_pool_key('current'))
+
+        if current is None:
+            return
+
+        generation = current[0]
+        starts = cache.get(self.get_pool_key(generation, 'starts'))
+        block_index = bisect_right(starts or [], document_id) - 1
+
+        if block_index < 0:
+            return
+
+        block = cache.get(self.get_pool_key(generation, 'block', block_index)) or []
+        position = bisect_left(block, document_id)
+
+        if position == len(block) or block[position] != document_id:
+            return
+
+        key = self.get_pool_removed_key(generation, block_index, position)
+        flag = 1 << (position % REMOVED_WORD_BITS)
+        cache.add(key, 0, None)
+
+        # Removed once per label, so that incrementing sets the flag
+        if not cache.get(key, 0) & flag:
+            cache.incr(key, flag)
+
+    def pop_pool_document_id(self):
+        """
+        Pops the next document ID of the pool not flagged as removed.
+        Returns None when the pool is exhausted or missing from the cache.
+        """
+        cache = self.get_pool_cache()
+        current = cache.get(self.get_pool_key('current'))
+
+        while current is not None:
+            generation, size, blocks, seed = current
+
+            try:
+                count = cache.incr(self.get_pool_key(generation, 'cursor')) - 1
+            except ValueError:
+                count = block = None
+            else:
+                if count >= blocks * self.pool_block_size:
+                    return None
+
+                position = self.get_pool_position(current, count)
+
+                if position is None:
+                    continue
+
+                block_index, position = position
+                block_key = self.get_pool_key(generation, 'block', block_index)
+                removed_key = self.get_pool_removed_key(generation, block_index, position)
+
+                entries = cache.get_many([block_key, removed_key])
+                block = entries.get(block_key)
+
+            if block is None:
+                # Evicted, or deleted by a concurrent rebuild: pop from
+                # the new pool if any
+                previous, current = current, cache.get(self.get_pool_key('current'))
+
+                if current == previous:
+                    return None
+
+                continue
+
+            if not entries.get(removed_key, 0) & (1 << (position % REMOVED_WORD_BITS)):
+                return block[position]
+
+        return None
+
+    def get_pooled_unlabelled_document_id(self, annotator=None):
+        """
+        Returns the ID of the next unlabelled document of the pool without
+        querying the documents, the ID of a random unlabelled document when
+        the pool is missing or exhausted, or None when there is none
+        """
+        document_id = self.pop_pool_document_id()
+
+        if document_id is None:
+            document = self.get_random_unlabelled_document(annotator)
+            document_id = document.pk if document is not None else None
+
+        return document_id
+
+    def get_pooled_unlabelled_document(self, annotator=None):
+        """
+        Returns the next unlabelled document of the pool still unlabelled
+        and not leased to another annotator, a random unlabelled document
+        when the pool is missing or exhausted
+        """
+        queryset = self.exclude_leased_documents(
+            self.get_unlabelled_documents_queryset(), annotator)
+        document_id = self.pop_pool_document_id()
+
+        while document_id is not None:
+            document = queryset.filter(pk=document_id).first()
+
+            if document is not None:
+                return document
+
+            document_id = self.pop_pool_document_id()
+
+        return self.get_random_unlabelled_document(annotator)
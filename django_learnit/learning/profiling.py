@@ -0,0 +1,64 @@
+import os
+import sys
+from timeit import default_timer
+
+from ..compat import resource
+
+
+def get_cpu_time():
+    """
+    Returns the user and system CPU seconds consumed by the process
+    """
+    times = os.times()
+
+    return times[0] + times[1]
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes,
+    or None when unavailable on the platform
+    """
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak_rss
+
+    return peak_rss * 1024
+
+
+class StageMetrics(object):
+    """
+    Metrics of a build or prediction stage, measured from `start()`
+    to `stop()`. `rows` is the number of rows processed, set by the
+    stage when known.
+    """
+
+    def __init__(self, name, depth=0, rows=None):
+        self.name = name
+        self.depth = depth
+        self.rows = rows
+
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_rss = None
+        self.profile_path = ''
+
+    def start(self):
+        self._wall_start = default_timer()
+        self._cpu_start = get_cpu_time()
+
+    def stop(self):
+        self.wall_time = default_timer() - self._wall_start
+        self.cpu_time = get_cpu_time() - self._cpu_start
+        self.peak_rss = get_peak_rss()
+
+    def __repr__(self):
+        return '<StageMetrics %(name)s: %(wall_time).3fs>' % {
+            'name': self.name,
+            'wall_time': self.wall_time or 0
+        }
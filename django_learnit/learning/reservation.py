@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.db import (
+    IntegrityError,
+    transaction)
+from django.db.models import Q
+from django.utils import timezone
+
+
+class DocumentReservationMixin(object):
+    """
+    Adds leases on documents served to annotators.
+
+    When `lease_duration` is set (in seconds), a document picked for an
+    annotator is leased to this annotator and excluded from the documents
+    picked for other annotators until the lease is released when the
+    document is labelled, or expires.
+    """
+    lease_duration = None
+    lease_attempts = 5
+
+    def get_document_lease_lookup(self, document):
+        """
+        Returns the DocumentLease lookup of the document
+        """
+        from django.contrib.contenttypes.models import ContentType
+
+        return {
+            'model_name': self.get_name(),
+            'document_content_type': ContentType.objects.get_for_model(document),
+            'document_id': document.pk
+        }
+
+    def get_leased_document_ids(self, annotator=None):
+        """
+        Returns the IDs of documents under an active lease
+        of another annotator
+        """
+        from ..models import DocumentLease
+
+        leases = DocumentLease.objects.filter(
+            model_name=self.get_name(),
+            expires__gt=timezone.now())
+
+        if annotator is not None:
+            leases = leases.exclude(annotator=annotator)
+
+        return leases.values('document_id')
+
+    def exclude_leased_documents(self, queryset, annotator=None):
+        """
+        Excludes documents leased to another annotator from the queryset
+        """
+        if not self.lease_duration:
+            return queryset
+
+        return queryset.exclude(pk__in=self.get_leased_document_ids(annotator))
+
+    def acquire_lease(self, document, annotator):
+        """
+        Leases the document to the annotator, renewing its own lease or
+        taking over an expired one. Returns whether the lease is acquired.
+        """
+        from ..models import DocumentLease
+
+        lookup = self.get_document_lease_lookup(document)
+        now = timezone.now()
+        expires = now + timedelta(seconds=self.lease_duration)
+
+        renewed = DocumentLease.objects\
+            .filter(**lookup)\
+            .filter(Q(annotator=annotator) | Q(expires__lte=now))\
+            .update(annotator=annotator, expires=expires)
+
+        if renewed:
+            return True
+
+        try:
+            with transaction.atomic():
+                DocumentLease.objects.create(
+                    annotator=annotator, expires=expires, **lookup)
+        except IntegrityError:
+            return False
+
+        return True
+
+    def release_lease(self, document):
+        """
+        Releases any lease on the document
+        """
+        from ..models import DocumentLease
+
+        DocumentLease.objects\
+            .filter(**self.get_document_lease_lookup(document))\
+            .delete()
+
+    def get_leased_unlabelled_document(self, annotator):
+        """
+        Picks the next unlabelled document and leases it to the annotator,
+        picking again when another annotator leased it first
+        """
+        for attempt in range(self.lease_attempts):
+            document = self.pick_unlabelled_document(annotator)
+
+            if document is None or self.acquire_lease(document, annotator):
+                return document
+
+        return None
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import random
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    Max)
+
+from ..exceptions import ImproperlyConfigured
+
+
+RANDOM_SAMPLING = 'random'
+POOLED_SAMPLING = 'pooled'
+INDEXED_SAMPLING = 'indexed'
+SHUFFLED_SAMPLING = 'shuffled'
+STRATIFIED_SAMPLING = 'stratified'
+
+
+def stable_hash(*parts):
+    """
+    Returns a stable positive 63 bits integer hash of the parts,
+    suitable for a signed 64 bits database column
+    """
+    key = ':'.join(str(part) for part in parts).encode('utf-8')
+    return int(hashlib.md5(key).hexdigest()[:16], 16) >> 1
+
+
+def serialize_stratum(values):
+    """
+    Serializes strata fields values as a JSON list
+    """
+    return json.dumps(list(values), cls=DjangoJSONEncoder)
+
+
+class ShuffledSamplingMixin(object):
+    """
+    Adds a deterministic shuffled order of documents.
+
+    Each document gets a stored and indexed hash-based sort key. Each
+    annotator starts at a position derived from its own hash and moves
+    forward in the permutation, so that picking the next document is an
+    indexed range seek, reproducible across sessions, and annotators are
+    spread across the permutation.
+    """
+    sampling = RANDOM_SAMPLING
+    shuffle_seed = ''
+
+    def get_sort_key(self, document_id):
+        """
+        Returns the sort key of the document
+        """
+        return stable_hash(self.shuffle_seed, self.get_name(), document_id)
+
+    def sync_sort_keys(self, batch_size=1000, after_pk=None):
+        """
+        Creates missing sort keys for the queryset documents, or only
+        those after `after_pk` when given, and returns the number
+        of created sort keys
+        """
+        from django.contrib.contenttypes.models import ContentType
+        from ..models import DocumentSortKey
+
+        queryset = self.get_queryset()
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        model_name = self.get_name()
+
+        created = 0
+        last_pk = after_pk
+
+        while True:
+            batch = queryset.order_by('pk')
+
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+
+            document_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+
+            if not document_ids:
+                break
+
+            last_pk = document_ids[-1]
+
+            existing_ids = set(
+                DocumentSortKey.objects.filter(
+                    model_name=model_name,
+                    document_content_type=content_type,
+                    document_id__in=document_ids)
+                .values_list('document_id', flat=True))
+
+            sort_keys = [
+                DocumentSortKey(
+                    model_name=model_name,
+                    document_content_type=content_type,
+                    document_id=document_id,
+                    sort_key=self.get_sort_key(document_id))
+                for document_id in document_ids
+                if document_id not in existing_ids
+            ]
+
+            DocumentSortKey.objects.bulk_create(sort_keys)
+            created += len(sort_keys)
+
+        return created
+
+    def sync_new_sort_keys(self, batch_size=1000):
+        """
+        Creates the sort keys of the documents added after the last
+        document having a sort key, and returns their number
+        """
+        from ..models import DocumentSortKey
+
+        last_pk = DocumentSortKey.objects\
+            .filter(model_name=self.get_name())\
+            .aggregate(last_pk=Max('document_id'))['last_pk']
+
+        return self.sync_sort_keys(batch_size=batch_size, after_pk=last_pk)
+
+    def get_annotator_start_position(self, annotator):
+        """
+        Returns the initial position of the annotator in the permutation
+        """
+        return stable_hash(self.shuffle_seed, self.get_name(), 'annotator', annotator)
+
+    def get_shuffled_unlabelled_document(self, annotator):
+        """
+        Returns the next unlabelled document after the annotator position
+        in the permutation, wrapping around at the end.
+
+        Sort keys of new documents are created on the fly. Documents still
+        missing a sort key are picked randomly once every document having
+        a sort key is labelled.
+        """
+        from ..models import (
+            AnnotatorCursor,
+            DocumentSortKey)
+
+        model_name = self.get_name()
+        self.sync_new_sort_keys()
+
+        try:
+            position = AnnotatorCursor.objects.get(
+                model_name=model_name, annotator=annotator).position
+        except AnnotatorCursor.DoesNotExist:
+            position = self.get_annotator_start_position(annotator)
+
+        labelled_ids = self.get_labelled_documents_queryset()\
+            .values_list('document_id', flat=True)
+
+        sort_keys = DocumentSortKey.objects\
+            .filter(
+                model_name=model_name,
+                document_id__in=self.get_queryset().values('pk'))\
+            .exclude(document_id__in=labelled_ids)
+
+        if self.lease_duration:
+            sort_keys = sort_keys.exclude(
+                document_id__in=self.get_leased_document_ids(annotator))
+
+        sort_keys = sort_keys\
+            .order_by('sort_key')\
+            .values_list('document_id', 'sort_key')
+
+        # Seek after the position, then wrap around
+        candidates = sort_keys.filter(sort_key__gt=position)[:1] or sort_keys[:1]
+
+        if not candidates:
+            return self.get_random_unlabelled_document(annotator)
+
+        document_id, sort_key = candidates[0]
+
+        AnnotatorCursor.objects.update_or_create(
+            model_name=model_name,
+            annotator=annotator,
+            defaults={
+                'position': sort_key
+            })
+
+        try:
+            return self.get_queryset().get(pk=document_id)
+        except self.get_queryset().model.DoesNotExist:
+            return None
+
+
+class StratifiedSamplingMixin(object):
+    """
+    Adds stratified sampling of documents.
+
+    Documents are grouped in strata by the values of the `strata` fields
+    expressions. Labelled and unlabelled counts of each stratum are stored,
+    computed by `sync_strata_counts`, and updated when a document is
+    labelled, along with the documents added since the last counted one.
+    The next document is picked randomly in the stratum having the fewest
+    labelled documents, by seeking a random primary key of the stratum.
+    """
+    strata = ()
+
+    def get_strata(self):
+        """
+        Returns the strata fields expressions
+        Raises `ImproperlyConfigured` when not set
+        """
+        if not self.strata:
+            raise ImproperlyConfigured("%(cls)s is missing strata." % {
+                'cls': self.__class__.__name__
+            })
+
+        return self.strata
+
+    def count_strata(self, queryset):
+        """
+        Returns the (number of documents, last document primary key)
+        of each serialized stratum of the queryset
+        """
+        return dict(
+            (serialize_stratum(row[:-2]), row[-2:])
+            for row in queryset.order_by().values_list(*self.get_strata())
+            .annotate(count=Count('pk'), last_pk=Max('pk')))
+
+    def sync_strata_counts(self):
+        """
+        Recounts labelled and unlabelled documents of every stratum
+        and returns the number of strata
+        """
+        from ..models import StratumCount
+
+        model_name = self.get_name()
+
+        totals = self.count_strata(self.get_queryset())
+        unlabelled = self.count_strata(self.get_unlabelled_documents_queryset())
+        last_pk = max([last_pk for count, last_pk in totals.values()] or [0])
+
+        with transaction.atomic():
+            StratumCount.objects.filter(model_name=model_name).delete()
+            StratumCount.objects.bulk_create([
+                StratumCount(
+                    model_name=model_name,
+                    stratum=stratum,
+                    labelled=total - unlabelled.get(stratum, (0,))[0],
+                    unlabelled=unlabelled.get(stratum, (0,))[0],
+                    last_document_id=last_pk)
+                for stratum, (total, stratum_last_pk) in totals.items()
+            ])
+
+        return len(totals)
+
+    def count_new_strata_documents(self):
+        """
+        Adds the documents created after the last counted document to the
+        counts of their strata, creating the new strata, and returns their
+        number. Every document is counted when no stratum is stored yet.
+        """
+        from ..models import StratumCount
+
+        model_name = self.get_name()
+        last_pk = StratumCount.objects\
+            .filter(model_name=model_name)\
+            .aggregate(last_pk=Max('last_document_id'))['last_pk']
+
+        queryset = self.get_queryset()
+        unlabelled_queryset = self.get_unlabelled_documents_queryset()
+
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+            unlabelled_queryset = unlabelled_queryset.filter(pk__gt=last_pk)
+
+        totals = self.count_strata(queryset)
+
+        if not totals:
+            return 0
+
+        unlabelled = self.count_strata(unlabelled_queryset)
+
+        for stratum, (total, stratum_last_pk) in totals.items():
+            stratum_unlabelled = unlabelled.get(stratum, (0,))[0]
+
+            stratum_count, created = StratumCount.objects.get_or_create(
+                model_name=model_name, stratum=stratum)
+
+            StratumCount.objects\
+                .filter(pk=stratum_count.pk)\
+                .update(
+                    labelled=F('labelled') + total - stratum_unlabelled,
+                    unlabelled=F('unlabelled') + stratum_unlabelled,
+                    last_document_id=stratum_last_pk)
+
+        return sum(total for total, stratum_last_pk in totals.values())
+
+    def get_document_stratum(self, document):
+        """
+        Returns the serialized stratum of the document
+        """
+        values = self.get_queryset()\
+            .filter(pk=document.pk)\
+            .values_list(*self.get_strata())[0]
+
+        return serialize_stratum(values)
+
+    def update_stratum_counts(self, document):
+        """
+        Moves the newly labelled document from the unlabelled
+        to the labelled count of its stratum, unless not counted yet
+        """
+        from ..models import StratumCount
+
+        StratumCount.objects\
+            .filter(
+                model_name=self.get_name(),
+                stratum=self.get_document_stratum(document),
+                last_document_id__gte=document.pk,
+                unlabelled__gt=0)\
+            .update(
+                labelled=F('labelled') + 1,
+                unlabelled=F('unlabelled') - 1)
+
+    def get_stratified_unlabelled_document(self, annotator=None):
+        """
+        Returns a random unlabelled document of the stratum having the
+        fewest labelled documents. Falls back to a random unlabelled
+        document when no counted stratum has unlabelled documents left.
+        """
+        from ..models import StratumCount
+
+        strata = self.get_strata()
+        counts = StratumCount.objects\
+            .filter(model_name=self.get_name(), unlabelled__gt=0)\
+            .order_by('labelled', 'pk')
+
+        for stratum_count in counts:
+            unlabelled = self.get_unlabelled_documents_queryset()\
+                .filter(**stratum_count.get_filters(strata))
+
+            documents = self.exclude_leased_documents(unlabelled, annotator)\
+                .order_by('pk')
+            first = list(documents[:1])
+
+            if first:
+                # Seek after a random primary key of the stratum,
+                # then wrap around to its first document
+                pivot = random.randint(
+                    first[0].pk, max(first[0].pk, stratum_count.last_document_id or 0))
+
+                return (list(documents.filter(pk__gte=pivot)[:1]) or first)[0]
+
+            # Leased by other annotators
+            if self.lease_duration and unlabelled.exists():
+                continue
+
+            # Stale count, nothing left in this stratum
+            StratumCount.objects\
+                .filter(pk=stratum_count.pk)\
+                .update(unlabelled=0)
+
+        return self.get_random_unlabelled_document(annotator)
@@ -0,0 +1,182 @@
+import json
+import random
+from bisect import bisect_right
+
+from django.db.models import (
+    Max,
+    Min)
+
+from ..exceptions import ImproperlyConfigured
+
+from .sampling import stable_hash
+
+
+class ShardedPoolMixin(object):
+    """
+    Splits the unlabelled documents pool in shards.
+
+    When `shards` is greater than 1, the primary key range of the queryset
+    is split in `shards` contiguous ranges, filtered with primary key
+    lookups, and each annotator is pinned to a shard derived from its own
+    hash. The bounds are stored and only moved by `sync_shard_bounds`, run
+    by the `learnit_sync_sampling` command, documents added above the last
+    bound belonging to the last shard meanwhile.
+
+    Annotators pick random documents in their shard first, so that
+    concurrent annotators rarely compete for the same documents, and move
+    to the next shards when it is exhausted. Random primary keys of the
+    shard are looked up, `shard_pick_sample` at a time, so that every
+    document is picked with the same probability, falling back to the
+    documents following a random primary key when none is found.
+
+    Documents must have integer primary keys.
+    """
+    shards = 1
+    shard_pick_sample = 20
+
+    def get_shards(self):
+        """
+        Returns the number of shards
+        Raises `ImproperlyConfigured` when not a positive integer
+        """
+        if not isinstance(self.shards, int) or self.shards < 1:
+            raise ImproperlyConfigured("%(cls)s shards must be a positive integer." % {
+                'cls': self.__class__.__name__
+            })
+
+        return self.shards
+
+    def sync_shard_bounds(self):
+        """
+        Splits the primary key range of the queryset in `shards` ranges,
+        stores and returns their `shards + 1` bounds, or None when the
+        queryset is empty
+        """
+        from ..models import ShardBounds
+
+        shards = self.get_shards()
+        aggregates = self.get_queryset().aggregate(low=Min('pk'), high=Max('pk'))
+
+        if aggregates['low'] is None:
+            return None
+
+        low = aggregates['low']
+        span = aggregates['high'] + 1 - low
+        bounds = [low + span * i // shards for i in range(shards + 1)]
+
+        ShardBounds.objects.update_or_create(
+            model_name=self.get_name(),
+            defaults={
+                'shards': shards,
+                'bounds': json.dumps(bounds)
+            })
+
+        return bounds
+
+    def get_shard_bounds(self):
+        """
+        Returns the stored bounds of the shards, shard `i` holding the
+        documents with `bounds[i] <= pk < bounds[i + 1]` except for the
+        unbounded first and last shards. Bounds are computed when missing
+        or when the number of shards changed.
+        """
+        from ..models import ShardBounds
+
+        shard_bounds = ShardBounds.objects.filter(model_name=self.get_name()).first()
+
+        if shard_bounds is None or shard_bounds.shards != self.get_shards():
+            return self.sync_shard_bounds()
+
+        return shard_bounds.get_bounds()
+
+    def get_document_shard(self, document_id, bounds=None):
+        """
+        Returns the shard of the document
+        """
+        bounds = bounds or self.get_shard_bounds()
+
+        return min(max(bisect_right(bounds, int(document_id)) - 1, 0), self.get_shards() - 1)
+
+    def get_annotator_shard(self, annotator):
+        """
+        Returns the shard the annotator is pinned to
+        """
+        return stable_hash(self.get_name(), 'shard', annotator) % self.get_shards()
+
+    def filter_shard(self, queryset, shard, bounds=None):
+        """
+        Filters the queryset documents of the shard
+        """
+        bounds = bounds or self.get_shard_bounds()
+
+        if bounds is None:
+            return queryset.none()
+
+        if shard > 0:
+            queryset = queryset.filter(pk__gte=bounds[shard])
+
+        if shard < self.get_shards() - 1:
+            queryset = queryset.filter(pk__lt=bounds[shard + 1])
+
+        return queryset
+
+    def get_random_shard_documents(self, pool, low, high, count):
+        """
+        Returns up to `count` random documents of the shard pool,
+        between the `low` and `high` primary keys
+        """
+        documents = []
+
+        if high > low:
+            # Uniform among the sampled primary keys found in the pool
+            sample = set(
+                random.randrange(low, high)
+                for i in range(min(self.shard_pick_sample, high - low)))
+            documents = list(pool.filter(pk__in=sample))
+            random.shuffle(documents)
+            documents = documents[:count]
+
+        if len(documents) < count:
+            # Seek the documents following a random primary key of the
+            # shard, wrapping around to the start of the shard
+            pool = pool.exclude(pk__in=[document.pk for document in documents])
+            pivot = random.randrange(low, high) if high > low else low
+
+            documents.extend(pool.filter(pk__gte=pivot).order_by('pk')[:count - len(documents)])
+
+            if len(documents) < count:
+                documents.extend(pool.filter(pk__lt=pivot).order_by('pk')[:count - len(documents)])
+
+        return documents
+
+    def get_random_pool_documents(self, queryset, count=1, annotator=None):
+        """
+        Returns up to `count` random documents of the queryset, in the shard
+        of the annotator first when sharded
+        """
+        shards = self.get_shards()
+
+        if shards == 1 or annotator is None:
+            return list(queryset.order_by('?')[:count])
+
+        bounds = self.get_shard_bounds()
+
+        if bounds is None:
+            return []
+
+        first = self.get_annotator_shard(annotator)
+        documents = []
+
+        for i in range(shards):
+            shard = (first + i) % shards
+
+            documents.extend(self.get_random_shard_documents(
+                self.filter_shard(queryset, shard, bounds),
+                bounds[shard],
+                bounds[shard + 1],
+                count - len(documents)))
+
+            if len(documents) == count:
+                break
+
+        return documents
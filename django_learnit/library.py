@@ -1,12 +1,140 @@
+import json
+import logging
+import time
 from importlib import import_module
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
 from django.apps import apps
+from django.conf import settings
+from django.utils.module_loading import (
+    import_string,
+    module_has_submodule)
 
 from .exceptions import (
+    ImproperlyConfigured,
     InvalidLearningModel,
     DuplicateLearningModelName)
 from .learning.base import LearningModel
 
+logger = logging.getLogger(__name__)
+
+# Import time in seconds of each library module, recorded on first import
+library_import_times = {}
+
+
+def check_learning_model_class(model_class):
+    """
+    Raises `InvalidLearningModel` when `model_class`
+    does not inherit from `LearningModel`
+    """
+    if not isinstance(model_class, type) or not issubclass(model_class, LearningModel):
+        raise InvalidLearningModel(
+            "%(cls)s model does not inherit from `LearningModel`." % {
+                'cls': getattr(model_class, '__name__', model_class)
+            })
+
+
+class LearningModelDeclaration(object):
+    """
+    Learning model registered by name, either with its class or with the
+    dotted path to its class. The class is imported and instantiated on
+    first use only, so that heavy machine learning imports and model loading
+    do not slow down Django startup.
+    """
+
+    def __init__(self, name, model_class=None, path=None, **metadata):
+        self.name = name
+        self.model_class = model_class
+        self.path = path
+        self.metadata = metadata
+        self.instance = None
+
+    def get_class_name(self):
+        """
+        Returns the model class name or dotted path when not imported yet
+        """
+        if self.model_class is not None:
+            return self.model_class.__name__
+
+        return self.path
+
+    def get_model_class(self):
+        """
+        Imports and returns the learning model class
+        """
+        if self.model_class is None:
+            model_class = import_string(self.path)
+            check_learning_model_class(model_class)
+
+            if model_class.get_name() != self.name:
+                raise ImproperlyConfigured(
+                    "%(path)s is declared as '%(name)s' but is named '%(model_name)s'." % {
+                        'path': self.path,
+                        'name': self.name,
+                        'model_name': model_class.get_name()
+                    })
+
+            self.model_class = model_class
+
+        return self.model_class
+
+    def get_instance(self):
+        """
+        Returns the learning model instance, created on first call
+        """
+        if self.instance is None:
+            self.instance = self.get_model_class()()
+
+        return self.instance
+
+    def is_loaded(self):
+        """
+        Returns whether the learning model has been instantiated
+        """
+        return self.instance is not None
+
+
+class LearningModelRegistry(Mapping):
+    """
+    Mapping of learning model names to learning model instances.
+    Learning models are instantiated when accessed.
+    """
+
+    def __init__(self):
+        self.declarations = {}
+
+    def add(self, declaration):
+        """
+        Adds a `LearningModelDeclaration` to the registry.
+
+        Adding a model whose name is already registered raises a
+        `DuplicateLearningModelName` exception
+        """
+        if declaration.name in self.declarations:
+            raise DuplicateLearningModelName(
+                "%(cls)s uses '%(name)s' that is already exists in the model library" % {
+                    'cls': declaration.get_class_name(),
+                    'name': declaration.name
+                })
+
+        self.declarations[declaration.name] = declaration
+
+    def __getitem__(self, name):
+        return self.declarations[name].get_instance()
+
+    def __contains__(self, name):
+        return name in self.declarations
+
+    def __iter__(self):
+        return iter(self.declarations)
+
+    def __len__(self):
+        return len(self.declarations)
+
 
 class Library(object):
 
@@ -14,61 +142,73 @@ class Library(object):
         """
         Initialize an empty learning models library
         """
-        self.learning_models = {}
+        self.learning_models = LearningModelRegistry()
 
     def learning_model(self, model_class):
         """
         Registers a `model_class` sublassing `LearningModel` in the library.
+        The model is instantiated on first use.
 
         Adding a model whose name is already registered raises a
         `DuplicateLearningModelName` exception
         """
         # Check subclass
-        if not issubclass(model_class, LearningModel):
-            raise InvalidLearningModel(
-                "%(cls)s model does not inherit from `LearningModel`." % {
-                    'cls': model_class.__name__
-                })
+        check_learning_model_class(model_class)
 
-        # Check model name is unique
-        model_name = model_class.get_name()
+        # Add model to the library
+        self.learning_models.add(
+            LearningModelDeclaration(model_class.get_name(), model_class=model_class))
 
-        if model_name in self.learning_models:
-            raise DuplicateLearningModelName(
-                "%(cls)s uses '%(name)s' that is already exists in the model library" % {
-                    'cls': model_class.__name__,
-                    'name': model_name
-                })
+    def lazy_learning_model(self, name, path, **metadata):
+        """
+        Registers the learning model `name` from the dotted `path` to its
+        class. The class is only imported on first use, extra `metadata`
+        is kept on the declaration.
+
+        Adding a model whose name is already registered raises a
+        `DuplicateLearningModelName` exception
+        """
+        self.learning_models.add(
+            LearningModelDeclaration(name, path=path, **metadata))
 
-        # Add model to the library
-        self.learning_models[model_name] = model_class()
+
+def timed_import_module(name):
+    """
+    Imports the module and records its import time on first import
+    """
+    start = time.time()
+    module = import_module(name)
+    library_import_times.setdefault(name, time.time() - start)
+
+    return module
 
 
 def import_library(name):
     """
     Imports and returns the register attribute in library module
     """
-    module = import_module(name)
+    module = timed_import_module(name)
     return module.register
 
 
 def get_installed_libraries():
     """
     Returns registered libraries in any `learning_models` module
-    at the root of all installed applications
+    at the root of all installed applications.
+
+    Only applications having a `learning_models` submodule are imported, so
+    import errors raised inside a `learning_models` module are not hidden.
     """
     libraries = []
 
     candidates = [
         '%s.learning_models' % app_config.name
         for app_config in apps.get_app_configs()
+        if module_has_submodule(app_config.module, 'learning_models')
     ]
 
     for candidate in candidates:
-        try:
-            module = import_module(candidate)
-        except ImportError:
-            continue
+        module = timed_import_module(candidate)
 
         if hasattr(module, 'register'):
             libraries.append(candidate)
@@ -76,29 +216,79 @@ def get_installed_libraries():
     return libraries
 
 
+def read_libraries_manifest(path):
+    """
+    Returns the libraries listed in the JSON manifest at `path`
+    or None when the manifest does not exist
+    """
+    try:
+        with open(path) as manifest:
+            return json.load(manifest)['libraries']
+    except IOError:
+        return None
+
+
+def write_libraries_manifest(path, libraries):
+    """
+    Writes the libraries in a JSON manifest at `path`
+    """
+    with open(path, 'w') as manifest:
+        json.dump({'libraries': libraries}, manifest, indent=2)
+
+
+def get_libraries():
+    """
+    Returns the learning model libraries to register, from the
+    `LEARNIT_LIBRARIES` setting, the manifest at the `LEARNIT_MANIFEST`
+    path, or by discovering installed applications, in this order.
+    """
+    libraries = getattr(settings, 'LEARNIT_LIBRARIES', None)
+
+    if libraries is not None:
+        return list(libraries)
+
+    manifest_path = getattr(settings, 'LEARNIT_MANIFEST', None)
+
+    if manifest_path:
+        libraries = read_libraries_manifest(manifest_path)
+
+        if libraries is not None:
+            return libraries
+
+    return get_installed_libraries()
+
+
 def get_registered_learning_models(libraries):
     """
-    Returns a dict with registered learning models as (model_name: model_obj)
+    Returns a `LearningModelRegistry` with registered learning models
+    as (model_name: model_obj)
     """
-    learning_models = {}
+    learning_models = LearningModelRegistry()
 
     for library in libraries:
         register = import_library(library)
 
-        for model_name, model_obj in register.learning_models.items():
-            # Check model name is unique
-            if model_name in learning_models:
-                raise DuplicateLearningModelName(
-                    "%(cls)s uses '%(name)s' that is already exists in the model library" % {
-                        'cls': model_obj.__class__.__name__,
-                        'name': model_name
-                    })
-
-            learning_models[model_name] = model_obj
+        # Raises on duplicate model names
+        for declaration in register.learning_models.declarations.values():
+            learning_models.add(declaration)
 
     return learning_models
 
 
+def log_library_import_times():
+    """
+    Logs the import time of each library module, slowest first
+    """
+    import_times = sorted(
+        library_import_times.items(), key=lambda item: item[1], reverse=True)
+
+    for library, seconds in import_times:
+        logger.debug("%(library)s imported in %(ms).1fms", {
+            'library': library,
+            'ms': seconds * 1000
+        })
+
+
 def get_learning_model(learning_model_name):
     """
     Returns the registered learning model or None
@@ -0,0 +1,48 @@
+from django.apps import apps
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+
+from ...exceptions import ImproperlyConfigured
+
+
+class Command(BaseCommand):
+    help = "Compacts the feature stores of learning models"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_names', nargs='*',
+            help="Learning model names, defaults to all learning models with a feature store")
+        parser.add_argument(
+            '--prune', action='store_true', default=False,
+            help="Also delete the vectors of other feature extractor versions")
+
+    def handle(self, *args, **options):
+        learning_models = apps.get_app_config('django_learnit').learning_models
+        model_names = options['model_names']
+
+        for model_name in model_names:
+            if model_name not in learning_models:
+                raise CommandError("Learning model `%(name)s` is not registered" % {
+                    'name': model_name
+                })
+
+        for model_name in sorted(model_names or learning_models):
+            try:
+                store = learning_models[model_name].get_feature_store()
+            except ImproperlyConfigured:
+                if model_names:
+                    raise CommandError("Learning model `%(name)s` has no feature store" % {
+                        'name': model_name
+                    })
+                continue
+
+            reclaimed = store.compact()
+            pruned = store.prune() if options['prune'] else 0
+
+            self.stdout.write(
+                "%(name)s: %(reclaimed)d rows reclaimed, %(pruned)d versions pruned" % {
+                    'name': model_name,
+                    'reclaimed': reclaimed,
+                    'pruned': pruned
+                })
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+
+from ...library import (
+    get_installed_libraries,
+    write_libraries_manifest)
+
+
+class Command(BaseCommand):
+    help = "Discovers learning model libraries and writes them in a manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=None,
+            help="Manifest path, defaults to the LEARNIT_MANIFEST setting")
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'LEARNIT_MANIFEST', None)
+
+        if not path:
+            raise CommandError("No manifest path, set LEARNIT_MANIFEST or use --output.")
+
+        libraries = get_installed_libraries()
+        write_libraries_manifest(path, libraries)
+
+        self.stdout.write("%(count)d libraries written to %(path)s" % {
+            'count': len(libraries),
+            'path': path
+        })
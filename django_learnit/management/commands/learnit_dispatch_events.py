@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from ...models import LabelEvent
+
+
+class Command(BaseCommand):
+    help = "Dispatches the pending label write events"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Number of events read at once")
+        parser.add_argument(
+            '--max-attempts', type=int, default=5,
+            help="Number of dispatches of an event before giving up")
+
+    def handle(self, *args, **options):
+        dispatched, failed, dead = LabelEvent.objects.dispatch(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'])
+
+        self.stdout.write("%(dispatched)d events dispatched, %(failed)d failed, %(dead)d dead" % {
+            'dispatched': dispatched,
+            'failed': failed,
+            'dead': dead
+        })
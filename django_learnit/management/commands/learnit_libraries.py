@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from ...library import library_import_times
+
+
+class Command(BaseCommand):
+    help = "Reports learning model libraries import cost and registered models"
+
+    def handle(self, *args, **options):
+        import_times = sorted(
+            library_import_times.items(), key=lambda item: item[1], reverse=True)
+
+        for library, seconds in import_times:
+            self.stdout.write("%(library)s: %(ms).1fms" % {
+                'library': library,
+                'ms': seconds * 1000
+            })
+
+        app_config = apps.get_app_config('django_learnit')
+        declarations = app_config.learning_models.declarations
+
+        for name in sorted(declarations):
+            declaration = declarations[name]
+
+            self.stdout.write("  %(name)s (%(cls)s)%(loaded)s" % {
+                'name': name,
+                'cls': declaration.get_class_name(),
+                'loaded': ' [loaded]' if declaration.is_loaded() else ''
+            })
@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+
+from ...models import BuildRun
+
+
+class Command(BaseCommand):
+    help = "Stores the predictions of unlabelled documents used for prelabelling"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_names', nargs='*',
+            help="Learning model names, defaults to all learning models using prelabelling")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of documents predicted at once")
+
+    def handle(self, *args, **options):
+        learning_models = apps.get_app_config('django_learnit').learning_models
+        model_names = options['model_names']
+
+        for model_name in model_names:
+            if model_name not in learning_models:
+                raise CommandError("Learning model `%(name)s` is not registered" % {
+                    'name': model_name
+                })
+
+        if not model_names:
+            model_names = [
+                model_name for model_name, learning_model in learning_models.items()
+                if learning_model.prelabelling
+            ]
+
+        for model_name in sorted(model_names):
+            learning_model = learning_models[model_name]
+            build_run = learning_model.run_predictions(batch_size=options['batch_size'])
+
+            if build_run.status == BuildRun.FAILED:
+                raise CommandError("%(name)s: prediction failed\n%(error)s" % {
+                    'name': model_name,
+                    'error': build_run.error
+                })
+
+            self.stdout.write("%(name)s: %(stored)d predictions stored" % {
+                'name': model_name,
+                'stored': build_run.stages.get(name='prediction', depth=0).rows
+            })
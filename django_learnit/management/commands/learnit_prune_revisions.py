@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import LabelRevision
+
+
+class Command(BaseCommand):
+    help = "Prunes and compacts the label history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=None,
+            help="Number of latest revisions to keep per labelled document")
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Delete revisions older than this number of days")
+        parser.add_argument(
+            '--model', dest='model_name', default=None,
+            help="Only prune the history of this learning model")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of revisions deleted or compacted per transaction")
+
+    def handle(self, *args, **options):
+        before = None
+
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+
+        deleted, compacted = LabelRevision.objects.prune(
+            keep=options['keep'],
+            before=before,
+            model_name=options['model_name'],
+            batch_size=options['batch_size'])
+
+        self.stdout.write("%(deleted)d revisions deleted, %(compacted)d compacted" % {
+            'deleted': deleted,
+            'compacted': compacted
+        })
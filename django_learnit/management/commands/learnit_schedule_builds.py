@@ -0,0 +1,87 @@
+import threading
+
+from django.apps import apps
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "Builds the learning models having reached a rebuild threshold"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_names', nargs='*',
+            help="Learning model names, defaults to all learning models")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of learning models built concurrently")
+
+    def run_builds(self, learning_models, workers):
+        """
+        Builds the learning models with up to `workers` threads
+        and returns their build runs
+        """
+        if workers <= 1:
+            return [learning_model.run_build() for learning_model in learning_models]
+
+        pending = list(learning_models)
+        build_runs = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        learning_model = pending.pop(0)
+
+                    build_run = learning_model.run_build()
+
+                    with lock:
+                        build_runs.append(build_run)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker)
+            for i in range(min(workers, len(learning_models)))
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return build_runs
+
+    def handle(self, *args, **options):
+        learning_models = apps.get_app_config('django_learnit').learning_models
+        model_names = options['model_names']
+
+        for model_name in model_names:
+            if model_name not in learning_models:
+                raise CommandError("Learning model `%(name)s` is not registered" % {
+                    'name': model_name
+                })
+
+        eligible = [
+            learning_models[model_name]
+            for model_name in sorted(model_names or learning_models)
+            if learning_models[model_name].should_rebuild()
+        ]
+
+        build_runs = self.run_builds(eligible, options['workers'])
+
+        for build_run in sorted(build_runs, key=lambda build_run: build_run.model_name):
+            self.stdout.write("%(name)s: build %(status)s in %(seconds).1fs" % {
+                'name': build_run.model_name,
+                'status': build_run.status,
+                'seconds': (build_run.finished - build_run.started).total_seconds()
+            })
+
+        if not build_runs:
+            self.stdout.write("No learning model to build")
@@ -0,0 +1,43 @@
+from django.apps import apps
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+
+from ...learning.sampling import SHUFFLED_SAMPLING
+
+
+class Command(BaseCommand):
+    help = "Creates missing shuffled sampling sort keys of learning models documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_names', nargs='*',
+            help="Learning model names, defaults to all shuffled learning models")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of documents per batch")
+
+    def handle(self, *args, **options):
+        learning_models = apps.get_app_config('django_learnit').learning_models
+        model_names = options['model_names']
+
+        for model_name in model_names:
+            if model_name not in learning_models:
+                raise CommandError("Learning model `%(name)s` is not registered" % {
+                    'name': model_name
+                })
+
+        if not model_names:
+            model_names = [
+                model_name for model_name, learning_model in learning_models.items()
+                if learning_model.sampling == SHUFFLED_SAMPLING
+            ]
+
+        for model_name in sorted(model_names):
+            created = learning_models[model_name].sync_sort_keys(
+                batch_size=options['batch_size'])
+
+            self.stdout.write("%(name)s: %(created)d sort keys created" % {
+                'name': model_name,
+                'created': created
+            })
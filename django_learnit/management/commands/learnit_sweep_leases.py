@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import DocumentLease
+
+
+class Command(BaseCommand):
+    help = "Deletes expired document leases"
+
+    def handle(self, *args, **options):
+        expired = DocumentLease.objects.filter(expires__lte=timezone.now())
+
+        deleted = expired.count()
+        expired.delete()
+
+        self.stdout.write("%(deleted)d expired leases deleted" % {
+            'deleted': deleted
+        })
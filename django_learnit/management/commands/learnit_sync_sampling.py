@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+
+from ...learning.sampling import RANDOM_SAMPLING
+
+
+class Command(BaseCommand):
+    help = "Synchronizes the stored sampling data of learning models"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'model_names', nargs='*',
+            help="Learning model names, defaults to all learning models sharded or not sampled randomly")
+
+    def handle(self, *args, **options):
+        learning_models = apps.get_app_config('django_learnit').learning_models
+        model_names = options['model_names']
+
+        for model_name in model_names:
+            if model_name not in learning_models:
+                raise CommandError("Learning model `%(name)s` is not registered" % {
+                    'name': model_name
+                })
+
+        if not model_names:
+            model_names = [
+                model_name for model_name, learning_model in learning_models.items()
+                if learning_model.sampling != RANDOM_SAMPLING or learning_model.get_shards() > 1
+            ]
+
+        for model_name in sorted(model_names):
+            learning_model = learning_models[model_name]
+            learning_model.sync_sampling()
+
+            self.stdout.write("%(name)s: %(sampling)s sampling synchronized" % {
+                'name': model_name,
+                'sampling': learning_model.sampling
+            })
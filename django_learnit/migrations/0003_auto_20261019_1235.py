@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 12:35
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0002_auto_20160907_1246'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('revision', models.PositiveIntegerField()),
+                ('is_diff', models.BooleanField(default=False)),
+                ('value', models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='labelleddocument',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='labelrevision',
+            name='labelled_document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='django_learnit.LabelledDocument'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='labelrevision',
+            unique_together=set([('labelled_document', 'revision')]),
+        ),
+    ]
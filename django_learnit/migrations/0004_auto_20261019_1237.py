@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 12:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('django_learnit', '0003_auto_20261019_1235'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnotatorCursor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('model_name', models.TextField()),
+                ('annotator', models.CharField(max_length=255)),
+                ('position', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DocumentSortKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('document_id', models.PositiveIntegerField()),
+                ('sort_key', models.BigIntegerField()),
+                ('document_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='annotatorcursor',
+            unique_together=set([('model_name', 'annotator')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='documentsortkey',
+            unique_together=set([('model_name', 'document_content_type', 'document_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='documentsortkey',
+            index_together=set([('model_name', 'sort_key')]),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 12:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0004_auto_20261019_1237'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StratumCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('stratum', models.TextField()),
+                ('labelled', models.PositiveIntegerField(default=0)),
+                ('unlabelled', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='stratumcount',
+            unique_together=set([('model_name', 'stratum')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='stratumcount',
+            index_together=set([('model_name', 'unlabelled', 'labelled')]),
+        ),
+    ]
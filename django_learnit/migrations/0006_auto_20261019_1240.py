@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 12:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('django_learnit', '0005_auto_20261019_1239'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentLease',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('document_id', models.PositiveIntegerField()),
+                ('annotator', models.CharField(max_length=255)),
+                ('expires', models.DateTimeField()),
+                ('document_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='documentlease',
+            unique_together=set([('model_name', 'document_content_type', 'document_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='documentlease',
+            index_together=set([('model_name', 'expires')]),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 12:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('django_learnit', '0006_auto_20261019_1240'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentPrediction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('model_name', models.TextField()),
+                ('document_id', models.PositiveIntegerField()),
+                ('value', models.TextField()),
+                ('document_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='documentprediction',
+            unique_together=set([('model_name', 'document_content_type', 'document_id')]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('django_learnit', '0007_auto_20261019_1253'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('model_name', models.TextField()),
+                ('document_id', models.PositiveIntegerField()),
+                ('revision', models.PositiveIntegerField()),
+                ('created_label', models.BooleanField(default=False)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('document_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:01
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0008_labelevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('started', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('labels', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='buildrun',
+            index_together=set([('model_name', 'started')]),
+        ),
+    ]
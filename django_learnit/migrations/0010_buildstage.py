@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0009_auto_20261019_1301'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildStage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('depth', models.PositiveSmallIntegerField(default=0)),
+                ('wall_time', models.FloatField(null=True)),
+                ('cpu_time', models.FloatField(null=True)),
+                ('rows', models.BigIntegerField(null=True)),
+                ('peak_rss', models.BigIntegerField(null=True)),
+                ('profile_path', models.TextField(blank=True)),
+                ('build_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='django_learnit.BuildRun')),
+            ],
+            options={
+                'ordering': ('build_run', 'position'),
+            },
+        ),
+    ]
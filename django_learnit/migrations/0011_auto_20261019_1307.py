@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0010_buildstage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('document', 'Document'), ('token', 'Token'), ('entity', 'Entity')], max_length=10)),
+                ('label', models.TextField()),
+                ('precision', models.FloatField()),
+                ('recall', models.FloatField()),
+                ('f1', models.FloatField()),
+                ('support', models.PositiveIntegerField()),
+                ('build_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='django_learnit.BuildRun')),
+            ],
+            options={
+                'ordering': ('build_run', 'pk'),
+            },
+        ),
+        migrations.CreateModel(
+            name='EvaluationFold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.TextField()),
+                ('folds', models.PositiveSmallIntegerField()),
+                ('fold', models.PositiveSmallIntegerField()),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('predictions', models.TextField()),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='evaluationfold',
+            unique_together=set([('model_name', 'folds', 'fold')]),
+        ),
+    ]
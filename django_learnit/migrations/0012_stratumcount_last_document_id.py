@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:16
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0011_auto_20261019_1307'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stratumcount',
+            name='last_document_id',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:23
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0012_stratumcount_last_document_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labelevent',
+            name='dead',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0013_labelevent_dead'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardBounds',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('model_name', models.TextField(unique=True)),
+                ('shards', models.PositiveIntegerField()),
+                ('bounds', models.TextField()),
+            ],
+        ),
+    ]
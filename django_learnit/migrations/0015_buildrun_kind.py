@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-19 13:41
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_learnit', '0014_shardbounds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buildrun',
+            name='kind',
+            field=models.CharField(choices=[('build', 'Build'), ('prediction', 'Prediction')], default='build', max_length=10),
+        ),
+    ]
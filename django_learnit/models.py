@@ -1,8 +1,19 @@
 import json
+import logging
+from itertools import groupby
 
-from django.db import models
+from django.conf import settings
+from django.db import (
+    IntegrityError,
+    models,
+    transaction)
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+
+logger = logging.getLogger(__name__)
 
 
 class LabelledDocumentManager(models.Manager):
@@ -24,14 +35,110 @@ class LabelledDocumentManager(models.Manager):
         """
         Updates or creates the LabelledDocument instance for the given
         document and model name with the value.
+
+        A `LabelRevision` is appended in the same transaction.
         """
-        return self.update_or_create(
-            document_content_type=ContentType.objects.get_for_model(document),
-            document_id=document.pk,
-            model_name=model_name,
-            defaults={
-                'value': value
-            })
+        lookup = {
+            'document_content_type': ContentType.objects.get_for_model(document),
+            'document_id': document.pk,
+            'model_name': model_name
+        }
+
+        with transaction.atomic(using=self.db):
+            obj, created = self.select_for_update().get_or_create(
+                defaults={
+                    'value': value,
+                    'revision': 1
+                },
+                **lookup)
+
+            if created:
+                previous_value, previous_revision = None, 0
+            else:
+                previous_value, previous_revision = obj.value, obj.revision
+
+                obj.value = value
+                obj.revision = previous_revision + 1
+                obj.save(using=self.db)
+
+            LabelRevision.objects.create_for_labelled_document(
+                obj, previous_value, previous_revision)
+
+            if LabelEvent.objects.is_enabled():
+                LabelEvent.objects.build_for_labelled_document(obj, created).save(
+                    force_insert=True, using=self.db)
+
+        return obj, created
+
+    def update_or_create_for_document_models(self, document, values):
+        """
+        Updates or creates the LabelledDocument instances of the document
+        for the model names of the `values` dict, mapping model names to
+        values, in a single transaction. New labels and revisions are
+        inserted in bulk.
+
+        Returns a dict mapping model names to `(obj, created)` tuples.
+        """
+        try:
+            with transaction.atomic(using=self.db):
+                return self._bulk_update_or_create_for_document(document, values)
+        except IntegrityError:
+            # Labels concurrently created, update them one by one
+            with transaction.atomic(using=self.db):
+                return dict(
+                    (model_name, self.update_or_create_for_document(
+                        document, model_name, value))
+                    for model_name, value in values.items())
+
+    def _bulk_update_or_create_for_document(self, document, values):
+        lookup = {
+            'document_content_type': ContentType.objects.get_for_model(document),
+            'document_id': document.pk
+        }
+
+        existing = dict(
+            (obj.model_name, obj) for obj in
+            self.select_for_update().filter(model_name__in=list(values), **lookup))
+
+        self.bulk_create([
+            self.model(model_name=model_name, value=value, revision=1, **lookup)
+            for model_name, value in values.items()
+            if model_name not in existing
+        ])
+
+        results = {}
+        revisions = []
+
+        # Primary keys of bulk inserted rows are not returned by every backend
+        created = self.filter(
+            model_name__in=[name for name in values if name not in existing],
+            **lookup)
+
+        for obj in created:
+            results[obj.model_name] = (obj, True)
+            revisions.append(LabelRevision.objects.build_for_labelled_document(
+                obj, None, 0))
+
+        for model_name, obj in existing.items():
+            previous_value, previous_revision = obj.value, obj.revision
+
+            obj.value = values[model_name]
+            obj.revision = previous_revision + 1
+            obj.save(using=self.db)
+
+            results[model_name] = (obj, False)
+            revisions.append(LabelRevision.objects.build_for_labelled_document(
+                obj, previous_value, previous_revision))
+
+        LabelRevision.objects.bulk_create(revisions)
+
+        if LabelEvent.objects.is_enabled():
+            LabelEvent.objects.bulk_create([
+                LabelEvent.objects.build_for_labelled_document(obj, created)
+                for obj, created in results.values()
+            ])
+
+        return results
 
 
 class LabelledDocument(models.Model):
@@ -51,6 +158,9 @@ class LabelledDocument(models.Model):
 
     value = models.TextField()
 
+    # Number of revisions recorded in the label history
+    revision = models.PositiveIntegerField(default=0)
+
     objects = LabelledDocumentManager()
 
     class Meta:
@@ -80,3 +190,727 @@ class LabelledDocument(models.Model):
         Returns the `label` from the value
         """
         return self.deserialize_value().get('label')
+
+
+class LabelRevisionManager(models.Manager):
+
+    def create_for_labelled_document(self, labelled_document,
+                                     previous_value, previous_revision):
+        """
+        Appends the current value of the labelled document to its history.
+        """
+        revision = self.build_for_labelled_document(
+            labelled_document, previous_value, previous_revision)
+        revision.save(force_insert=True, using=self.db)
+
+        return revision
+
+    def build_for_labelled_document(self, labelled_document,
+                                    previous_value, previous_revision):
+        """
+        Returns the unsaved revision of the current value of the labelled
+        document.
+
+        The value is stored as a diff against `previous_value` when both are
+        sequences and there is a previous revision to apply it on, otherwise
+        a full snapshot is stored.
+        """
+        value = labelled_document.value
+        is_diff = False
+
+        if previous_revision > 0:
+            diff = self.model.diff_values(previous_value, value)
+
+            if diff is not None and len(diff) < len(value):
+                value = diff
+                is_diff = True
+
+        return self.model(
+            labelled_document=labelled_document,
+            revision=labelled_document.revision,
+            is_diff=is_diff,
+            value=value)
+
+    def iter_history(self, model_name=None):
+        """
+        Streams the label history as `(revision, value)` tuples ordered by
+        labelled document and revision. Diffs are resolved, so `value` is
+        always the full serialized value at that revision.
+        """
+        queryset = self.get_queryset()\
+            .order_by('labelled_document_id', 'revision')
+
+        if model_name is not None:
+            queryset = queryset.filter(labelled_document__model_name=model_name)
+
+        labelled_document_id = None
+        value = None
+
+        for revision in queryset.iterator():
+            if revision.labelled_document_id != labelled_document_id:
+                labelled_document_id = revision.labelled_document_id
+                value = None
+
+            value = revision.resolve_value(value)
+            yield revision, value
+
+    def prune(self, keep=None, before=None, model_name=None, batch_size=1000):
+        """
+        Deletes old revisions and compacts the history so that the oldest
+        remaining revision of each labelled document is a full snapshot.
+
+        Keeps the `keep` latest revisions of each labelled document and
+        deletes revisions created before `before`. The latest revision is
+        always kept. Returns a `(deleted, compacted)` tuple of counts.
+        """
+        deleted_ids = []
+        snapshots = []
+        deleted = compacted = 0
+
+        history = self.iter_history(model_name=model_name)
+
+        for _, revisions in groupby(history, lambda r: r[0].labelled_document_id):
+            revisions = list(revisions)
+            n_revisions = len(revisions)
+
+            for i, (revision, value) in enumerate(revisions):
+                is_latest = i == n_revisions - 1
+                is_outdated = (
+                    (keep is not None and i < n_revisions - keep) or
+                    (before is not None and revision.created < before))
+
+                if is_outdated and not is_latest:
+                    deleted_ids.append(revision.pk)
+                    continue
+
+                # First kept revision becomes the base snapshot
+                if revision.is_diff:
+                    snapshots.append((revision.pk, value))
+                break
+
+            if len(deleted_ids) + len(snapshots) >= batch_size:
+                deleted += len(deleted_ids)
+                compacted += len(snapshots)
+                self._apply_pruning(deleted_ids, snapshots)
+                deleted_ids, snapshots = [], []
+
+        deleted += len(deleted_ids)
+        compacted += len(snapshots)
+        self._apply_pruning(deleted_ids, snapshots)
+
+        return deleted, compacted
+
+    def _apply_pruning(self, deleted_ids, snapshots):
+        """
+        Deletes revisions and rewrites diffs as full snapshots
+        """
+        with transaction.atomic(using=self.db):
+            if deleted_ids:
+                self.get_queryset().filter(pk__in=deleted_ids).delete()
+
+            for pk, value in snapshots:
+                self.get_queryset().filter(pk=pk).update(is_diff=False, value=value)
+
+
+class LabelRevision(models.Model):
+    """
+    Append-only history entry of a LabelledDocument value
+    """
+    created = models.DateTimeField(auto_now_add=True)
+
+    labelled_document = models.ForeignKey(
+        LabelledDocument, related_name='revisions')
+    revision = models.PositiveIntegerField()
+
+    # Full serialized value or a diff against the previous revision value
+    is_diff = models.BooleanField(default=False)
+    value = models.TextField()
+
+    objects = LabelRevisionManager()
+
+    class Meta:
+        unique_together = ('labelled_document', 'revision')
+
+    @staticmethod
+    def diff_values(old_value, new_value):
+        """
+        Returns a compact serialized diff between two serialized sequences
+        as `[length, [[index, item], ...]]`. Returns None when one of the
+        values is not a sequence.
+        """
+        try:
+            old = json.loads(old_value)
+            new = json.loads(new_value)
+        except ValueError:
+            return None
+
+        if not isinstance(old, list) or not isinstance(new, list):
+            return None
+
+        changes = [
+            [i, item] for i, item in enumerate(new)
+            if i >= len(old) or old[i] != item
+        ]
+
+        return json.dumps([len(new), changes], separators=(',', ':'))
+
+    @staticmethod
+    def apply_diff(value, diff):
+        """
+        Applies a serialized diff on a serialized sequence value
+        and returns the new serialized value
+        """
+        length, changes = json.loads(diff)
+        items = json.loads(value)[:length]
+
+        for i, item in changes:
+            if i < len(items):
+                items[i] = item
+            else:
+                items.append(item)
+
+        return LabelledDocument.serialize_value(items)
+
+    def resolve_value(self, previous_value):
+        """
+        Returns the full serialized value at this revision given the
+        full serialized value of the previous revision
+        """
+        if self.is_diff:
+            return self.apply_diff(previous_value, self.value)
+
+        return self.value
+
+
+class DocumentSortKey(models.Model):
+    """
+    Stable hash-based position of a document in the shuffled
+    permutation of a learning model
+    """
+    model_name = models.TextField()
+
+    # Generic relation
+    document_content_type = models.ForeignKey(ContentType)
+    document_id = models.PositiveIntegerField()
+    document = GenericForeignKey('document_content_type', 'document_id')
+
+    sort_key = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('model_name', 'document_content_type', 'document_id')
+        index_together = ('model_name', 'sort_key')
+
+
+class AnnotatorCursor(models.Model):
+    """
+    Position of an annotator in the shuffled permutation of a learning model
+    """
+    modified = models.DateTimeField(auto_now=True)
+
+    model_name = models.TextField()
+    annotator = models.CharField(max_length=255)
+
+    position = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('model_name', 'annotator')
+
+
+class StratumCount(models.Model):
+    """
+    Document counts of a stratum of a learning model documents
+    """
+    model_name = models.TextField()
+
+    # JSON list of the strata fields values
+    stratum = models.TextField()
+
+    labelled = models.PositiveIntegerField(default=0)
+    unlabelled = models.PositiveIntegerField(default=0)
+
+    # Primary key of the last document counted
+    last_document_id = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('model_name', 'stratum')
+        index_together = ('model_name', 'unlabelled', 'labelled')
+
+    def get_filters(self, strata):
+        """
+        Returns the queryset filters matching the stratum documents
+        """
+        return dict(zip(strata, json.loads(self.stratum)))
+
+
+class ShardBounds(models.Model):
+    """
+    Primary key bounds of the shards of a learning model documents
+    """
+    modified = models.DateTimeField(auto_now=True)
+
+    model_name = models.TextField(unique=True)
+
+    shards = models.PositiveIntegerField()
+
+    # JSON list of the `shards + 1` primary key bounds
+    bounds = models.TextField()
+
+    def get_bounds(self):
+        return json.loads(self.bounds)
+
+
+class DocumentLease(models.Model):
+    """
+    Temporary reservation of a document of a learning model by an annotator
+    """
+    model_name = models.TextField()
+
+    # Generic relation
+    document_content_type = models.ForeignKey(ContentType)
+    document_id = models.PositiveIntegerField()
+    document = GenericForeignKey('document_content_type', 'document_id')
+
+    annotator = models.CharField(max_length=255)
+    expires = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('model_name', 'document_content_type', 'document_id')
+        index_together = ('model_name', 'expires')
+
+
+class DocumentPredictionManager(models.Manager):
+
+    def get_for_document(self, document, model_name):
+        """
+        Returns the DocumentPrediction instance for the document instance
+        and the model name. Returns None if not found.
+        """
+        try:
+            return self.get_queryset().get(
+                document_content_type=ContentType.objects.get_for_model(document),
+                document_id=document.pk,
+                model_name=model_name)
+        except self.model.DoesNotExist:
+            return None
+
+    def replace_for_documents(self, model_name, documents, values):
+        """
+        Replaces the predictions of the model for the documents
+        with the serialized values in a single transaction
+        """
+        if not documents:
+            return []
+
+        content_type = ContentType.objects.get_for_model(documents[0])
+        document_ids = [document.pk for document in documents]
+
+        with transaction.atomic(using=self.db):
+            self.filter(
+                model_name=model_name,
+                document_content_type=content_type,
+                document_id__in=document_ids).delete()
+
+            return self.bulk_create([
+                self.model(
+                    model_name=model_name,
+                    document_content_type=content_type,
+                    document_id=document_id,
+                    value=value)
+                for document_id, value in zip(document_ids, values)
+            ])
+
+
+class DocumentPrediction(models.Model):
+    """
+    Learning model output for a document, computed offline in bulk and
+    used as the initial labels of the document labelling form
+    """
+    created = models.DateTimeField(auto_now_add=True)
+
+    model_name = models.TextField()
+
+    # Generic relation
+    document_content_type = models.ForeignKey(ContentType)
+    document_id = models.PositiveIntegerField()
+    document = GenericForeignKey('document_content_type', 'document_id')
+
+    value = models.TextField()
+
+    objects = DocumentPredictionManager()
+
+    class Meta:
+        unique_together = ('model_name', 'document_content_type', 'document_id')
+
+    def deserialize_value(self):
+        """
+        Deserialize the JSON contents of the value attribute.
+        On failure, returns an empty dict.
+        """
+        try:
+            return json.loads(self.value)
+        except ValueError:
+            pass
+
+        return {}
+
+
+class LabelEventManager(models.Manager):
+
+    def is_enabled(self):
+        """
+        Returns whether label writes are recorded, from the
+        `LEARNIT_LABEL_EVENTS` setting
+        """
+        return getattr(settings, 'LEARNIT_LABEL_EVENTS', False)
+
+    def dispatch(self, batch_size=100, max_attempts=5):
+        """
+        Dispatches the pending events in batches of `batch_size` events,
+        grouped by learning model, to the learning model `labels_changed`
+        method then to the `labels_changed` signal receivers.
+
+        Events are deleted once every receiver succeeded, so that they are
+        delivered at least once. When a group fails, the later events of
+        its learning model are held back until the next dispatch, so that
+        each learning model receives its events in order. Events failing
+        `max_attempts` times are marked as dead and logged, and no longer
+        hold back the later events.
+
+        Returns a `(dispatched, failed, dead)` tuple of events counts.
+        """
+        from .library import get_learning_model
+        from .signals import labels_changed
+
+        dispatched = failed = dead = 0
+        last_pk = 0
+        blocked = set()
+
+        while True:
+            queryset = self.get_queryset().filter(pk__gt=last_pk, dead=False)
+
+            if blocked:
+                queryset = queryset.exclude(model_name__in=blocked)
+
+            events = list(queryset.order_by('pk')[:batch_size])
+
+            if not events:
+                break
+
+            last_pk = events[-1].pk
+
+            events.sort(key=lambda event: (event.model_name, event.pk))
+
+            for model_name, group in groupby(events, key=lambda event: event.model_name):
+                group = list(group)
+                event_ids = [event.pk for event in group]
+
+                try:
+                    learning_model = get_learning_model(model_name)
+
+                    if learning_model:
+                        learning_model.labels_changed(group)
+
+                    labels_changed.send(
+                        sender=self.model, model_name=model_name, events=group)
+                except Exception:
+                    logger.exception("Failed to dispatch %(model_name)s label events", {
+                        'model_name': model_name
+                    })
+
+                    blocked.add(model_name)
+                    self.filter(pk__in=event_ids).update(attempts=models.F('attempts') + 1)
+
+                    dead_ids = [
+                        event.pk for event in group
+                        if event.attempts + 1 >= max_attempts
+                    ]
+
+                    if dead_ids:
+                        self.filter(pk__in=dead_ids).update(dead=True)
+                        logger.error(
+                            "Gave up dispatching %(count)d %(model_name)s label events "
+                            "after %(attempts)d attempts", {
+                                'count': len(dead_ids),
+                                'model_name': model_name,
+                                'attempts': max_attempts
+                            })
+
+                    failed += len(group) - len(dead_ids)
+                    dead += len(dead_ids)
+                else:
+                    self.filter(pk__in=event_ids).delete()
+                    dispatched += len(group)
+
+        return dispatched, failed, dead
+
+    def build_for_labelled_document(self, labelled_document, created):
+        """
+        Returns the unsaved event of the labelled document write
+        """
+        return self.model(
+            model_name=labelled_document.model_name,
+            document_content_type_id=labelled_document.document_content_type_id,
+            document_id=labelled_document.document_id,
+            revision=labelled_document.revision,
+            created_label=created)
+
+
+class LabelEvent(models.Model):
+    """
+    Outbox entry of a label write, created in the transaction of the write
+    and deleted once dispatched by the `learnit_dispatch_events` command,
+    or kept as dead when its dispatch was given up
+    """
+    created = models.DateTimeField(auto_now_add=True)
+
+    model_name = models.TextField()
+
+    # Generic relation
+    document_content_type = models.ForeignKey(ContentType)
+    document_id = models.PositiveIntegerField()
+    document = GenericForeignKey('document_content_type', 'document_id')
+
+    revision = models.PositiveIntegerField()
+
+    # Whether the document was labelled for the first time
+    created_label = models.BooleanField(default=False)
+
+    # Number of failed dispatches
+    attempts = models.PositiveIntegerField(default=0)
+
+    # Whether the dispatch was given up after the maximum attempts
+    dead = models.BooleanField(default=False)
+
+    objects = LabelEventManager()
+
+
+class BuildRunManager(models.Manager):
+
+    def get_last_succeeded(self, model_name):
+        """
+        Returns the last succeeded BuildRun of the learning model,
+        or None when never built
+        """
+        return self.get_queryset()\
+            .filter(model_name=model_name, kind=BuildRun.BUILD, status=BuildRun.SUCCEEDED)\
+            .order_by('-started')\
+            .first()
+
+    def is_running(self, model_name, since):
+        """
+        Returns whether a build of the learning model started after
+        `since` is running
+        """
+        return self.get_queryset()\
+            .filter(model_name=model_name, kind=BuildRun.BUILD, status=BuildRun.RUNNING,
+                    started__gte=since)\
+            .exists()
+
+
+class BuildRun(models.Model):
+    """
+    A build, or a predictions run, of a learning model
+    """
+    BUILD = 'build'
+    PREDICTION = 'prediction'
+
+    KIND_CHOICES = (
+        (BUILD, 'Build'),
+        (PREDICTION, 'Prediction')
+    )
+
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed')
+    )
+
+    model_name = models.TextField()
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=BUILD)
+
+    started = models.DateTimeField(default=timezone.now)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+
+    # Number of labelled documents when the build started
+    labels = models.PositiveIntegerField(default=0)
+
+    error = models.TextField(blank=True)
+
+    objects = BuildRunManager()
+
+    class Meta:
+        index_together = ('model_name', 'started')
+
+
+class BuildStageManager(models.Manager):
+
+    def create_for_build_run(self, build_run, stages_metrics):
+        """
+        Creates the BuildStage instances of the build run
+        from the measured stages
+        """
+        return self.bulk_create([
+            BuildStage(
+                build_run=build_run,
+                position=position,
+                name=metrics.name,
+                depth=metrics.depth,
+                wall_time=metrics.wall_time,
+                cpu_time=metrics.cpu_time,
+                rows=metrics.rows,
+                peak_rss=metrics.peak_rss,
+                profile_path=metrics.profile_path)
+            for position, metrics in enumerate(stages_metrics)
+        ])
+
+
+class BuildStage(models.Model):
+    """
+    Metrics of a stage of a build run, such as loading labels,
+    featurization, fitting, saving or prediction
+    """
+    build_run = models.ForeignKey(BuildRun, related_name='stages', on_delete=models.CASCADE)
+
+    # Order in which the stage started within the build run
+    position = models.PositiveIntegerField()
+
+    name = models.CharField(max_length=100)
+
+    # Nesting level of the stage in the enclosing stages
+    depth = models.PositiveSmallIntegerField(default=0)
+
+    # Seconds
+    wall_time = models.FloatField(null=True)
+    cpu_time = models.FloatField(null=True)
+
+    rows = models.BigIntegerField(null=True)
+
+    # Peak resident set size of the process in bytes when the stage ended
+    peak_rss = models.BigIntegerField(null=True)
+
+    profile_path = models.TextField(blank=True)
+
+    objects = BuildStageManager()
+
+    class Meta:
+        ordering = ('build_run', 'position')
+
+
+class EvaluationFoldManager(models.Manager):
+
+    def get_predictions(self, model_name, folds, fold, fingerprint):
+        """
+        Returns the cached (document id, prediction value) pairs of the
+        fold, or None when not cached for the fingerprint
+        """
+        evaluation_fold = self.get_queryset()\
+            .filter(model_name=model_name, folds=folds, fold=fold, fingerprint=fingerprint)\
+            .first()
+
+        if evaluation_fold is None:
+            return None
+
+        return [tuple(pair) for pair in evaluation_fold.deserialize_predictions()]
+
+    def set_predictions(self, model_name, folds, fold, fingerprint, predictions):
+        """
+        Caches the (document id, prediction value) pairs of the fold
+        """
+        self.update_or_create(
+            model_name=model_name,
+            folds=folds,
+            fold=fold,
+            defaults={
+                'fingerprint': fingerprint,
+                'predictions': json.dumps(list(predictions))
+            })
+
+
+class EvaluationFold(models.Model):
+    """
+    Cached predictions of a cross-validation fold, valid as long as the
+    fingerprint of the labels and documents it was computed from
+    """
+    model_name = models.TextField()
+
+    folds = models.PositiveSmallIntegerField()
+    fold = models.PositiveSmallIntegerField()
+
+    fingerprint = models.CharField(max_length=32)
+
+    # JSON list of [document id, prediction value]
+    predictions = models.TextField()
+
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = EvaluationFoldManager()
+
+    class Meta:
+        unique_together = ('model_name', 'folds', 'fold')
+
+    def deserialize_predictions(self):
+        """
+        Deserialize the JSON list of predictions
+        """
+        return json.loads(self.predictions)
+
+
+class BuildMetricManager(models.Manager):
+
+    def create_for_build_run(self, build_run, scores):
+        """
+        Creates the BuildMetric instances of the build run from the
+        evaluation scores, by level and label
+        """
+        return self.bulk_create([
+            BuildMetric(
+                build_run=build_run,
+                level=level,
+                label=force_text(label),
+                precision=label_scores['precision'],
+                recall=label_scores['recall'],
+                f1=label_scores['f1'],
+                support=label_scores['support'])
+            for level, level_scores in scores.items()
+            for label, label_scores in level_scores.items()
+        ])
+
+
+class BuildMetric(models.Model):
+    """
+    Cross-validated precision, recall and F1 of a class of a build run,
+    at the document, token or entity level
+    """
+    DOCUMENT = 'document'
+    TOKEN = 'token'
+    ENTITY = 'entity'
+
+    LEVEL_CHOICES = (
+        (DOCUMENT, 'Document'),
+        (TOKEN, 'Token'),
+        (ENTITY, 'Entity')
+    )
+
+    build_run = models.ForeignKey(BuildRun, related_name='metrics', on_delete=models.CASCADE)
+
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES)
+    label = models.TextField()
+
+    precision = models.FloatField()
+    recall = models.FloatField()
+    f1 = models.FloatField()
+
+    # Number of true occurrences of the label
+    support = models.PositiveIntegerField()
+
+    objects = BuildMetricManager()
+
+    class Meta:
+        ordering = ('build_run', 'pk')
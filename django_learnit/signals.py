@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+
+# Sent by the events dispatcher with a batch of `LabelEvent` of a learning model
+labels_changed = Signal(providing_args=['model_name', 'events'])
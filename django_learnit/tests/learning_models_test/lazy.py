@@ -0,0 +1,8 @@
+from ...learning.base import LearningModel
+
+from ..models import Document
+
+
+class LazyTestModel(LearningModel):
+    name = 'lazymodel'
+    queryset = Document.objects.all()
@@ -2,4 +2,4 @@ from django.db import models
 
 
 class Document(models.Model):
-    pass
+    category = models.CharField(max_length=20, blank=True)
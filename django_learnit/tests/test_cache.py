@@ -0,0 +1,152 @@
+from django.core.cache import cache
+from django.http import Http404
+from django.test import (
+    RequestFactory,
+    TestCase)
+from django.views.generic import View
+
+from ..cache import (
+    DocumentCache,
+    get_request_document_cache)
+from ..views.base import DocumentMixin
+
+from .learning_models import (
+    TestModel,
+    TestNamedEntityRecognizerModel)
+from .models import Document
+
+
+class DocumentCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.document = Document.objects.create(category='news')
+        self.queryset = Document.objects.all()
+
+    def test_get_document_per_request(self):
+        """Document is read once per request"""
+        document_cache = DocumentCache()
+        document_cache.get_document(self.queryset, self.document.pk)
+
+        with self.assertNumQueries(1):
+            document = document_cache.get_document(self.queryset, self.document.pk)
+
+        self.assertEqual(document, self.document)
+
+    def test_get_document_across_requests(self):
+        """Document is read from the cache backend until its version changes"""
+        DocumentCache().get_document(
+            self.queryset, self.document.pk, version_field='category', timeout=60)
+
+        with self.assertNumQueries(1):
+            document = DocumentCache().get_document(
+                self.queryset, self.document.pk, version_field='category', timeout=60)
+
+        self.assertEqual(document.category, 'news')
+
+        Document.objects.filter(pk=self.document.pk).update(category='sport')
+
+        document = DocumentCache().get_document(
+            self.queryset, self.document.pk, version_field='category', timeout=60)
+        self.assertEqual(document.category, 'sport')
+
+    def test_get_document_checks_queryset(self):
+        """Cached documents are not served outside of the queryset"""
+        document_cache = DocumentCache()
+        document_cache.get_document(self.queryset, self.document.pk, timeout=60)
+
+        with self.assertRaises(Document.DoesNotExist):
+            document_cache.get_document(
+                self.queryset.exclude(pk=self.document.pk), self.document.pk, timeout=60)
+
+    def test_get_tokens(self):
+        """Tokens are computed once per tokenizer and version"""
+        learning_model = TestNamedEntityRecognizerModel()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ['hello']
+
+        def request():
+            document_cache = DocumentCache()
+            document_cache.get_document(
+                self.queryset, self.document.pk, version_field='category')
+            document_cache.get_tokens(learning_model, self.document, compute, timeout=60)
+
+        request()
+        request()
+        self.assertEqual(len(calls), 1)
+
+        Document.objects.filter(pk=self.document.pk).update(category='sport')
+
+        request()
+        self.assertEqual(len(calls), 2)
+
+    def test_tokens_shared_by_tokenizer(self):
+        """Tokens are shared by the learning models declaring the same tokenizer"""
+        class SharedModel(TestNamedEntityRecognizerModel):
+            name = 'shared_ner'
+            tokenizer_key = 'whitespace'
+
+        class OtherSharedModel(TestNamedEntityRecognizerModel):
+            name = 'other_shared_ner'
+            tokenizer_key = 'whitespace'
+
+        class OtherModel(TestNamedEntityRecognizerModel):
+            name = 'other_ner'
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ['hello']
+
+        document_cache = DocumentCache()
+
+        for learning_model in (SharedModel(), OtherSharedModel()):
+            document_cache.get_tokens(learning_model, self.document, compute)
+
+        self.assertEqual(len(calls), 1)
+
+        # Inherited `get_tokens` without tokenizer key is not shared
+        for learning_model in (TestNamedEntityRecognizerModel(), OtherModel()):
+            document_cache.get_tokens(learning_model, self.document, compute)
+
+        self.assertEqual(len(calls), 3)
+
+    def test_get_request_document_cache(self):
+        """Document cache is shared by the request views"""
+        request = RequestFactory().get('/')
+
+        self.assertIs(
+            get_request_document_cache(request), get_request_document_cache(request))
+
+
+class DocumentMixinTestView(DocumentMixin, View):
+    pass
+
+
+class DocumentMixinCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.view = DocumentMixinTestView()
+        self.view.request = RequestFactory().get('/')
+        self.view.learning_model = TestModel()
+
+    def test_get_object(self):
+        """Document is read through the request document cache"""
+        document = Document.objects.create()
+        self.view.kwargs = {'pk': document.pk}
+
+        self.assertEqual(self.view.get_object(), document)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.view.get_object(), document)
+
+    def test_get_object_raises_404(self):
+        """Raises Http404 for documents not in the queryset"""
+        self.view.kwargs = {'pk': 42}
+
+        with self.assertRaises(Http404):
+            self.view.get_object()
@@ -1,3 +1,5 @@
+from unittest import skipIf
+
 from django.core.urlresolvers import reverse
 from django.test import (
     TestCase,
@@ -6,11 +8,15 @@ from django.views.generic import (
     TemplateView,
     FormView)
 
+from ..compat import (
+    numpy,
+    sparse)
 from ..exceptions import ImproperlyConfigured
 from ..forms.classifier import (
     SingleLabelClassifierForm,
     MultiLabelClassifierForm)
 from ..learning.classifier import (
+    ClassesMetadata,
     GenericClassifierMixin,
     ClassifierModel)
 from ..models import LabelledDocument
@@ -35,6 +41,75 @@ class ClassifierModelTestCase(TestCase):
 
         self.assertTrue(TestModel().is_classifier())
 
+    def label(self, model, document, label):
+        LabelledDocumentFactory.create(
+            document=document,
+            model_name=model.get_name(),
+            value=LabelledDocument.serialize_value({'label': label}))
+
+    @skipIf(numpy is None, "Requires NumPy")
+    def test_get_label_matrix(self):
+        """Returns document ids and class indexes"""
+        model = TestSingleLabelClassifierModel()
+        documents = [Document.objects.create() for i in range(4)]
+
+        self.label(model, documents[2], '1')
+        self.label(model, documents[0], '0')
+        self.label(model, documents[1], 'unknown')
+
+        document_ids, labels = model.get_label_matrix()
+
+        self.assertEqual(document_ids.tolist(), [d.pk for d in documents[:3]])
+        self.assertEqual(labels.tolist(), [0, -1, 1])
+
+    @skipIf(numpy is None or sparse is None, "Requires NumPy and SciPy")
+    def test_get_multilabel_matrix(self):
+        """Returns document ids and a sparse indicator matrix"""
+        model = TestMultiLabelClassifierModel()
+        documents = [Document.objects.create() for i in range(3)]
+
+        self.label(model, documents[0], ['1'])
+        self.label(model, documents[1], [])
+        self.label(model, documents[2], ['1', '0'])
+
+        document_ids, matrix = model.get_label_matrix()
+
+        self.assertEqual(document_ids.tolist(), [d.pk for d in documents])
+        self.assertTrue(sparse.isspmatrix_csr(matrix))
+        self.assertEqual(matrix.toarray().tolist(), [[0, 1], [0, 0], [1, 1]])
+
+
+class ClassesMetadataTestCase(TestCase):
+
+    def setUp(self):
+        self.metadata = ClassesMetadata((
+            (0, 'No'),
+            (1, 'Yes')
+        ))
+
+    def test_maps(self):
+        """Labels are mapped to indexes and back"""
+        self.assertEqual(self.metadata.classes, ((0, 'No'), (1, 'Yes')))
+        self.assertEqual(len(self.metadata), 2)
+        self.assertEqual(self.metadata.index(1), 1)
+        self.assertEqual(self.metadata.index('1'), 1)
+        self.assertEqual(self.metadata.label(0), 0)
+        self.assertIn('0', self.metadata)
+        self.assertNotIn(2, self.metadata)
+
+        with self.assertRaises(KeyError):
+            self.metadata.index('2')
+
+    def test_encode_decode(self):
+        """Labels are encoded as indexes"""
+        self.assertEqual(self.metadata.encode(['1', 0, 1]), [1, 0, 1])
+        self.assertEqual(self.metadata.decode([1, 0]), [1, 0])
+
+    def test_immutable(self):
+        """Attributes can't be set"""
+        with self.assertRaises(AttributeError):
+            self.metadata.classes = ()
+
 
 # -- Forms
 
@@ -53,6 +128,30 @@ class ClassifierFormTestCase(TestCase):
         form = MultiLabelClassifierForm(classes=test_classes)
         self.assertEqual(tuple(form.fields['label'].choices), test_classes)
 
+    def test_label_validation_with_classes_metadata(self):
+        """Labels are validated against the classes metadata"""
+        test_classes = (
+            (0, 'No'),
+            (1, 'Yes')
+        )
+        metadata = ClassesMetadata(test_classes)
+
+        form = SingleLabelClassifierForm(
+            classes=test_classes, classes_metadata=metadata, data={'label': '1'})
+        self.assertTrue(form.is_valid())
+
+        form = SingleLabelClassifierForm(
+            classes=test_classes, classes_metadata=metadata, data={'label': '2'})
+        self.assertFalse(form.is_valid())
+
+        form = MultiLabelClassifierForm(
+            classes=test_classes, classes_metadata=metadata, data={'label': ['0', '1']})
+        self.assertTrue(form.is_valid())
+
+        form = MultiLabelClassifierForm(
+            classes=test_classes, classes_metadata=metadata, data={'label': ['0', '3']})
+        self.assertFalse(form.is_valid())
+
 
 # -- Mixins
 
@@ -78,6 +177,21 @@ class GenericClassifierMixinTestCase(TestCase):
 
         self.assertEqual(TestClassifier().get_classes(), test_classes)
 
+    def test_classes_metadata_is_memoized(self):
+        """Classes metadata is built once, and again when classes change"""
+        class TestClassifier(GenericClassifierMixin):
+            classes = (
+                (0, 'No'),
+                (1, 'Yes')
+            )
+
+        classifier = TestClassifier()
+        metadata = classifier.get_classes_metadata()
+        self.assertIs(classifier.get_classes_metadata(), metadata)
+
+        classifier.classes = ((0, 'No'),)
+        self.assertEqual(classifier.get_classes(), ((0, 'No'),))
+
 
 class GenericClassifierModelLabellingMixinTestView(GenericClassifierModelLabellingMixin, TemplateView):
     pass
@@ -0,0 +1,216 @@
+import json
+from collections import Counter
+
+from django.db.models.query import QuerySet
+from django.test import TestCase
+
+from ..exceptions import ImproperlyConfigured
+from ..learning.classifier import ClassifierModel
+from ..learning.evaluation import (
+    get_entities,
+    get_scores)
+from ..library import get_learning_model
+from ..models import (
+    BuildMetric,
+    EvaluationFold)
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class CategoryClassifierModel(ClassifierModel):
+    """
+    Predicts the most frequent label of the document category
+    """
+    name = 'test_singlelabel_classifier'
+    queryset = Document.objects.all()
+    classes = (
+        (0, 'No'),
+        (1, 'Yes')
+    )
+    builds = 0
+
+    def build_model(self, labelled_documents):
+        self.builds += 1
+        counters = {}
+
+        for labelled_document in labelled_documents:
+            counters.setdefault(labelled_document.document.category, Counter())\
+                .update([labelled_document.deserialize_value()['label']])
+
+        return dict(
+            (category, counter.most_common(1)[0][0])
+            for category, counter in counters.items())
+
+    def predict(self, documents):
+        return [self.model.get(document.category) for document in documents]
+
+
+class EvaluationFunctionsTestCase(TestCase):
+
+    def test_get_entities(self):
+        """Entities are spans of consecutive tokens of a class"""
+        self.assertEqual(
+            get_entities(['O', 'DAY', 'DAY', 'O', 'MONTH', 'DAY'], 'O'),
+            set([(1, 3, 'DAY'), (4, 5, 'MONTH'), (5, 6, 'DAY')]))
+        self.assertEqual(get_entities([], 'O'), set())
+
+    def test_get_scores(self):
+        """Precision, recall and F1 are computed from the counts"""
+        scores = get_scores({'A': [1, 1, 3]}, ['A', 'B'])
+
+        self.assertEqual(scores['A']['precision'], 0.5)
+        self.assertEqual(scores['A']['recall'], 0.25)
+        self.assertAlmostEqual(scores['A']['f1'], 1. / 3)
+        self.assertEqual(scores['A']['support'], 4)
+        self.assertEqual(scores['B'], {'precision': 0., 'recall': 0., 'f1': 0., 'support': 0})
+
+
+class EvaluationTestCase(TestCase):
+
+    def setUp(self):
+        self.model = CategoryClassifierModel()
+        self.labelled_documents = []
+
+        for i in range(20):
+            category = 'yes' if i % 2 else 'no'
+            self.labelled_documents.append(LabelledDocumentFactory.create(
+                document=Document.objects.create(category=category),
+                model_name=self.model.get_name(),
+                value=json.dumps({'label': int(category == 'yes')})))
+
+    def test_get_document_fold(self):
+        """Documents are assigned to a fold by a stable hash of their id"""
+        folds = [self.model.get_document_fold(document_id, 5) for document_id in range(100)]
+
+        self.assertEqual(set(folds), set(range(5)))
+        self.assertEqual(folds, [
+            CategoryClassifierModel().get_document_fold(document_id, 5)
+            for document_id in range(100)
+        ])
+
+        self.model.evaluation_seed = 'seed'
+        self.assertNotEqual(
+            folds, [self.model.get_document_fold(document_id, 5) for document_id in range(100)])
+
+    def test_evaluate_requires_folds(self):
+        """Raises when there are not at least 2 folds"""
+        with self.assertRaises(ImproperlyConfigured):
+            self.model.evaluate()
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.model.evaluate(folds=1)
+
+    def test_evaluate(self):
+        """Scores are computed from the predictions of each fold"""
+        scores = self.model.evaluate(folds=4)
+
+        self.assertEqual(list(scores), [BuildMetric.DOCUMENT])
+        self.assertEqual(list(scores[BuildMetric.DOCUMENT]), [0, 1])
+
+        for label_scores in scores[BuildMetric.DOCUMENT].values():
+            self.assertEqual(label_scores['precision'], 1.)
+            self.assertEqual(label_scores['recall'], 1.)
+            self.assertEqual(label_scores['support'], 10)
+
+        self.assertFalse(hasattr(self.model, 'model'))
+
+    def test_build_model_receives_queryset(self):
+        """Folds are built from an evaluated labelled documents queryset"""
+        querysets = []
+        build_model = self.model.build_model
+
+        def build_queryset_model(labelled_documents):
+            querysets.append(labelled_documents)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(labelled_documents.count(), len(list(labelled_documents)))
+                return build_model(labelled_documents)
+
+        self.model.build_model = build_queryset_model
+        self.model.evaluate(folds=4)
+
+        self.assertEqual(len(querysets), 4)
+
+        for queryset in querysets:
+            self.assertIsInstance(queryset, QuerySet)
+            self.assertEqual(queryset.count(), queryset.filter().count())
+
+    def test_cached_folds(self):
+        """Fold predictions are only recomputed when labels changed"""
+        scores = self.model.evaluate(folds=4)
+        builds = self.model.builds
+
+        self.assertEqual(EvaluationFold.objects.count(), 4)
+        self.assertEqual(self.model.evaluate(folds=4), scores)
+        self.assertEqual(self.model.builds, builds)
+
+        labelled_document = self.labelled_documents[0]
+        labelled_document.value = json.dumps({'label': 1})
+        labelled_document.save()
+
+        scores = self.model.evaluate(folds=4)
+        self.assertGreater(self.model.builds, builds)
+        self.assertEqual(scores[BuildMetric.DOCUMENT][1]['support'], 11)
+
+    def test_evaluate_in_processes(self):
+        """Folds run in parallel processes give the same scores"""
+        scores = self.model.evaluate(folds=4)
+        EvaluationFold.objects.all().delete()
+
+        self.assertEqual(self.model.evaluate(folds=4, processes=2), scores)
+        self.assertEqual(EvaluationFold.objects.count(), 4)
+
+    def test_run_build_stores_metrics(self):
+        """Builds are evaluated when evaluation folds are set"""
+        self.model.evaluation_folds = 4
+        build_run = self.model.run_build()
+
+        self.assertEqual(
+            [(metric.level, metric.label, metric.f1) for metric in build_run.metrics.all()],
+            [(BuildMetric.DOCUMENT, '0', 1.), (BuildMetric.DOCUMENT, '1', 1.)])
+        self.assertIn('evaluation', [stage.name for stage in build_run.stages.all()])
+
+
+class ClassifierScoresTestCase(TestCase):
+
+    def test_multilabel_scores(self):
+        """Multilabel scores count each class of each document"""
+        learning_model = get_learning_model('test_multilabel_classifier')
+
+        scores = learning_model.score_predictions([
+            ({'label': [0, 1]}, {'label': [1]}),
+            ({'label': ['1']}, {'label': [0, 1]}),
+            ({}, {'label': [0]})
+        ])[BuildMetric.DOCUMENT]
+
+        self.assertEqual(scores[0]['precision'], 0.)
+        self.assertEqual(scores[0]['support'], 1)
+        self.assertEqual(scores[1]['precision'], 1.)
+        self.assertEqual(scores[1]['recall'], 1.)
+
+
+class NamedEntityRecognizerScoresTestCase(TestCase):
+
+    def test_scores(self):
+        """NER predictions are scored by token and by entity"""
+        learning_model = get_learning_model('test_ner')
+
+        def value(*labels):
+            return [{'label': label} for label in labels]
+
+        scores = learning_model.score_predictions([
+            (value('DAY', 'DAY', 'O', 'MONTH'), value('DAY', 'O', 'O', 'MONTH')),
+            (value('O', 'MONTH'), value('O', 'MONTH'))
+        ])
+
+        self.assertEqual(list(scores), [BuildMetric.TOKEN, BuildMetric.ENTITY])
+        self.assertEqual(list(scores[BuildMetric.TOKEN]), ['DAY', 'MONTH'])
+
+        self.assertEqual(scores[BuildMetric.TOKEN]['DAY']['precision'], 1.)
+        self.assertEqual(scores[BuildMetric.TOKEN]['DAY']['recall'], 0.5)
+        self.assertEqual(scores[BuildMetric.TOKEN]['MONTH']['f1'], 1.)
+
+        self.assertEqual(scores[BuildMetric.ENTITY]['DAY']['precision'], 0.)
+        self.assertEqual(scores[BuildMetric.ENTITY]['DAY']['support'], 1)
+        self.assertEqual(scores[BuildMetric.ENTITY]['MONTH']['recall'], 1.)
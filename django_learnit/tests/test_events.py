@@ -0,0 +1,154 @@
+import logging
+
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings)
+from django.utils import six
+
+from ..library import get_learning_model
+from ..models import (
+    LabelEvent,
+    LabelledDocument)
+from ..signals import labels_changed
+
+from .models import Document
+
+
+@override_settings(LEARNIT_LABEL_EVENTS=True)
+class LabelEventTestCase(TestCase):
+
+    def setUp(self):
+        self.document = Document.objects.create()
+        self.received = []
+        labels_changed.connect(self.receiver)
+
+    def tearDown(self):
+        labels_changed.disconnect(self.receiver)
+
+    def receiver(self, sender, model_name, events, **kwargs):
+        self.received.append((model_name, [event.revision for event in events]))
+
+    def label(self, model_name='model'):
+        LabelledDocument.objects.update_or_create_for_document(
+            self.document, model_name, '{}')
+
+    def test_events_are_recorded(self):
+        """An event is created with each label write"""
+        self.label()
+        self.label()
+
+        self.assertEqual(
+            list(LabelEvent.objects.order_by('pk').values_list('revision', 'created_label')),
+            [(1, True), (2, False)])
+
+    @override_settings(LEARNIT_LABEL_EVENTS=False)
+    def test_disabled(self):
+        """No event is created unless enabled"""
+        self.label()
+        self.assertFalse(LabelEvent.objects.exists())
+
+    def test_bulk_writes_events(self):
+        """Multi-models writes record an event per label"""
+        LabelledDocument.objects.update_or_create_for_document_models(
+            self.document, {'model1': '{}', 'model2': '{}'})
+
+        self.assertEqual(LabelEvent.objects.count(), 2)
+
+    def test_dispatch(self):
+        """Events are dispatched in batches grouped by model, then deleted"""
+        self.label('model1')
+        self.label('model2')
+        self.label('model1')
+
+        self.assertEqual(LabelEvent.objects.dispatch(batch_size=2), (3, 0, 0))
+        self.assertEqual(
+            self.received, [('model1', [1]), ('model2', [1]), ('model1', [2])])
+        self.assertFalse(LabelEvent.objects.exists())
+
+    def test_learning_model_is_notified(self):
+        """The learning model `labels_changed` is called"""
+        learning_model = get_learning_model('test_singlelabel_classifier')
+        calls = []
+        learning_model.labels_changed = calls.append
+
+        try:
+            self.label('test_singlelabel_classifier')
+            LabelEvent.objects.dispatch()
+        finally:
+            del learning_model.labels_changed
+
+        self.assertEqual([len(events) for events in calls], [1])
+
+    def test_failed_dispatch_is_retried(self):
+        """Events are kept when a receiver fails, up to max attempts"""
+        def failing_receiver(**kwargs):
+            raise ValueError()
+
+        self.label()
+        labels_changed.connect(failing_receiver)
+        logging.disable(logging.ERROR)
+
+        try:
+            self.assertEqual(LabelEvent.objects.dispatch(max_attempts=2), (0, 1, 0))
+            self.assertEqual(LabelEvent.objects.get().attempts, 1)
+        finally:
+            labels_changed.disconnect(failing_receiver)
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(LabelEvent.objects.dispatch(max_attempts=2), (1, 0, 0))
+
+    def test_dead_events(self):
+        """Events failing max attempts times are marked as dead"""
+        def failing_receiver(**kwargs):
+            raise ValueError()
+
+        self.label()
+        labels_changed.connect(failing_receiver)
+        logging.disable(logging.ERROR)
+
+        try:
+            self.assertEqual(LabelEvent.objects.dispatch(max_attempts=2), (0, 1, 0))
+            self.assertEqual(LabelEvent.objects.dispatch(max_attempts=2), (0, 0, 1))
+            self.assertEqual(LabelEvent.objects.dispatch(max_attempts=2), (0, 0, 0))
+        finally:
+            labels_changed.disconnect(failing_receiver)
+            logging.disable(logging.NOTSET)
+
+        event = LabelEvent.objects.get()
+        self.assertEqual((event.attempts, event.dead), (2, True))
+        self.assertEqual(LabelEvent.objects.dispatch(max_attempts=3), (0, 0, 0))
+
+    def test_failed_events_hold_back_later_events(self):
+        """Later events of a failed learning model wait for the failed ones"""
+        failures = []
+
+        def failing_receiver(model_name, events, **kwargs):
+            if model_name == 'model1' and not failures:
+                failures.append(events)
+                raise ValueError()
+
+        self.label('model1')
+        self.label('model2')
+        self.label('model1')
+        labels_changed.connect(failing_receiver)
+        logging.disable(logging.ERROR)
+
+        try:
+            self.assertEqual(LabelEvent.objects.dispatch(batch_size=2), (1, 1, 0))
+            self.assertEqual(self.received, [('model1', [1]), ('model2', [1])])
+            self.assertEqual(LabelEvent.objects.dispatch(batch_size=2), (2, 0, 0))
+        finally:
+            labels_changed.disconnect(failing_receiver)
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual(self.received[2:], [('model1', [1, 2])])
+
+    def test_command(self):
+        """Dispatches the pending events"""
+        self.label()
+
+        out = six.StringIO()
+        call_command('learnit_dispatch_events', stdout=out)
+
+        self.assertIn('1 events dispatched, 0 failed, 0 dead', out.getvalue())
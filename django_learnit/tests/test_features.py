@@ -0,0 +1,262 @@
+import os
+import shutil
+import tempfile
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings)
+from django.utils import six
+
+from ..compat import numpy
+from ..exceptions import ImproperlyConfigured
+from ..learning.base import LearningModel
+from ..learning.features import FeatureStore
+from ..library import get_learning_model
+
+from .models import Document
+
+
+@skipIf(numpy is None, "Requires NumPy")
+class FeatureStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = FeatureStore(self.path, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_get_missing(self):
+        """Returns None when not cached"""
+        self.assertIsNone(self.store.get(1, 'abc'))
+
+    def test_set_and_get(self):
+        """Vectors are loaded memory-mapped"""
+        self.store.set(1, 'abc', [1.0, 2.0])
+        vector = self.store.get(1, 'abc')
+
+        self.assertIsInstance(vector, numpy.memmap)
+        self.assertEqual(vector.tolist(), [1.0, 2.0])
+
+    def test_entries_are_keyed_by_content_hash_and_version(self):
+        """Other content hashes and versions are misses"""
+        self.store.set(1, 'abc', [1.0])
+
+        self.assertIsNone(self.store.get(1, 'def'))
+        self.assertIsNone(FeatureStore(self.path, 2).get(1, 'abc'))
+
+    def test_set_replaces_other_content_hashes(self):
+        """Outdated entries of the document are replaced"""
+        self.store.set(1, 'abc', [1.0])
+        self.store.set(1, 'def', [2.0])
+
+        self.assertIsNone(self.store.get(1, 'abc'))
+        self.assertEqual(self.store.get(1, 'def').tolist(), [2.0])
+
+    def test_single_vectors_file(self):
+        """Vectors are rows of a single file of the version"""
+        self.store.set_many([(i, 'abc', [float(i), 0.]) for i in range(10)])
+
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.store.get_version_path()) if name != 'lock'),
+            ['index.bin', 'meta.json', 'vectors.bin'])
+        self.assertEqual(
+            os.path.getsize(self.store.get_file_path('vectors.bin')), 10 * 2 * 8)
+
+    def test_concurrent_stores(self):
+        """Entries written by another store are read"""
+        other = FeatureStore(self.path, 1)
+        self.assertIsNone(self.store.get(1, 'abc'))
+
+        other.set(1, 'abc', [1.0])
+        self.store.set(2, 'abc', [2.0])
+
+        self.assertEqual(self.store.get(1, 'abc').tolist(), [1.0])
+        self.assertEqual(other.get(2, 'abc').tolist(), [2.0])
+
+    def test_dimension_mismatch(self):
+        """Vectors must have the dimension of the first vector"""
+        self.store.set(1, 'abc', [1.0])
+
+        with self.assertRaises(ValueError):
+            self.store.set(2, 'abc', [1.0, 2.0])
+
+    def test_delete(self):
+        """Deleted entries are misses"""
+        self.store.set(1, 'abc', [1.0])
+        self.store.delete(1)
+
+        self.assertIsNone(self.store.get(1, 'abc'))
+        self.assertIsNone(FeatureStore(self.path, 1).get(1, 'abc'))
+
+    def test_compact(self):
+        """Compaction reclaims the rows of replaced and deleted vectors"""
+        self.store.set_many([(1, 'a', [1.0]), (2, 'a', [2.0]), (3, 'a', [3.0])])
+        self.store.set(1, 'b', [4.0])
+        self.store.delete(2)
+
+        other = FeatureStore(self.path, 1)
+        self.assertEqual(other.get(3, 'a').tolist(), [3.0])
+
+        self.assertEqual(self.store.compact(), 2)
+        self.assertEqual(self.store.compact(), 0)
+
+        vectors_path = self.store.get_file_path('vectors.bin')
+        self.assertEqual(os.path.getsize(vectors_path), 2 * 8)
+
+        for store in (self.store, other):
+            self.assertEqual(store.get(1, 'b').tolist(), [4.0])
+            self.assertIsNone(store.get(2, 'a'))
+            self.assertEqual(store.get(3, 'a').tolist(), [3.0])
+
+        other.set(4, 'a', [5.0])
+        self.assertEqual(self.store.get(4, 'a').tolist(), [5.0])
+        self.assertFalse([name for name in os.listdir(self.store.get_version_path())
+                          if name.endswith('.tmp')])
+
+    def test_get_or_compute_matrix(self):
+        """Only missing vectors are computed, at once"""
+        self.store.set(2, 'abc', [2.0])
+        calls = []
+
+        def compute(indexes):
+            calls.append(indexes)
+            return [[float(i)] for i in indexes]
+
+        matrix = self.store.get_or_compute_matrix(
+            [(1, 'abc'), (2, 'abc'), (3, 'abc')], compute)
+
+        self.assertEqual(matrix.tolist(), [[0.0], [2.0], [2.0]])
+        self.assertEqual(calls, [[0, 2]])
+
+    def test_get_or_compute(self):
+        """Features are computed once"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [3.0]
+
+        self.store.get_or_compute(1, 'abc', compute)
+        vector = self.store.get_or_compute(1, 'abc', compute)
+
+        self.assertEqual(vector.tolist(), [3.0])
+        self.assertEqual(len(calls), 1)
+
+    def test_prune(self):
+        """Entries of other versions are deleted"""
+        FeatureStore(self.path, 0).set(1, 'abc', [1.0])
+        self.store.set(1, 'abc', [1.0])
+
+        self.assertEqual(self.store.prune(), 1)
+        self.assertEqual(os.listdir(self.path), ['1'])
+
+
+@skipIf(numpy is None, "Requires NumPy")
+class FeatureStoreMixinTestCase(TestCase):
+
+    class TestModel(LearningModel):
+        name = 'testmodel'
+        queryset = Document.objects.all()
+
+        def extract_features(self, document):
+            return [float(len(document.category))]
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.model = self.TestModel()
+        self.model.feature_store_root = self.path
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_get_feature_store_raises_when_root_not_set(self):
+        """Raises ImproperlyConfigured without root"""
+        self.model.feature_store_root = None
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.model.get_feature_store()
+
+    def test_get_feature_store_root_setting(self):
+        """Root defaults to the LEARNIT_FEATURE_STORE_ROOT setting"""
+        self.model.feature_store_root = None
+
+        with override_settings(LEARNIT_FEATURE_STORE_ROOT=self.path):
+            store = self.model.get_feature_store()
+
+        self.assertEqual(store.path, os.path.join(self.path, 'testmodel'))
+
+    def test_get_features_is_invalidated_by_content(self):
+        """Features are recomputed when the document changes"""
+        document = Document.objects.create(category='news')
+        self.assertEqual(self.model.get_features(document).tolist(), [4.0])
+
+        document.category = 'sport'
+        self.assertEqual(self.model.get_features(document).tolist(), [5.0])
+
+    def test_content_hash_of_deferred_fields(self):
+        """Deferred fields are fetched to hash the content"""
+        content_hash = self.model.get_document_content_hash(
+            Document.objects.create(category='news'))
+        document = Document.objects.defer('category').get()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.model.get_document_content_hash(document), content_hash)
+
+        self.assertNotIn('category', document.__dict__)
+
+        Document.objects.update(category='sport')
+        self.assertNotEqual(self.model.get_document_content_hash(document), content_hash)
+
+    def test_content_hash_of_feature_fields(self):
+        """Only the feature fields are hashed when set"""
+        Document.objects.create(category='news')
+        documents = list(Document.objects.only('category'))
+        self.model.feature_fields = ('category',)
+
+        with self.assertNumQueries(0):
+            content_hashes = self.model.get_document_content_hashes(documents)
+
+        self.assertEqual(
+            content_hashes,
+            self.model.get_document_content_hashes(Document.objects.all()))
+
+    def test_content_hash_of_version_field(self):
+        """Only the version field is hashed when set"""
+        document = Document.objects.create(category='news')
+        self.model.document_version_field = 'id'
+        content_hash = self.model.get_document_content_hash(document)
+
+        document.category = 'sport'
+        self.assertEqual(self.model.get_document_content_hash(document), content_hash)
+
+    def test_get_features_matrix(self):
+        """Stacks the documents vectors"""
+        documents = [
+            Document.objects.create(category='a'),
+            Document.objects.create(category='abc')
+        ]
+
+        matrix = self.model.get_features_matrix(documents)
+        self.assertEqual(matrix.tolist(), [[1.0], [3.0]])
+        self.assertEqual(matrix.dtype, numpy.float32)
+
+    def test_compact_command(self):
+        """Compacts the feature stores of the learning models"""
+        learning_model = get_learning_model('test_singlelabel_classifier')
+
+        try:
+            with override_settings(LEARNIT_FEATURE_STORE_ROOT=self.path):
+                store = learning_model.get_feature_store()
+                store.set(1, 'a', [1.0])
+                store.set(1, 'b', [2.0])
+
+                out = six.StringIO()
+                call_command('learnit_compact_features', 'test_singlelabel_classifier', stdout=out)
+        finally:
+            del learning_model._feature_store
+
+        self.assertIn(
+            'test_singlelabel_classifier: 1 rows reclaimed, 0 versions pruned', out.getvalue())
@@ -0,0 +1,157 @@
+from datetime import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import six
+
+from freezegun import freeze_time
+
+from ..models import (
+    LabelledDocument,
+    LabelRevision)
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+def ner_value(labels):
+    return LabelledDocument.serialize_value([{'label': label} for label in labels])
+
+
+# -- Models
+
+class LabelRevisionModelTestCase(TestCase):
+
+    def test_diff_values_not_sequences(self):
+        """Returns None when values are not sequences"""
+        self.assertIsNone(LabelRevision.diff_values('{"label": 1}', '{"label": 0}'))
+        self.assertIsNone(LabelRevision.diff_values('foo', '[]'))
+
+    def test_diff_and_apply(self):
+        """Applying a diff returns the new value"""
+        cases = [
+            (['O', 'O', 'O'], ['DAY', 'O', 'O']),
+            (['O', 'O', 'O'], ['O', 'O']),
+            (['O'], ['O', 'DAY', 'MONTH']),
+            ([], ['O'])
+        ]
+
+        for old, new in cases:
+            diff = LabelRevision.diff_values(ner_value(old), ner_value(new))
+            self.assertEqual(
+                LabelRevision.apply_diff(ner_value(old), diff), ner_value(new))
+
+    def test_diff_only_stores_changes(self):
+        """Unchanged items are not part of the diff"""
+        diff = LabelRevision.diff_values(
+            ner_value(['O', 'O', 'O']), ner_value(['O', 'DAY', 'O']))
+        self.assertEqual(diff, '[3,[[1,{"label":"DAY"}]]]')
+
+
+# -- Managers
+
+class LabelRevisionManagerTestCase(TestCase):
+
+    def setUp(self):
+        self.document = Document.objects.create()
+
+    def label(self, labels):
+        return LabelledDocument.objects.update_or_create_for_document(
+            self.document, 'model', ner_value(labels))[0]
+
+    def test_revision_is_created_with_label(self):
+        """A snapshot revision is appended when creating a label"""
+        labelled_document = self.label(['O', 'O'])
+        revision = labelled_document.revisions.get()
+
+        self.assertEqual(labelled_document.revision, 1)
+        self.assertEqual(revision.revision, 1)
+        self.assertFalse(revision.is_diff)
+        self.assertEqual(revision.value, labelled_document.value)
+
+    def test_revision_is_a_diff_on_update(self):
+        """Updating a sequence label appends a diff"""
+        self.label(['O'] * 20)
+        labelled_document = self.label(['DAY'] + ['O'] * 19)
+
+        self.assertEqual(labelled_document.revision, 2)
+        self.assertEqual(LabelRevision.objects.count(), 2)
+        self.assertTrue(labelled_document.revisions.get(revision=2).is_diff)
+
+    def test_legacy_label_first_revision_is_a_snapshot(self):
+        """Labels without history get a full snapshot"""
+        LabelledDocumentFactory.create(
+            document=self.document, model_name='model', value=ner_value(['O'] * 20))
+
+        labelled_document = self.label(['DAY'] + ['O'] * 19)
+        self.assertFalse(labelled_document.revisions.get().is_diff)
+
+    def test_iter_history(self):
+        """History values are resolved"""
+        values = [
+            ['O'] * 10,
+            ['DAY'] + ['O'] * 9,
+            ['DAY', 'MONTH'] + ['O'] * 8
+        ]
+
+        for labels in values:
+            self.label(labels)
+
+        history = [
+            value for revision, value in
+            LabelRevision.objects.iter_history(model_name='model')
+        ]
+        self.assertEqual(history, [ner_value(labels) for labels in values])
+        self.assertEqual(list(LabelRevision.objects.iter_history(model_name='other')), [])
+
+    def test_prune_keeps_latest_revisions(self):
+        """Outdated revisions are deleted and the oldest one is compacted"""
+        for i in range(5):
+            self.label(['DAY'] * i + ['O'] * (10 - i))
+
+        deleted, compacted = LabelRevision.objects.prune(keep=2)
+        self.assertEqual((deleted, compacted), (3, 1))
+
+        history = list(LabelRevision.objects.iter_history())
+        self.assertEqual([r.revision for r, value in history], [4, 5])
+        self.assertFalse(history[0][0].is_diff)
+        self.assertEqual(history[-1][1], ner_value(['DAY'] * 4 + ['O'] * 6))
+
+    def test_prune_before(self):
+        """Revisions created before the date are deleted except the latest"""
+        with freeze_time("2015-01-01 00:00:00"):
+            self.label(['O'] * 10)
+            self.label(['DAY'] + ['O'] * 9)
+
+        with freeze_time("2015-01-10 00:00:00"):
+            self.label(['DAY', 'DAY'] + ['O'] * 8)
+
+        other = Document.objects.create()
+        with freeze_time("2015-01-01 00:00:00"):
+            LabelledDocument.objects.update_or_create_for_document(
+                other, 'model', ner_value(['O']))
+
+        deleted, compacted = LabelRevision.objects.prune(
+            before=datetime(2015, 1, 5))
+
+        self.assertEqual((deleted, compacted), (2, 1))
+        self.assertEqual(LabelRevision.objects.count(), 2)
+
+
+# -- Commands
+
+class PruneRevisionsCommandTestCase(TestCase):
+
+    def test_command(self):
+        """Prunes revisions"""
+        document = Document.objects.create()
+
+        for i in range(3):
+            LabelledDocument.objects.update_or_create_for_document(
+                document, 'model', ner_value(['DAY'] * i + ['O'] * 10))
+
+        out = six.StringIO()
+        call_command('learnit_prune_revisions', keep=1, stdout=out)
+
+        self.assertEqual(LabelRevision.objects.count(), 1)
+        self.assertIn('2 revisions deleted, 1 compacted', out.getvalue())
@@ -129,6 +129,37 @@ class LearningModelTestCase(TestCase):
             TestModel().get_random_unlabelled_document().pk,
             [document2.pk, document3.pk])
 
+    def test_iter_documents(self):
+        """Iterates over the documents in keyset batches"""
+        class TestModel(LearningModel):
+            name = 'testmodel'
+            queryset = Document.objects.all()
+
+        documents = [Document.objects.create() for i in range(5)]
+
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                list(TestModel().iter_documents(batch_size=2)), documents)
+
+        queryset = Document.objects.filter(pk__gt=documents[2].pk)
+        self.assertEqual(
+            list(TestModel().iter_documents(queryset=queryset)), documents[3:])
+
+    def test_iter_documents_defers_fields(self):
+        """Heavy fields are deferred unless requested"""
+        class TestModel(LearningModel):
+            name = 'testmodel'
+            queryset = Document.objects.all()
+            defer_fields = ('category',)
+
+        Document.objects.create(category='news')
+
+        document = next(TestModel().iter_documents())
+        self.assertNotIn('category', document.__dict__)
+
+        document = next(TestModel().iter_documents(only=('category',)))
+        self.assertEqual(document.__dict__['category'], 'news')
+
     def test_predict_raises_default(self):
         """Raise NotImplementedError by default"""
         with self.assertRaises(NotImplementedError):
@@ -1,15 +1,30 @@
-from django.test import TestCase
+import os
+import shutil
+import sys
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import (
+    TestCase,
+    override_settings)
+from django.utils import six
 
 from ..exceptions import (
+    ImproperlyConfigured,
     InvalidLearningModel,
     DuplicateLearningModelName)
 from ..learning.base import LearningModel
 from ..library import (
     Library,
+    LearningModelDeclaration,
     get_installed_libraries,
+    get_libraries,
+    read_libraries_manifest,
     import_library,
     get_registered_learning_models,
-    get_learning_model)
+    get_learning_model,
+    library_import_times)
 
 from .learning_models import TestModel
 
@@ -55,6 +70,65 @@ class LibraryTestCase(TestCase):
         self.assertEqual(self.register.learning_models['testmodel'].__class__, TestModel)
         self.assertEqual(self.register.learning_models['othermodel'].__class__, OtherModel)
 
+    def test_register_models_are_instantiated_on_first_use(self):
+        """Learning models are instantiated when accessed"""
+        class TestModel(LearningModel):
+            name = 'testmodel'
+
+        self.register.learning_model(TestModel)
+        declaration = self.register.learning_models.declarations['testmodel']
+
+        self.assertFalse(declaration.is_loaded())
+        self.assertIn('testmodel', self.register.learning_models)
+        self.assertFalse(declaration.is_loaded())
+
+        model = self.register.learning_models['testmodel']
+        self.assertTrue(declaration.is_loaded())
+        self.assertIs(self.register.learning_models['testmodel'], model)
+
+    def test_register_lazy_model(self):
+        """Lazy learning models are imported on first use"""
+        module_name = 'django_learnit.tests.learning_models_test.lazy'
+        sys.modules.pop(module_name, None)
+
+        self.register.lazy_learning_model(
+            'lazymodel', '%s.LazyTestModel' % module_name, verbose_name='Lazy')
+
+        declaration = self.register.learning_models.declarations['lazymodel']
+        self.assertEqual(declaration.metadata, {'verbose_name': 'Lazy'})
+        self.assertNotIn(module_name, sys.modules)
+
+        model = self.register.learning_models['lazymodel']
+        self.assertIn(module_name, sys.modules)
+        self.assertEqual(model.__class__.__name__, 'LazyTestModel')
+
+    def test_register_lazy_model_raises_when_name_differs(self):
+        """Raise exception when the imported model name differs"""
+        declaration = LearningModelDeclaration(
+            'othername', path='django_learnit.tests.learning_models_test.lazy.LazyTestModel')
+
+        with self.assertRaises(ImproperlyConfigured):
+            declaration.get_instance()
+
+    def test_register_lazy_model_raises_when_not_a_learning_model(self):
+        """Raise exception when the imported class is not a learning model"""
+        declaration = LearningModelDeclaration(
+            'document', path='django_learnit.tests.models.Document')
+
+        with self.assertRaises(InvalidLearningModel):
+            declaration.get_instance()
+
+    def test_register_lazy_model_raises_when_name_is_duplicate(self):
+        """Raise exception when registering a duplicate lazy name"""
+        class TestModel(LearningModel):
+            name = 'lazymodel'
+
+        self.register.learning_model(TestModel)
+
+        with self.assertRaises(DuplicateLearningModelName):
+            self.register.lazy_learning_model(
+                'lazymodel', 'django_learnit.tests.learning_models_test.lazy.LazyTestModel')
+
     def test_installed_libraries(self):
         """Returns installed libraries"""
         installed_libraries = get_installed_libraries()
@@ -82,6 +156,18 @@ class LibraryTestCase(TestCase):
         """Returns the registered model class"""
         self.assertEqual(get_learning_model('testmodel').__class__, TestModel)
 
+    def test_library_import_times(self):
+        """Library import times are recorded"""
+        self.assertIn('django_learnit.tests.learning_models', library_import_times)
+
+    def test_libraries_command(self):
+        """Reports libraries and registered models"""
+        out = six.StringIO()
+        call_command('learnit_libraries', stdout=out)
+
+        self.assertIn('django_learnit.tests.learning_models: ', out.getvalue())
+        self.assertIn('testmodel (TestModel)', out.getvalue())
+
     def test_register_on_different_module_raises_on_duplicate(self):
         """Raise exception when registering duplicate name in different modules"""
         libraries = get_installed_libraries()
@@ -89,3 +175,51 @@ class LibraryTestCase(TestCase):
 
         with self.assertRaises(DuplicateLearningModelName):
             get_registered_learning_models(libraries)
+
+
+class LibrariesDiscoveryTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.directory, 'learnit.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_libraries_discovers_installed_applications(self):
+        """Returns installed libraries without settings"""
+        self.assertEqual(get_libraries(), get_installed_libraries())
+
+    def test_get_libraries_from_settings(self):
+        """Returns libraries set in settings"""
+        libraries = ['django_learnit.tests.learning_models_test.duplicate']
+
+        with override_settings(LEARNIT_LIBRARIES=libraries, LEARNIT_MANIFEST=self.manifest_path):
+            self.assertEqual(get_libraries(), libraries)
+
+    def test_get_libraries_from_manifest(self):
+        """Returns libraries in the manifest"""
+        with override_settings(LEARNIT_MANIFEST=self.manifest_path):
+            # Missing manifest
+            self.assertIsNone(read_libraries_manifest(self.manifest_path))
+            self.assertEqual(get_libraries(), get_installed_libraries())
+
+            call_command('learnit_discover', stdout=six.StringIO())
+
+            self.assertEqual(
+                read_libraries_manifest(self.manifest_path),
+                ['django_learnit.tests.learning_models'])
+            self.assertEqual(get_libraries(), ['django_learnit.tests.learning_models'])
+
+    def test_discover_command_output(self):
+        """Manifest is written to the output path"""
+        out = six.StringIO()
+        call_command('learnit_discover', output=self.manifest_path, stdout=out)
+
+        self.assertIn('1 libraries written', out.getvalue())
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+    def test_discover_command_raises_without_path(self):
+        """Raise CommandError when there is no manifest path"""
+        with self.assertRaises(CommandError):
+            call_command('learnit_discover', stdout=six.StringIO())
@@ -0,0 +1,174 @@
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from ..models import (
+    LabelledDocument,
+    LabelRevision)
+
+from .models import Document
+
+
+class MultiTaskLabellingViewTestCase(TestCase):
+
+    names = 'test_singlelabel_classifier,test_multilabel_classifier'
+
+    def setUp(self):
+        self.document = Document.objects.create()
+        self.url = reverse('django_learnit:multitask-document-labelling', kwargs={
+            'names': self.names,
+            'pk': self.document.pk
+        })
+
+    def test_unknown_learning_model(self):
+        """Raises a 404 for unknown learning models"""
+        url = reverse('django_learnit:multitask-document-labelling', kwargs={
+            'names': 'test_singlelabel_classifier,nope',
+            'pk': self.document.pk
+        })
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_get(self):
+        """Renders a form per learning model with the stored labels"""
+        LabelledDocument.objects.update_or_create_for_document(
+            self.document, 'test_multilabel_classifier',
+            LabelledDocument.serialize_value({'label': ['1']}))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        forms = response.context['forms']
+        self.assertEqual(
+            [learning_model.get_name() for learning_model, form in forms],
+            self.names.split(','))
+        self.assertEqual(forms[0][1].initial, {})
+        self.assertEqual(forms[1][1].initial, {'label': ['1']})
+
+    def test_post_saves_all_labels(self):
+        """Labels of every learning model are saved"""
+        LabelledDocument.objects.update_or_create_for_document(
+            self.document, 'test_multilabel_classifier',
+            LabelledDocument.serialize_value({'label': ['1']}))
+
+        response = self.client.post(self.url, {
+            'test_singlelabel_classifier-label': '1',
+            'test_multilabel_classifier-label': ['0', '1']
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(
+            LabelledDocument.objects.get_for_document(
+                self.document, 'test_singlelabel_classifier').get_label(), '1')
+
+        labelled_document = LabelledDocument.objects.get_for_document(
+            self.document, 'test_multilabel_classifier')
+        self.assertEqual(labelled_document.get_label(), ['0', '1'])
+        self.assertEqual(labelled_document.revision, 2)
+        self.assertEqual(LabelRevision.objects.count(), 3)
+
+    def test_next_document_unlabelled_for_any_model(self):
+        """Next document is unlabelled for at least one learning model"""
+        partly_labelled = Document.objects.create()
+        labelled = Document.objects.create()
+
+        LabelledDocument.objects.update_or_create_for_document(
+            partly_labelled, 'test_singlelabel_classifier', '{"label": 1}')
+        LabelledDocument.objects.update_or_create_for_document_models(labelled, {
+            'test_singlelabel_classifier': '{"label": 1}',
+            'test_multilabel_classifier': '{"label": ["1"]}'
+        })
+
+        response = self.client.post(self.url, {
+            'test_singlelabel_classifier-label': '1',
+            'test_multilabel_classifier-label': ['1']
+        })
+        self.assertRedirects(
+            response,
+            reverse('django_learnit:multitask-document-labelling', kwargs={
+                'names': self.names,
+                'pk': partly_labelled.pk
+            }),
+            fetch_redirect_response=False)
+
+    def test_prefetch_session_key(self):
+        """Prefetched documents are keyed by the learning models names"""
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.context['view'].get_prefetch_session_key(),
+            'django_learnit:multitask:%s:prefetch' % self.names)
+
+    def test_post_invalid(self):
+        """Nothing is saved when a form is invalid"""
+        response = self.client.post(self.url, {
+            'test_singlelabel_classifier-label': '1',
+            'test_multilabel_classifier-label': ['2']
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(LabelledDocument.objects.exists())
+
+
+class MultiTaskNamedEntityRecognizerTestCase(TestCase):
+
+    names = 'test_singlelabel_classifier,test_ner'
+
+    def setUp(self):
+        self.document = Document.objects.create()
+        self.url = reverse('django_learnit:multitask-document-labelling', kwargs={
+            'names': self.names,
+            'pk': self.document.pk
+        })
+
+    def test_get(self):
+        """Renders a prefixed formset of the document tokens for NER models"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        formset = response.context['forms'][1][1]
+        self.assertEqual(formset.prefix, 'test_ner')
+        self.assertEqual([form.token for form in formset], ['hello', 'world'])
+        self.assertEqual(formset.initial, [{'label': 'O'}] * 2)
+        self.assertContains(response, 'name="test_ner-0-label"')
+
+    def test_post_saves_all_labels(self):
+        """Classifier and NER labels are saved in the same submit"""
+        response = self.client.post(self.url, {
+            'test_singlelabel_classifier-label': '1',
+            'test_ner-TOTAL_FORMS': '2',
+            'test_ner-INITIAL_FORMS': '2',
+            'test_ner-0-label': 'DAY',
+            'test_ner-1-label': 'O'
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(
+            LabelledDocument.objects.get_for_document(
+                self.document, 'test_singlelabel_classifier').get_label(), '1')
+        self.assertEqual(
+            LabelledDocument.objects.get_for_document(
+                self.document, 'test_ner').deserialize_value(),
+            [{'label': 'DAY'}, {'label': 'O'}])
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.context['forms'][1][1].initial, [{'label': 'DAY'}, {'label': 'O'}])
+
+
+class BulkUpdateOrCreateTestCase(TestCase):
+
+    def test_update_or_create_for_document_models(self):
+        """Labels are created or updated with their revisions"""
+        document = Document.objects.create()
+        LabelledDocument.objects.update_or_create_for_document(document, 'model1', '{}')
+
+        results = LabelledDocument.objects.update_or_create_for_document_models(
+            document, {'model1': '{"label": 1}', 'model2': '{"label": 2}'})
+
+        self.assertEqual(
+            dict((name, created) for name, (obj, created) in results.items()),
+            {'model1': False, 'model2': True})
+        self.assertEqual(results['model1'][0].revision, 2)
+        self.assertEqual(
+            sorted(LabelRevision.objects.values_list(
+                'labelled_document__model_name', 'revision')),
+            [('model1', 1), ('model1', 2), ('model2', 1)])
@@ -1,10 +1,25 @@
+from functools import (
+    partial,
+    wraps)
+from unittest import skipIf
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.urlresolvers import reverse
+from django.forms import formset_factory
 from django.test import (
     TestCase,
     RequestFactory)
 from django.views.generic import FormView
 
-from ..forms.ner import NamedEntityRecognizerForm
+from ..compat import (
+    asyncio,
+    numpy)
+from ..forms.ner import (
+    NamedEntityRecognizerForm,
+    NamedEntityRecognizerFormSet)
+from ..learning.classifier import ClassesMetadata
 from ..learning.ner import NamedEntityRecognizerModel
 from ..views.ner import NamedEntityRecognizerModelLabellingMixin
 from ..models import LabelledDocument
@@ -65,6 +80,110 @@ class NamedEntityRecognizerModelTestCase(TestCase):
 
         self.assertEqual(classes_colors, expected)
 
+    def test_get_classes_hash(self):
+        """Hash changes with classes and colors"""
+        classes_hash = self.model.get_classes_hash()
+        self.assertEqual(self.NERModel().get_classes_hash(), classes_hash)
+
+        self.model.outside_color = '#000000'
+        self.assertNotEqual(self.model.get_classes_hash(), classes_hash)
+
+    @skipIf(numpy is None, "Requires NumPy")
+    def test_get_training_sequences(self):
+        """Returns padded encoded labels with lengths, or ragged with offsets"""
+        class TestModel(self.NERModel):
+            name = 'nermodel'
+            queryset = Document.objects.all()
+
+        sequences = [['TEST', 'O', 'OTHER'], [], ['O', 'NOPE']]
+        documents = [Document.objects.create() for labels in sequences]
+
+        for document, labels in zip(documents, sequences):
+            LabelledDocumentFactory.create(
+                document=document,
+                model_name='nermodel',
+                value=LabelledDocument.serialize_value(
+                    [{'label': label} for label in labels]))
+
+        document_ids, labels, lengths = TestModel().get_training_sequences(batch_size=2)
+
+        self.assertEqual(document_ids.tolist(), [d.pk for d in documents])
+        self.assertEqual(labels.tolist(), [[1, 0, 2], [-2, -2, -2], [0, -1, -2]])
+        self.assertEqual(lengths.tolist(), [3, 0, 2])
+
+        with self.assertRaises(ValueError):
+            TestModel().get_training_sequences(pad_value=-1)
+
+        document_ids, labels, offsets = TestModel().get_training_sequences(ragged=True)
+
+        self.assertEqual(labels.tolist(), [1, 0, 2, 0, -1])
+        self.assertEqual(offsets.tolist(), [0, 3, 3, 5])
+
+
+# -- Forms
+
+class NamedEntityRecognizerFormSetTestCase(TestCase):
+
+    def setUp(self):
+        self.classes_metadata = ClassesMetadata((
+            ('O', 'Outside'),
+            ('DAY', 'Day')
+        ))
+
+    def get_formset_class(self):
+        return formset_factory(
+            wraps(NamedEntityRecognizerForm)(partial(
+                NamedEntityRecognizerForm, classes=self.classes_metadata.classes)),
+            formset=NamedEntityRecognizerFormSet,
+            extra=0)
+
+    def get_formset(self, labels, n_tokens):
+        data = {
+            'form-TOTAL_FORMS': str(len(labels)),
+            'form-INITIAL_FORMS': str(len(labels))
+        }
+
+        for i, label in enumerate(labels):
+            data['form-%d-label' % i] = label
+
+        return self.get_formset_class()(
+            data, n_tokens=n_tokens, classes_metadata=self.classes_metadata)
+
+    def test_valid_labels(self):
+        """All labels are validated without building forms"""
+        formset = self.get_formset(['DAY', 'O', 'O'], 3)
+
+        self.assertTrue(formset.is_valid())
+        self.assertEqual(formset.cleaned_data, [
+            {'label': 'DAY'},
+            {'label': 'O'},
+            {'label': 'O'}
+        ])
+        self.assertNotIn('forms', formset.__dict__)
+
+    def test_invalid_labels(self):
+        """Unknown and missing labels are reported per token"""
+        formset = self.get_formset(['DAY', 'NOPE', ''], 3)
+
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.errors[0], {})
+        self.assertIn('label', formset.errors[1])
+        self.assertIn('label', formset.errors[2])
+
+    def test_labels_count_must_match_tokens(self):
+        """A label is required for each token"""
+        formset = self.get_formset(['DAY', 'O'], 3)
+
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.non_form_errors(), ['Please submit 3 labels.'])
+
+    def test_unbound_formset_renders_tokens_forms(self):
+        """Unbound formset has a form per token"""
+        formset = self.get_formset_class()(n_tokens=3)
+
+        self.assertEqual(len(formset.forms), 3)
+        self.assertEqual(formset.management_form.initial['MAX_NUM_FORMS'], 3)
+
 
 # -- Mixins
 
@@ -104,6 +223,7 @@ class NamedEntityRecognizerModelLabellingMixinTestCase(TestCase):
         self.assertEqual(
             context['classes_colors'], self.learning_model.get_classes_with_colors())
         self.assertEqual(context['tokens'], ['foo', 'bar'])
+        self.assertEqual(context['classes_hash'], self.learning_model.get_classes_hash())
 
     def test_get_form_class(self):
         """Returns a NamedEntityRecognizerForm formset"""
@@ -113,6 +233,35 @@ class NamedEntityRecognizerModelLabellingMixinTestCase(TestCase):
         self.assertEqual(form_class.__name__, 'NamedEntityRecognizerFormFormSet')
         self.assertEqual(form_class().form().__class__, NamedEntityRecognizerForm)
 
+    def test_form_class_is_reused(self):
+        """The formset class is built once per learning model classes"""
+        self.view.tokens = ['foo']
+        form_class = self.view.get_form_class()
+
+        self.view.tokens = ['foo', 'bar']
+        self.assertIs(self.view.get_form_class(), form_class)
+
+    def test_get_form_kwargs(self):
+        """Adds the number of tokens and the classes metadata"""
+        self.view.tokens = ['foo', 'bar']
+        kwargs = self.view.get_form_kwargs()
+
+        self.assertEqual(kwargs['n_tokens'], 2)
+        self.assertIs(kwargs['classes_metadata'], self.learning_model.get_classes_metadata())
+
+    def test_get_tokens(self):
+        """Returns the learning model tokens"""
+        self.view.object = ['foo', 'bar']
+        self.assertEqual(self.view.get_tokens(), ['foo', 'bar'])
+
+    @skipIf(asyncio is None, "Requires Python 3.5+")
+    def test_get_awaitable_tokens(self):
+        """Awaitable tokens are resolved"""
+        self.view.object = ['foo', 'bar']
+        self.learning_model.get_tokens = lambda document: asyncio.sleep(0, result=document)
+
+        self.assertEqual(self.view.get_tokens(), ['foo', 'bar'])
+
     def test_get_initial_default(self):
         """Returns a list of outside labels dicts"""
         self.view.tokens = [1, 2, 3]
@@ -128,6 +277,28 @@ class NamedEntityRecognizerModelLabellingMixinTestCase(TestCase):
 
 class NamedEntityRecognizerModelFunctionalTestCase(TestCase):
 
+    def test_classes_fragments_are_cached(self):
+        """Classes fragments are cached by model name and classes hash"""
+        learning_model = TestNamedEntityRecognizerModel()
+        vary_on = [learning_model.get_name(), learning_model.get_classes_hash()]
+        style_key = make_template_fragment_key('django_learnit_ner_style', vary_on)
+        legend_key = make_template_fragment_key(
+            'django_learnit_ner_legend', vary_on + [settings.LANGUAGE_CODE])
+
+        cache.delete_many([style_key, legend_key])
+
+        document = Document.objects.create()
+        url = reverse('django_learnit:document-labelling', kwargs={
+            'name': learning_model.get_name(),
+            'pk': document.pk
+        })
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIn('.token[data-label="DAY"]', cache.get(style_key))
+        self.assertIn('Month', cache.get(legend_key))
+
     def test_create_labelled_document(self):
         """LabelledDocument is created for new document"""
         model_name = TestNamedEntityRecognizerModel().get_name()
@@ -0,0 +1,100 @@
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import (
+    TestCase,
+    RequestFactory)
+from django.views.generic import TemplateView
+
+from ..learning.base import LearningModel
+from ..views.base import (
+    LearningModelMixin,
+    BaseLearningModelLabellingView)
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class PrefetchModel(LearningModel):
+    name = 'prefetchmodel'
+    queryset = Document.objects.all()
+    prefetch_size = 3
+
+
+class LearningModelMixinTestView(LearningModelMixin, TemplateView):
+    pass
+
+
+class PrefetchTestCase(TestCase):
+
+    def setUp(self):
+        self.model = PrefetchModel()
+        self.documents = [Document.objects.create() for i in range(5)]
+
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+
+        self.view = LearningModelMixinTestView()
+        self.view.request = self.request
+        self.view.learning_model = self.model
+
+    def get_buffer(self):
+        return list(self.request.session.get(self.view.get_prefetch_session_key()))
+
+    def test_get_next_unlabelled_documents(self):
+        """Returns distinct unlabelled documents"""
+        documents = self.model.get_next_unlabelled_documents(count=3)
+
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(len(set(documents)), 3)
+        self.assertEqual(len(self.model.get_next_unlabelled_documents(count=10)), 5)
+
+    def test_no_buffer_without_session(self):
+        """Nothing is prefetched without session"""
+        self.request.session = None
+        self.assertEqual(self.view.get_prefetched_document_ids(), [])
+        self.assertIsNotNone(self.view.get_next_document_id())
+
+    def test_no_buffer_when_disabled(self):
+        """Nothing is prefetched when prefetch size is 0"""
+        self.model.prefetch_size = 0
+        self.assertEqual(self.view.get_prefetched_document_ids(), [])
+
+    def test_next_documents_are_popped_from_buffer(self):
+        """Next documents come from the buffer, refilled when empty"""
+        first_id = self.view.get_next_document_id()
+        buffered_ids = self.get_buffer()
+        self.assertEqual(len(buffered_ids), 2)
+        self.assertNotIn(first_id, buffered_ids)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.view.get_next_document_id(), buffered_ids[0])
+
+        self.assertEqual(self.view.get_next_document_id(), buffered_ids[1])
+        self.assertEqual(self.get_buffer(), [])
+
+        self.view.get_next_document_id()
+        self.assertEqual(len(self.get_buffer()), 2)
+
+    def test_labelled_documents_are_skipped(self):
+        """Buffered documents labelled meanwhile are skipped"""
+        self.view.get_next_document_id()
+        buffered_ids = self.get_buffer()
+
+        LabelledDocumentFactory.create(
+            document=Document.objects.get(pk=buffered_ids[0]),
+            model_name=self.model.get_name())
+
+        self.assertEqual(self.view.get_next_document_id(), buffered_ids[1])
+
+    def test_next_document_url_in_context(self):
+        """Labelling view context has the next document url"""
+        view = BaseLearningModelLabellingView()
+        view.request = self.request
+        view.learning_model = self.model
+        view.object = self.documents[0]
+        view.form_class = None
+
+        context = view.get_context_data(form=None)
+        next_id = self.get_buffer()[0]
+
+        self.assertNotEqual(next_id, self.documents[0].pk)
+        self.assertEqual(context['next_document_url'], view.get_document_url(next_id))
@@ -0,0 +1,130 @@
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.utils import six
+
+from ..compat import (
+    asyncio,
+    get_event_loop,
+    resolve_awaitable)
+from ..library import get_learning_model
+from ..models import (
+    BuildRun,
+    DocumentPrediction,
+    LabelledDocument)
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class PrelabellingTestCase(TestCase):
+
+    def setUp(self):
+        self.classifier = get_learning_model('test_singlelabel_classifier')
+        self.ner = get_learning_model('test_ner')
+
+        self.classifier.predict = lambda documents: [1] * len(documents)
+        self.ner.predict = lambda documents: [['DAY', 'O'] for d in documents]
+
+    def tearDown(self):
+        for learning_model in (self.classifier, self.ner):
+            del learning_model.predict
+            learning_model.__dict__.pop('prelabelling', None)
+
+    def get_url(self, learning_model, document):
+        return reverse('django_learnit:document-labelling', kwargs={
+            'name': learning_model.get_name(),
+            'pk': document.pk
+        })
+
+    def test_store_predictions(self):
+        """Unlabelled documents predictions are stored in batches"""
+        documents = [Document.objects.create() for i in range(5)]
+        LabelledDocumentFactory.create(
+            document=documents[0], model_name=self.classifier.get_name(), value='{}')
+
+        self.assertEqual(self.classifier.store_predictions(batch_size=2), 4)
+        self.assertEqual(self.classifier.store_predictions(batch_size=2), 4)
+
+        prediction = DocumentPrediction.objects.get_for_document(
+            documents[1], self.classifier.get_name())
+
+        self.assertEqual(prediction.deserialize_value(), {'label': 1})
+        self.assertEqual(DocumentPrediction.objects.count(), 4)
+        self.assertIsNone(DocumentPrediction.objects.get_for_document(
+            documents[0], self.classifier.get_name()))
+
+    def test_run_predictions_records_stages(self):
+        """Prediction runs are recorded apart from builds"""
+        Document.objects.create()
+        build_run = self.classifier.run_predictions()
+
+        self.assertEqual(build_run.kind, BuildRun.PREDICTION)
+        self.assertEqual(build_run.status, BuildRun.SUCCEEDED)
+        self.assertEqual(
+            [(stage.name, stage.rows) for stage in build_run.stages.all()],
+            [('prediction', 1)])
+        self.assertIsNone(BuildRun.objects.get_last_succeeded(self.classifier.get_name()))
+
+    @skipIf(asyncio is None, "Requires Python 3.5+")
+    def test_store_awaitable_predictions(self):
+        """Awaitable predictions are resolved"""
+        Document.objects.create()
+        self.classifier.predict = lambda documents: asyncio.sleep(0, result=[0] * len(documents))
+
+        self.assertEqual(self.classifier.store_predictions(), 1)
+        self.assertEqual(
+            DocumentPrediction.objects.get().deserialize_value(), {'label': 0})
+
+    @skipIf(asyncio is None, "Requires Python 3.5+")
+    def test_event_loop_is_reused(self):
+        """Awaitables of a thread are run in the same event loop"""
+        loop = get_event_loop()
+
+        self.assertEqual(resolve_awaitable(asyncio.sleep(0, result=1)), 1)
+        self.assertIs(get_event_loop(), loop)
+        self.assertFalse(loop.is_closed())
+
+    def test_initial_from_prediction(self):
+        """Prelabelling initializes the form with the stored prediction"""
+        document = Document.objects.create()
+        self.ner.store_predictions()
+
+        response = self.client.get(self.get_url(self.ner, document))
+        self.assertEqual(response.context['form'].initial, [
+            {'label': 'O'},
+            {'label': 'O'}
+        ])
+
+        self.ner.prelabelling = True
+
+        response = self.client.get(self.get_url(self.ner, document))
+        self.assertEqual(response.context['form'].initial, [
+            {'label': 'DAY'},
+            {'label': 'O'}
+        ])
+
+    def test_labelled_value_takes_precedence(self):
+        """Stored labels are used over predictions"""
+        document = Document.objects.create()
+        self.classifier.store_predictions()
+        self.classifier.prelabelling = True
+
+        LabelledDocument.objects.update_or_create_for_document(
+            document, self.classifier.get_name(),
+            LabelledDocument.serialize_value({'label': 0}))
+
+        response = self.client.get(self.get_url(self.classifier, document))
+        self.assertEqual(response.context['form'].initial, {'label': 0})
+
+    def test_predict_command(self):
+        """Stores the given learning model predictions"""
+        Document.objects.create()
+
+        out = six.StringIO()
+        call_command('learnit_predict', 'test_ner', stdout=out)
+
+        self.assertIn('test_ner: 1 predictions stored', out.getvalue())
+        self.assertEqual(DocumentPrediction.objects.count(), 1)
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.urlresolvers import reverse
+from django.test import (
+    TestCase,
+    override_settings)
+
+from ..learning.base import LearningModel
+from ..learning.profiling import StageMetrics
+from ..models import (
+    BuildRun,
+    BuildStage)
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class ProfiledModel(LearningModel):
+    name = 'testmodel'
+    queryset = Document.objects.all()
+
+    def build_model(self, labelled_documents):
+        with self.stage('featurization', rows=labelled_documents.count()):
+            return [document.pk for document in labelled_documents]
+
+
+class StageTestCase(TestCase):
+
+    def setUp(self):
+        self.model = ProfiledModel()
+
+    def test_stage_metrics(self):
+        """Stages measure wall time, CPU time, peak RSS and rows"""
+        with self.model.stage('loading') as metrics:
+            self.assertIsInstance(metrics, StageMetrics)
+            metrics.rows = 3
+
+        self.assertEqual(metrics.name, 'loading')
+        self.assertEqual(metrics.rows, 3)
+        self.assertGreaterEqual(metrics.wall_time, 0)
+        self.assertGreaterEqual(metrics.cpu_time, 0)
+        self.assertGreater(metrics.peak_rss, 0)
+        self.assertEqual(metrics.profile_path, '')
+
+    def test_stage_depth(self):
+        """Nested stages record their depth"""
+        with self.model.stage('fitting') as outer:
+            with self.model.stage('featurization') as inner:
+                pass
+
+        self.assertEqual(outer.depth, 0)
+        self.assertEqual(inner.depth, 1)
+
+    def test_stage_depth_by_thread(self):
+        """Stages of concurrent threads do not share their depth"""
+        stages = []
+
+        def run():
+            with self.model.stage('prediction') as metrics:
+                stages.append(metrics)
+
+        with self.model.stage('fitting'):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(stages[0].depth, 0)
+
+    def test_stage_measured_on_error(self):
+        """Stages raising an exception are still measured"""
+        with self.assertRaises(ValueError):
+            with self.model.stage('fitting') as metrics:
+                raise ValueError()
+
+        self.assertIsNotNone(metrics.wall_time)
+
+        with self.model.stage('saving') as metrics:
+            pass
+
+        self.assertEqual(metrics.depth, 0)
+
+    def test_profile_capture(self):
+        """Outermost stages are captured with cProfile when enabled"""
+        profile_dir = tempfile.mkdtemp()
+
+        try:
+            with override_settings(LEARNIT_PROFILE_DIR=os.path.join(profile_dir, 'profiles')):
+                with self.model.stage('fitting') as outer:
+                    with self.model.stage('featurization') as inner:
+                        pass
+
+            self.assertTrue(os.path.isfile(outer.profile_path))
+            self.assertIn('testmodel-fitting-', outer.profile_path)
+            self.assertEqual(inner.profile_path, '')
+        finally:
+            shutil.rmtree(profile_dir)
+
+
+class BuildStagesTestCase(TestCase):
+
+    def setUp(self):
+        self.model = ProfiledModel()
+
+        for i in range(2):
+            LabelledDocumentFactory.create(
+                document=Document.objects.create(),
+                model_name=self.model.get_name(),
+                value='{}')
+
+    def test_run_build_records_stages(self):
+        """Build stages are stored in start order with the build run"""
+        build_run = self.model.run_build()
+
+        self.assertEqual(
+            [(stage.name, stage.depth, stage.rows) for stage in build_run.stages.all()],
+            [('loading', 0, 2), ('fitting', 0, None), ('featurization', 1, 2), ('saving', 0, None)])
+
+    def test_labelled_documents_loaded_before_fitting(self):
+        """Labelled documents are queried in the loading stage"""
+        self.model.build_model = lambda labelled_documents: (
+            self.assertNumQueries(0, list, labelled_documents))
+
+        self.model.build()
+
+    def test_failed_build_records_stages(self):
+        """Stages of a failed build are stored"""
+        self.model.save_model = lambda: 1 / 0
+        build_run = self.model.run_build()
+
+        self.assertEqual(build_run.status, BuildRun.FAILED)
+        self.assertEqual(build_run.stages.count(), 4)
+
+    def test_stages_outside_build_run_not_stored(self):
+        """Stages are only stored within a build run"""
+        self.model.build()
+
+        self.assertFalse(BuildStage.objects.exists())
+
+    def test_detail_view(self):
+        """The last build stages are displayed on the detail page"""
+        self.model.run_build()
+        BuildStage.objects.update(profile_path='/srv/profiles/testmodel-fitting.prof')
+
+        response = self.client.get(reverse('django_learnit:learning-model-detail', kwargs={
+            'name': self.model.get_name()
+        }))
+
+        self.assertEqual(len(response.context['last_build_stages']), 4)
+        self.assertContains(response, 'featurization')
+        self.assertNotContains(response, '/srv/profiles')
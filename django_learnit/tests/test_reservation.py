@@ -0,0 +1,219 @@
+import threading
+from datetime import timedelta
+
+from django import forms
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    TestCase,
+    TransactionTestCase)
+from django.utils import (
+    six,
+    timezone)
+from django.views.generic import FormView
+
+from ..learning.base import LearningModel
+from ..models import DocumentLease
+from ..views.base import LabelledDocumentFormMixin
+
+from .models import Document
+
+
+class LeasedModel(LearningModel):
+    name = 'leasedmodel'
+    queryset = Document.objects.all()
+    lease_duration = 60
+
+
+class DocumentReservationTestCase(TestCase):
+
+    def setUp(self):
+        self.model = LeasedModel()
+        self.documents = [Document.objects.create() for i in range(3)]
+
+    def test_no_lease_by_default(self):
+        """Documents are not leased without lease duration"""
+        model = LeasedModel()
+        model.lease_duration = None
+
+        model.get_next_unlabelled_document(annotator='a')
+        self.assertFalse(DocumentLease.objects.exists())
+
+    def test_picked_document_is_leased(self):
+        """Picked document is leased to the annotator"""
+        document = self.model.get_next_unlabelled_document(annotator='a')
+
+        lease = DocumentLease.objects.get()
+        self.assertEqual(lease.document_id, document.pk)
+        self.assertEqual(lease.annotator, 'a')
+
+    def test_leased_documents_are_excluded(self):
+        """Annotators get distinct documents"""
+        picked = set(
+            self.model.get_next_unlabelled_document(annotator=annotator).pk
+            for annotator in ['a', 'b', 'c'])
+
+        self.assertEqual(picked, set(document.pk for document in self.documents))
+        self.assertIsNone(self.model.get_next_unlabelled_document(annotator='d'))
+
+    def test_own_lease_is_renewed(self):
+        """Annotator keeps its own leased documents available"""
+        for document in self.documents:
+            self.assertTrue(self.model.acquire_lease(document, 'a'))
+
+        self.assertIsNotNone(self.model.get_next_unlabelled_document(annotator='a'))
+        self.assertTrue(self.model.acquire_lease(self.documents[0], 'a'))
+        self.assertEqual(DocumentLease.objects.count(), 3)
+
+    def test_active_lease_is_not_taken_over(self):
+        """Another annotator lease is kept until it expires"""
+        document = self.documents[0]
+        self.assertTrue(self.model.acquire_lease(document, 'a'))
+        self.assertFalse(self.model.acquire_lease(document, 'b'))
+
+        DocumentLease.objects.update(expires=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(self.model.acquire_lease(document, 'b'))
+        self.assertEqual(DocumentLease.objects.get().annotator, 'b')
+
+    def test_lease_is_released(self):
+        """Lease is deleted when released"""
+        self.model.acquire_lease(self.documents[0], 'a')
+        self.model.release_lease(self.documents[0])
+
+        self.assertFalse(DocumentLease.objects.exists())
+
+    def test_pick_again_when_lease_is_lost(self):
+        """Picks another document when the picked one is leased meanwhile"""
+        taken = self.documents[0]
+        self.model.acquire_lease(taken, 'a')
+
+        picks = iter([taken, self.documents[1]])
+        self.model.pick_unlabelled_document = lambda annotator: next(picks)
+
+        self.assertEqual(
+            self.model.get_next_unlabelled_document(annotator='b'), self.documents[1])
+
+    def test_lease_is_released_when_labelled(self):
+        """Lease is released when the labelling form is valid"""
+        class View(LabelledDocumentFormMixin, FormView):
+            success_url = '/'
+
+        self.model.acquire_lease(self.documents[0], 'a')
+
+        view = View()
+        view.object = self.documents[0]
+        view.learning_model = self.model
+
+        form = forms.Form()
+        form.cleaned_data = {'label': 'foo'}
+        view.form_valid(form)
+
+        self.assertFalse(DocumentLease.objects.exists())
+
+    def test_sweep_leases_command(self):
+        """Expired leases are deleted"""
+        self.model.acquire_lease(self.documents[0], 'a')
+        self.model.acquire_lease(self.documents[1], 'b')
+        DocumentLease.objects\
+            .filter(annotator='a')\
+            .update(expires=timezone.now() - timedelta(seconds=1))
+
+        out = six.StringIO()
+        call_command('learnit_sweep_leases', stdout=out)
+
+        self.assertIn('1 expired leases deleted', out.getvalue())
+        self.assertEqual(DocumentLease.objects.get().annotator, 'b')
+
+
+class Barrier(object):
+    """
+    Blocks threads until `parties` threads are waiting
+    """
+
+    def __init__(self, parties):
+        self.parties = parties
+        self.condition = threading.Condition()
+
+    def wait(self):
+        with self.condition:
+            self.parties -= 1
+
+            if self.parties <= 0:
+                self.condition.notify_all()
+
+            while self.parties > 0:
+                self.condition.wait()
+
+
+class NoLock(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+class ConcurrentAnnotatorsTestCase(TransactionTestCase):
+
+    n_annotators = 30
+
+    def test_concurrent_annotators_get_distinct_documents(self):
+        """Parallel annotators never get the same document"""
+        n_annotators = self.n_annotators
+
+        # SQLite does not allow concurrent writes, queries are serialized
+        # but every annotator picks a document before any lease is acquired
+        db_lock = threading.Lock() if connection.vendor == 'sqlite' else NoLock()
+        barrier = Barrier(n_annotators)
+        local = threading.local()
+
+        class RacingModel(LeasedModel):
+            lease_attempts = n_annotators
+
+            def pick_unlabelled_document(self, annotator):
+                with db_lock:
+                    document = super(RacingModel, self).pick_unlabelled_document(annotator)
+
+                if not getattr(local, 'picked', False):
+                    local.picked = True
+                    barrier.wait()
+
+                return document
+
+            def acquire_lease(self, document, annotator):
+                with db_lock:
+                    return super(RacingModel, self).acquire_lease(document, annotator)
+
+        model = RacingModel()
+
+        for i in range(n_annotators * 2):
+            Document.objects.create()
+
+        picked = []
+        errors = []
+
+        def annotate(annotator):
+            try:
+                document = model.get_next_unlabelled_document(annotator=annotator)
+                picked.append(document.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=annotate, args=('annotator%d' % i,))
+            for i in range(n_annotators)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(picked), n_annotators)
+        self.assertEqual(len(set(picked)), n_annotators)
+        self.assertEqual(DocumentLease.objects.count(), n_annotators)
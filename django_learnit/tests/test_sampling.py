@@ -0,0 +1,648 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.utils import six
+
+from ..exceptions import ImproperlyConfigured
+from ..learning.base import LearningModel
+from ..learning.index import UnlabelledIndex
+from ..learning.sampling import (
+    INDEXED_SAMPLING,
+    POOLED_SAMPLING,
+    SHUFFLED_SAMPLING,
+    STRATIFIED_SAMPLING,
+    stable_hash)
+from ..library import get_learning_model
+from ..models import (
+    AnnotatorCursor,
+    DocumentSortKey,
+    StratumCount)
+from ..views.base import LearningModelMixin
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class ShuffledModel(LearningModel):
+    name = 'shuffledmodel'
+    queryset = Document.objects.all()
+    sampling = SHUFFLED_SAMPLING
+
+
+class ShuffledSamplingTestCase(TestCase):
+
+    def setUp(self):
+        self.model = ShuffledModel()
+        self.documents = [Document.objects.create() for i in range(10)]
+
+    def get_permutation(self):
+        return [
+            document_id for document_id, sort_key in
+            DocumentSortKey.objects.filter(model_name=self.model.get_name())
+            .order_by('sort_key').values_list('document_id', 'sort_key')
+        ]
+
+    def test_stable_hash(self):
+        """Hash is stable and fits in a signed 64 bits integer"""
+        self.assertEqual(stable_hash('foo', 1), stable_hash('foo', 1))
+        self.assertNotEqual(stable_hash('foo', 1), stable_hash('foo', 2))
+        self.assertLess(stable_hash('foo', 1), 2 ** 63)
+
+    def test_sync_sort_keys(self):
+        """Missing sort keys are created"""
+        self.assertEqual(self.model.sync_sort_keys(batch_size=3), 10)
+        self.assertEqual(self.model.sync_sort_keys(batch_size=3), 0)
+
+        Document.objects.create()
+        self.assertEqual(self.model.sync_sort_keys(), 1)
+        self.assertEqual(DocumentSortKey.objects.count(), 11)
+
+    def test_annotator_walks_the_permutation(self):
+        """Annotator gets documents in the permutation order, wrapping around"""
+        self.model.sync_sort_keys()
+        permutation = self.get_permutation()
+
+        first = self.model.get_next_unlabelled_document(annotator='a').pk
+        start = permutation.index(first)
+
+        picked = [first] + [
+            self.model.get_next_unlabelled_document(annotator='a').pk
+            for i in range(9)
+        ]
+
+        self.assertEqual(picked, permutation[start:] + permutation[:start])
+        self.assertEqual(AnnotatorCursor.objects.count(), 1)
+
+    def test_labelled_documents_are_skipped(self):
+        """Labelled documents are not returned"""
+        self.model.sync_sort_keys()
+
+        for document in self.documents[:9]:
+            LabelledDocumentFactory.create(
+                document=document, model_name=self.model.get_name())
+
+        self.assertEqual(
+            self.model.get_next_unlabelled_document(annotator='a'), self.documents[9])
+
+        LabelledDocumentFactory.create(
+            document=self.documents[9], model_name=self.model.get_name())
+        self.assertIsNone(self.model.get_next_unlabelled_document(annotator='a'))
+
+    def test_new_documents_get_sort_keys(self):
+        """Sort keys of documents added since the last sync are created"""
+        self.model.sync_sort_keys()
+        document = Document.objects.create()
+
+        self.model.get_next_unlabelled_document(annotator='a')
+
+        self.assertTrue(DocumentSortKey.objects.filter(document_id=document.pk).exists())
+        self.assertEqual(DocumentSortKey.objects.count(), 11)
+
+    def test_documents_without_sort_key(self):
+        """Documents without sort key are picked randomly when the keyed ones are labelled"""
+        self.model.sync_sort_keys()
+        DocumentSortKey.objects.filter(document_id=self.documents[0].pk).delete()
+
+        for document in self.documents[1:]:
+            LabelledDocumentFactory.create(
+                document=document, model_name=self.model.get_name())
+
+        self.assertEqual(
+            self.model.get_next_unlabelled_document(annotator='a'), self.documents[0])
+
+    def test_reproducible_across_sessions(self):
+        """The same annotator gets the same first document"""
+        self.model.sync_sort_keys()
+
+        first = self.model.get_next_unlabelled_document(annotator='a')
+        AnnotatorCursor.objects.all().delete()
+
+        self.assertEqual(self.model.get_next_unlabelled_document(annotator='a'), first)
+
+    def test_annotators_start_at_different_positions(self):
+        """Annotators start at their own position"""
+        positions = set(
+            self.model.get_annotator_start_position('annotator%d' % i)
+            for i in range(10))
+        self.assertEqual(len(positions), 10)
+
+    def test_random_sampling_without_annotator(self):
+        """Falls back to random sampling without annotator"""
+        self.assertIn(self.model.get_next_unlabelled_document(), self.documents)
+        self.assertFalse(AnnotatorCursor.objects.exists())
+
+    def test_sync_sampling(self):
+        """Creates sort keys"""
+        self.model.sync_sampling()
+        self.assertEqual(DocumentSortKey.objects.count(), 10)
+
+
+class StratifiedModel(LearningModel):
+    name = 'stratifiedmodel'
+    queryset = Document.objects.all()
+    sampling = STRATIFIED_SAMPLING
+    strata = ('category',)
+
+
+class StratifiedSamplingTestCase(TestCase):
+
+    def setUp(self):
+        self.model = StratifiedModel()
+
+        self.common = [Document.objects.create(category='common') for i in range(8)]
+        self.rare = [Document.objects.create(category='rare') for i in range(2)]
+
+    def label(self, document):
+        LabelledDocumentFactory.create(
+            document=document, model_name=self.model.get_name())
+        self.model.document_labelled(document)
+
+    def get_counts(self):
+        return dict(
+            (stratum_count.stratum, (stratum_count.labelled, stratum_count.unlabelled))
+            for stratum_count in StratumCount.objects.filter(model_name=self.model.get_name()))
+
+    def test_get_strata_raises_when_not_set(self):
+        """Raise exception when strata are not set"""
+        with self.assertRaises(ImproperlyConfigured):
+            ShuffledModel().get_strata()
+
+    def test_sync_strata_counts(self):
+        """Strata counts are computed"""
+        LabelledDocumentFactory.create(
+            document=self.common[0], model_name=self.model.get_name())
+
+        self.assertEqual(self.model.sync_strata_counts(), 2)
+        self.assertEqual(self.get_counts(), {
+            '["common"]': (1, 7),
+            '["rare"]': (0, 2)
+        })
+
+    def test_counts_are_updated_when_labelled(self):
+        """Labelling a document updates its stratum counts"""
+        self.model.sync_sampling()
+        self.label(self.rare[0])
+
+        self.assertEqual(self.get_counts(), {
+            '["common"]': (0, 8),
+            '["rare"]': (1, 1)
+        })
+
+    def test_pick_from_under_represented_stratum(self):
+        """Documents are picked from the stratum with the fewest labels"""
+        for document in self.common[:3]:
+            LabelledDocumentFactory.create(
+                document=document, model_name=self.model.get_name())
+
+        self.model.sync_strata_counts()
+
+        picked = []
+        for i in range(4):
+            document = self.model.get_next_unlabelled_document()
+            picked.append(document.category)
+            self.label(document)
+
+        self.assertEqual(picked, ['rare', 'rare', 'common', 'common'])
+
+    def test_new_documents_are_counted(self):
+        """Documents added after the sync are counted, in new strata too"""
+        self.model.sync_strata_counts()
+
+        Document.objects.create(category='common')
+        new = Document.objects.create(category='new')
+        LabelledDocumentFactory.create(
+            document=new, model_name=self.model.get_name())
+
+        self.assertEqual(self.model.count_new_strata_documents(), 2)
+        self.assertEqual(self.model.count_new_strata_documents(), 0)
+        self.assertEqual(self.get_counts(), {
+            '["common"]': (0, 9),
+            '["rare"]': (0, 2),
+            '["new"]': (1, 0)
+        })
+
+    def test_new_documents_are_counted_when_labelling(self):
+        """Labelling a document counts the documents added since the last one"""
+        self.model.sync_strata_counts()
+
+        Document.objects.create(category='common')
+        self.label(Document.objects.create(category='new'))
+        self.label(self.common[0])
+
+        self.assertEqual(self.get_counts(), {
+            '["common"]': (1, 8),
+            '["rare"]': (0, 2),
+            '["new"]': (1, 0)
+        })
+
+    def test_random_document_without_sync(self):
+        """Random documents are picked when strata are not counted"""
+        with self.assertNumQueries(2):
+            self.assertIsNotNone(self.model.get_next_unlabelled_document())
+
+        self.assertEqual(self.get_counts(), {})
+
+    def test_random_pick_in_stratum(self):
+        """Documents are picked randomly in the stratum"""
+        self.model.sync_strata_counts()
+
+        picked = set(self.model.get_next_unlabelled_document() for i in range(30))
+
+        self.assertGreater(len(picked), 1)
+        self.assertTrue(picked.issubset(self.common))
+
+    def test_stale_counts(self):
+        """Strata without unlabelled documents left are skipped"""
+        LabelledDocumentFactory.create(
+            document=self.common[0], model_name=self.model.get_name())
+        self.model.sync_strata_counts()
+
+        # Labelled without updating counts
+        for document in self.rare:
+            LabelledDocumentFactory.create(
+                document=document, model_name=self.model.get_name())
+
+        self.assertEqual(self.model.get_next_unlabelled_document().category, 'common')
+        self.assertEqual(self.get_counts()['["rare"]'], (0, 0))
+
+    def test_none_when_nothing_left(self):
+        """Returns None when everything is labelled"""
+        self.model.sync_strata_counts()
+
+        for document in self.common + self.rare:
+            self.label(document)
+
+        self.assertIsNone(self.model.get_next_unlabelled_document())
+
+    def test_labelling_view_updates_counts(self):
+        """Counts are updated when labelling through the view"""
+        learning_model = get_learning_model('test_singlelabel_classifier')
+        learning_model.sampling = STRATIFIED_SAMPLING
+        learning_model.strata = ('category',)
+
+        try:
+            learning_model.sync_strata_counts()
+
+            url = reverse('django_learnit:document-labelling', kwargs={
+                'name': learning_model.get_name(),
+                'pk': self.rare[0].pk
+            })
+            self.client.post(url, {'label': '1'})
+            self.client.post(url, {'label': '0'})
+        finally:
+            del learning_model.sampling
+            del learning_model.strata
+
+        stratum_count = StratumCount.objects.get(
+            model_name=learning_model.get_name(), stratum='["rare"]')
+        self.assertEqual((stratum_count.labelled, stratum_count.unlabelled), (1, 1))
+
+    def test_sort_keys_command(self):
+        """Creates sort keys of the given learning model"""
+        out = six.StringIO()
+        call_command('learnit_sort_keys', 'testmodel', batch_size=3, stdout=out)
+
+        self.assertIn('testmodel: 10 sort keys created', out.getvalue())
+
+    def test_sync_sampling_command(self):
+        """Synchronizes the given learning model"""
+        out = six.StringIO()
+        call_command('learnit_sync_sampling', 'testmodel', stdout=out)
+
+        self.assertIn('testmodel: random sampling synchronized', out.getvalue())
+
+
+class PooledModel(LearningModel):
+    name = 'pooledmodel'
+    queryset = Document.objects.all()
+    sampling = POOLED_SAMPLING
+    pool_block_size = 3
+
+
+class PooledSamplingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.model = PooledModel()
+        self.documents = [Document.objects.create() for i in range(8)]
+
+    def label(self, document):
+        LabelledDocumentFactory.create(
+            document=document, model_name=self.model.get_name(), value='{}')
+
+    def test_reconcile_unlabelled_pool(self):
+        """Pool holds the unlabelled documents IDs"""
+        self.label(self.documents[0])
+        self.assertEqual(self.model.reconcile_unlabelled_pool(), 7)
+
+        document_ids = []
+        document_id = self.model.pop_pool_document_id()
+
+        while document_id is not None:
+            document_ids.append(document_id)
+            document_id = self.model.pop_pool_document_id()
+
+        self.assertEqual(sorted(document_ids), [d.pk for d in self.documents[1:]])
+
+    def test_random_document_when_missing(self):
+        """Random documents are served until the pool is built"""
+        self.assertIn(self.model.get_next_unlabelled_document(), self.documents)
+        self.assertIn(
+            self.model.get_next_unlabelled_document_id(), [d.pk for d in self.documents])
+        self.assertIsNone(self.model.pop_pool_document_id())
+        self.assertIsNone(cache.get(self.model.get_pool_key('current')))
+
+    def test_labelled_documents_are_removed(self):
+        """Labelled documents are flagged and skipped"""
+        self.model.reconcile_unlabelled_pool()
+
+        for document in self.documents[:-1]:
+            self.label(document)
+            self.model.document_labelled(document)
+
+        with self.assertNumQueries(1):
+            document = self.model.get_next_unlabelled_document()
+
+        self.assertEqual(document, self.documents[-1])
+
+    def test_random_document_when_exhausted(self):
+        """Exhausted pool is not rebuilt, random documents are served"""
+        self.model.reconcile_unlabelled_pool()
+        current = cache.get(self.model.get_pool_key('current'))
+
+        picked = [self.model.get_next_unlabelled_document() for i in range(8)]
+        self.assertEqual(sorted(d.pk for d in picked), [d.pk for d in self.documents])
+
+        # Not labelled, served again randomly
+        self.assertIsNotNone(self.model.get_next_unlabelled_document())
+        self.assertEqual(cache.get(self.model.get_pool_key('current')), current)
+
+        for document in self.documents:
+            self.label(document)
+
+        self.assertIsNone(self.model.get_next_unlabelled_document())
+        self.assertIsNone(self.model.get_next_unlabelled_document_id())
+
+    def test_removed_flags_are_compact(self):
+        """Removed documents are flagged in a bitset word of their block"""
+        self.model.reconcile_unlabelled_pool()
+        generation = cache.get(self.model.get_pool_key('current'))[0]
+
+        for document in self.documents[:3]:
+            self.model.document_labelled(document)
+
+        # Removing twice keeps the flag
+        self.model.remove_from_pool(self.documents[0].pk)
+
+        self.assertEqual(cache.get(self.model.get_pool_key(generation, 'removed', 0, 0)), 7)
+        self.assertIsNone(cache.get(self.model.get_pool_key(generation, 'removed', 1, 0)))
+
+        document_ids = []
+        document_id = self.model.pop_pool_document_id()
+
+        while document_id is not None:
+            document_ids.append(document_id)
+            document_id = self.model.pop_pool_document_id()
+
+        self.assertEqual(sorted(document_ids), [d.pk for d in self.documents[3:]])
+
+    def test_sync_sampling(self):
+        """Synchronizing reconciles the pool"""
+        self.model.sync_sampling()
+        self.assertIsNotNone(self.model.pop_pool_document_id())
+
+    def test_previous_generation_is_deleted(self):
+        """Rebuilding the pool deletes the entries of the previous one"""
+        self.model.reconcile_unlabelled_pool()
+        generation = cache.get(self.model.get_pool_key('current'))[0]
+        self.model.pop_pool_document_id()
+        self.model.document_labelled(self.documents[0])
+
+        # A query per block of the 8 unlabelled documents
+        with self.assertNumQueries(3):
+            self.model.reconcile_unlabelled_pool()
+
+        keys = [
+            self.model.get_pool_key(generation, 'block', 0),
+            self.model.get_pool_key(generation, 'starts'),
+            self.model.get_pool_key(generation, 'cursor'),
+            self.model.get_pool_key(generation, 'removed', 0, 0)
+        ]
+        self.assertEqual(cache.get_many(keys), {})
+
+        # Pops are served from the new pool
+        self.assertIsNotNone(self.model.pop_pool_document_id())
+
+    def test_next_document_id_without_queries(self):
+        """Next document ID is served from the pool without queries"""
+        self.model.reconcile_unlabelled_pool()
+
+        with self.assertNumQueries(0):
+            document_id = self.model.get_next_unlabelled_document_id()
+
+        self.assertIn(document_id, [d.pk for d in self.documents])
+
+
+class UnlabelledIndexTestCase(TestCase):
+
+    def test_remove_and_pick(self):
+        """Removed IDs are never picked"""
+        index = UnlabelledIndex()
+        index.extend([1, 3, 5, 7])
+        index.extend([9, 11])
+
+        self.assertTrue(index.remove(3))
+        self.assertTrue(index.remove(3))
+        self.assertFalse(index.remove(4))
+        self.assertEqual(len(index), 5)
+
+        for document_id in (1, 5, 7, 9):
+            index.remove(document_id)
+
+        self.assertEqual(set(index.pick() for i in range(10)), set([11]))
+
+        index.remove(11)
+        self.assertIsNone(index.pick())
+
+
+class IndexedModel(LearningModel):
+    name = 'indexedmodel'
+    queryset = Document.objects.all()
+    sampling = INDEXED_SAMPLING
+    index_chunk_size = 3
+
+
+class IndexedSamplingTestCase(TestCase):
+
+    def setUp(self):
+        self.model = IndexedModel()
+        self.documents = [Document.objects.create() for i in range(5)]
+
+    def label(self, document):
+        LabelledDocumentFactory.create(
+            document=document, model_name=self.model.get_name(), value='{}')
+
+    def test_index_is_loaded_in_chunks(self):
+        """Every unlabelled ID is loaded, a chunk per query"""
+        self.label(self.documents[1])
+        index = self.model.get_unlabelled_index()
+
+        self.assertEqual(self.model.load_unlabelled_index_chunk(index), 3)
+        self.assertFalse(index.complete)
+
+        self.model.get_next_unlabelled_document()
+        self.assertEqual(
+            list(index.ids), [d.pk for d in self.documents if d != self.documents[1]])
+        self.assertTrue(index.complete)
+
+    def test_picks_span_all_documents(self):
+        """Picks are spread over the whole primary key range"""
+        picked = set(self.model.get_next_unlabelled_document().pk for i in range(100))
+
+        self.assertIn(self.documents[-1].pk, picked)
+
+    def test_refresh_removes_labelled_documents(self):
+        """Documents labelled by other processes are removed on refresh"""
+        self.model.get_next_unlabelled_document()
+        index = self.model.get_unlabelled_index()
+
+        for document in self.documents[:2]:
+            self.label(document)
+
+        self.model.refresh_unlabelled_index(index)
+        self.assertEqual(len(index), 3)
+
+    def test_refresh_loads_new_documents(self):
+        """Documents created after the index is complete are loaded"""
+        self.model.index_chunk_size = 10
+        self.model.get_next_unlabelled_document()
+        index = self.model.get_unlabelled_index()
+
+        document = Document.objects.create()
+        self.model.refresh_unlabelled_index(index)
+        self.model.load_unlabelled_index_chunk(index)
+
+        self.assertEqual(index.ids[-1], document.pk)
+
+    def test_none_when_nothing_left(self):
+        """Returns None when every document is labelled"""
+        for document in self.documents:
+            self.label(document)
+
+        self.assertIsNone(self.model.get_next_unlabelled_document())
+
+
+class ShardedModel(LearningModel):
+    name = 'shardedmodel'
+    queryset = Document.objects.all()
+    shards = 3
+
+
+class ShardedPoolTestCase(TestCase):
+
+    def setUp(self):
+        self.model = ShardedModel()
+        self.documents = [Document.objects.create() for i in range(12)]
+
+    def test_get_shards_raises_when_invalid(self):
+        """Raises ImproperlyConfigured when not a positive integer"""
+        self.model.shards = 0
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.model.get_shards()
+
+    def test_filter_shard(self):
+        """Database and Python shards match"""
+        for shard in range(3):
+            expected = [
+                document.pk for document in self.documents
+                if self.model.get_document_shard(document.pk) == shard
+            ]
+            self.assertEqual(
+                sorted(self.model.filter_shard(Document.objects.all(), shard)
+                       .values_list('pk', flat=True)),
+                expected)
+
+    def test_contiguous_shards(self):
+        """Shards are contiguous primary key ranges"""
+        shards = [self.model.get_document_shard(document.pk) for document in self.documents]
+
+        self.assertEqual(shards, [0] * 4 + [1] * 4 + [2] * 4)
+
+    def test_stable_bounds(self):
+        """Shards only move when synchronized"""
+        shards = [self.model.get_document_shard(document.pk) for document in self.documents]
+        new = [Document.objects.create() for i in range(12)]
+
+        self.assertEqual(
+            [self.model.get_document_shard(document.pk) for document in self.documents], shards)
+        self.assertEqual(
+            set(self.model.get_document_shard(document.pk) for document in new), set([2]))
+        self.assertIn(new[-1], self.model.filter_shard(Document.objects.all(), 2))
+
+        self.model.sync_sampling()
+        self.assertEqual(self.model.get_document_shard(new[-1].pk), 2)
+        self.assertEqual(self.model.get_document_shard(self.documents[-1].pk), 1)
+
+    def test_uniform_picks(self):
+        """Documents following labelled ones are not picked more often"""
+        pool = Document.objects.filter(pk__in=[d.pk for d in self.documents[7:]])
+
+        picked = [
+            self.model.get_random_shard_documents(
+                pool, self.documents[0].pk, self.documents[-1].pk + 1, 1)[0].pk
+            for i in range(300)
+        ]
+
+        self.assertLess(picked.count(self.documents[7].pk), 120)
+
+    def test_annotator_picks_in_its_shard(self):
+        """Annotators get documents of their shard first"""
+        for annotator in ('alice', 'bob', 'carol'):
+            shard = self.model.get_annotator_shard(annotator)
+            document = self.model.get_next_unlabelled_document(annotator)
+
+            self.assertEqual(self.model.get_document_shard(document.pk), shard)
+
+    def test_exhausted_shard(self):
+        """Annotators move to the next shard when theirs is exhausted"""
+        shard = self.model.get_annotator_shard('alice')
+
+        for document in self.documents:
+            if self.model.get_document_shard(document.pk) == shard:
+                LabelledDocumentFactory.create(
+                    document=document, model_name=self.model.get_name(), value='{}')
+
+        document = self.model.get_next_unlabelled_document('alice')
+        self.assertNotEqual(self.model.get_document_shard(document.pk), shard)
+
+        documents = self.model.get_next_unlabelled_documents('alice', count=12)
+        self.assertEqual(
+            len(documents),
+            len([d for d in self.documents
+                 if self.model.get_document_shard(d.pk) != shard]))
+
+
+class AnnotatorTestCase(TestCase):
+
+    class User(object):
+        pk = 42
+
+        def is_authenticated(self):
+            return True
+
+    class Request(object):
+        pass
+
+    def test_get_annotator_without_request(self):
+        """Returns None without request"""
+        self.assertIsNone(LearningModelMixin().get_annotator())
+
+    def test_get_annotator_from_user(self):
+        """Returns the authenticated user key"""
+        view = LearningModelMixin()
+        view.request = self.Request()
+        view.request.user = self.User()
+
+        self.assertEqual(view.get_annotator(), 'user:42')
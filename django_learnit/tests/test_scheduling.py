@@ -0,0 +1,161 @@
+import threading
+
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    TransactionTestCase)
+from django.utils import six
+
+from freezegun import freeze_time
+
+from ..learning.base import LearningModel
+from ..library import get_learning_model
+from ..models import BuildRun
+
+from .factories import LabelledDocumentFactory
+from .models import Document
+
+
+class ScheduledModel(LearningModel):
+    name = 'scheduledmodel'
+    queryset = Document.objects.all()
+    rebuild_label_delta = 2
+    rebuild_interval = 3600
+
+    def build_model(self, labelled_documents):
+        return labelled_documents.count()
+
+
+class ShouldRebuildTestCase(TestCase):
+
+    def setUp(self):
+        self.model = ScheduledModel()
+
+    def label(self):
+        LabelledDocumentFactory.create(
+            document=Document.objects.create(),
+            model_name=self.model.get_name(),
+            value='{}')
+
+    def test_without_thresholds(self):
+        """Learning models without thresholds are never scheduled"""
+        self.label()
+        self.model.rebuild_label_delta = self.model.rebuild_interval = None
+
+        self.assertFalse(self.model.should_rebuild())
+
+    def test_never_built(self):
+        """Built once there are labels"""
+        self.assertFalse(self.model.should_rebuild())
+
+        self.label()
+        self.assertTrue(self.model.should_rebuild())
+
+    def test_label_delta(self):
+        """Rebuilt when enough labels were written since the last build"""
+        with freeze_time('2015-12-31 23:00:00'):
+            self.label()
+
+        with freeze_time('2016-01-01 00:00:00'):
+            self.model.run_build()
+
+        with freeze_time('2016-01-01 00:10:00'):
+            self.label()
+            self.assertFalse(self.model.should_rebuild())
+
+            self.label()
+            self.assertTrue(self.model.should_rebuild())
+
+    def test_interval(self):
+        """Rebuilt when the last build is too old"""
+        with freeze_time('2016-01-01 00:00:00'):
+            self.label()
+            self.model.run_build()
+
+        with freeze_time('2016-01-01 00:59:00'):
+            self.assertFalse(self.model.should_rebuild())
+
+        with freeze_time('2016-01-01 01:00:00'):
+            self.assertTrue(self.model.should_rebuild())
+
+    def test_running_build(self):
+        """Not rebuilt while a build is running, unless timed out"""
+        self.label()
+
+        with freeze_time('2016-01-01 00:00:00'):
+            BuildRun.objects.create(model_name=self.model.get_name())
+            self.assertFalse(self.model.should_rebuild())
+
+        with freeze_time('2016-01-02 00:00:01'):
+            self.assertTrue(self.model.should_rebuild())
+
+    def test_run_build(self):
+        """Build runs are recorded"""
+        self.label()
+        build_run = self.model.run_build()
+
+        self.assertEqual(build_run.status, BuildRun.SUCCEEDED)
+        self.assertEqual(build_run.labels, 1)
+        self.assertIsNotNone(build_run.finished)
+        self.assertEqual(self.model.model, 1)
+
+    def test_failed_build(self):
+        """Failed builds are recorded with the error"""
+        self.model.build_model = lambda labelled_documents: 1 / 0
+        build_run = self.model.run_build()
+
+        self.assertEqual(build_run.status, BuildRun.FAILED)
+        self.assertIn('ZeroDivisionError', build_run.error)
+
+
+class ScheduleBuildsCommandTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.learning_models = [
+            get_learning_model('test_singlelabel_classifier'),
+            get_learning_model('test_multilabel_classifier')
+        ]
+        self.running = []
+        self.max_running = []
+        lock = threading.Lock()
+        barrier = threading.Event()
+
+        def build():
+            with lock:
+                self.running.append(1)
+                self.max_running.append(len(self.running))
+
+                if len(self.running) == 2:
+                    barrier.set()
+
+            barrier.wait(1)
+
+            with lock:
+                self.running.pop()
+
+        for learning_model in self.learning_models:
+            learning_model.rebuild_label_delta = 1
+            learning_model.build = build
+
+            LabelledDocumentFactory.create(
+                document=Document.objects.create(),
+                model_name=learning_model.get_name(),
+                value='{}')
+
+    def tearDown(self):
+        for learning_model in self.learning_models:
+            del learning_model.rebuild_label_delta
+            del learning_model.build
+
+    def test_command(self):
+        """Eligible learning models are built concurrently"""
+        out = six.StringIO()
+        call_command('learnit_schedule_builds', workers=2, stdout=out)
+
+        self.assertIn('test_singlelabel_classifier: build succeeded', out.getvalue())
+        self.assertIn('test_multilabel_classifier: build succeeded', out.getvalue())
+        self.assertEqual(max(self.max_running), 2)
+
+        out = six.StringIO()
+        call_command('learnit_schedule_builds', stdout=out)
+        self.assertIn('No learning model to build', out.getvalue())
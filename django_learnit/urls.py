@@ -3,6 +3,7 @@ from django.conf.urls import url
 from .views.base import RandomUnlabelledDocumentRedirectView
 from .views.detail import LearningModelDetailView
 from .views.list import LearningModelListView
+from .views.multitask import MultiTaskLabellingView
 from .views.dispatch import labelleling_view_dispatch
 
 
@@ -13,6 +14,12 @@ urlpatterns = [
         LearningModelListView.as_view(),
         name='learning-model-list'),
 
+    # Multi-task labelling view
+    url(
+        r'^multitask/(?P<names>[^/]+)/(?P<pk>\d+)/$',
+        MultiTaskLabellingView.as_view(),
+        name='multitask-document-labelling'),
+
     # Model detail view
     url(
         r'(?P<name>[^/]+)$',
@@ -3,10 +3,14 @@ from django.http import Http404
 from django.views.generic import (
     FormView,
     RedirectView)
+from django.utils.translation import ugettext as _
 from django.views.generic.detail import SingleObjectMixin
 
+from ..cache import get_request_document_cache
 from ..library import get_learning_model
-from ..models import LabelledDocument
+from ..models import (
+    DocumentPrediction,
+    LabelledDocument)
 
 
 class LearningModelMixin(object):
@@ -40,17 +44,137 @@ class LearningModelMixin(object):
 
         return context
 
+    def get_annotator(self):
+        """
+        Returns a key identifying the annotator from the authenticated
+        user or the session, or None when there is neither
+        """
+        request = getattr(self, 'request', None)
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated():
+            return 'user:%(pk)s' % {'pk': user.pk}
+
+        session = getattr(request, 'session', None)
+        if session is not None:
+            if not session.session_key:
+                session.save()
+            return 'session:%(key)s' % {'key': session.session_key}
+
+        return None
+
+    def get_session(self):
+        """
+        Returns the request session or None
+        """
+        return getattr(getattr(self, 'request', None), 'session', None)
+
+    def get_prefetch_session_key(self):
+        """
+        Returns the session key of the prefetched documents IDs
+        """
+        return 'django_learnit:%(name)s:prefetch' % {
+            'name': self.learning_model.get_name()
+        }
+
+    def get_prefetched_document_ids(self, exclude=()):
+        """
+        Returns the prefetched documents IDs of the session, refilling
+        them with the next unlabelled documents when empty. Returns an
+        empty list when prefetching is disabled or without session.
+        """
+        session = self.get_session()
+
+        if not self.learning_model.prefetch_size or session is None:
+            return []
+
+        key = self.get_prefetch_session_key()
+        document_ids = session.get(key)
+
+        if not document_ids:
+            document_ids = [
+                document_id for document_id in self.get_next_unlabelled_document_ids(
+                    self.learning_model.prefetch_size)
+                if document_id not in exclude
+            ]
+            session[key] = document_ids
+
+        return document_ids
+
+    def get_next_unlabelled_document_ids(self, count):
+        """
+        Returns up to `count` next unlabelled documents IDs to prefetch
+        """
+        documents = self.learning_model.get_next_unlabelled_documents(
+            annotator=self.get_annotator(),
+            count=count)
+
+        return [document.pk for document in documents]
+
+    def acquire_prefetched_document(self, document_id):
+        """
+        Returns whether the prefetched document is still unlabelled
+        and available for the annotator, leasing it when using leases
+        """
+        annotator = self.get_annotator()
+        document = self.learning_model.get_unlabelled_documents_queryset()\
+            .filter(pk=document_id)\
+            .first()
+
+        if document is None:
+            return False
+
+        if self.learning_model.lease_duration and annotator is not None:
+            return self.learning_model.acquire_lease(document, annotator)
+
+        return True
+
+    def pop_prefetched_document_id(self):
+        """
+        Pops the first prefetched document ID still unlabelled and available
+        for the annotator. Returns None when there is none.
+        """
+        document_ids = self.get_prefetched_document_ids()
+
+        while document_ids:
+            document_id = document_ids.pop(0)
+            self.get_session()[self.get_prefetch_session_key()] = document_ids
+
+            if self.acquire_prefetched_document(document_id):
+                return document_id
+
+        return None
+
+    def get_next_document_id(self):
+        """
+        Returns the next document ID to label, from the prefetched
+        documents when prefetching is enabled
+        """
+        document_id = self.pop_prefetched_document_id()
+
+        if document_id is None:
+            document_id = self.learning_model.get_next_unlabelled_document_id(
+                annotator=self.get_annotator())
+
+        return document_id
+
+    def get_document_url(self, document_id):
+        """
+        Returns the labelling url of the document
+        """
+        return reverse('django_learnit:document-labelling', kwargs={
+            'name': self.learning_model.get_name(),
+            'pk': document_id
+        })
+
     def get_random_unlabelled_document_url(self):
         """
-        Returns a random unlabelled document url for the learning model
+        Returns the next unlabelled document url for the learning model
         """
-        document = self.learning_model.get_random_unlabelled_document()
+        document_id = self.get_next_document_id()
 
-        if document:
-            url = reverse('django_learnit:document-labelling', kwargs={
-                'name': self.learning_model.get_name(),
-                'pk': document.pk
-            })
+        if document_id is not None:
+            url = self.get_document_url(document_id)
         else:
             # Maybe : add a message using django.contrib.messages
             url = reverse('django_learnit:learning-model-detail', kwargs={
@@ -72,6 +196,35 @@ class DocumentMixin(SingleObjectMixin):
         """
         return self.learning_model.get_queryset()
 
+    def get_document_cache(self):
+        """
+        Returns the document cache of the request
+        """
+        return get_request_document_cache(getattr(self, 'request', None))
+
+    def get_object(self, queryset=None):
+        """
+        Returns the document from the URL primary key through
+        the document cache
+        """
+        if queryset is None:
+            queryset = self.get_queryset()
+
+        pk = self.kwargs.get(self.pk_url_kwarg)
+
+        if pk is None:
+            return super(DocumentMixin, self).get_object(queryset)
+
+        try:
+            return self.get_document_cache().get_document(
+                queryset, pk,
+                version_field=self.learning_model.document_version_field,
+                timeout=self.learning_model.document_cache_timeout)
+        except queryset.model.DoesNotExist:
+            raise Http404(_("No %(verbose_name)s found matching the query") % {
+                'verbose_name': queryset.model._meta.verbose_name
+            })
+
 
 class LabelledDocumentFormMixin(object):
     """
@@ -90,18 +243,36 @@ class LabelledDocumentFormMixin(object):
 
         return context
 
+    def lease_document(self):
+        """
+        Leases the document to the annotator when the learning model
+        uses leases
+        """
+        annotator = self.get_annotator()
+
+        if self.learning_model.lease_duration and annotator is not None:
+            self.learning_model.acquire_lease(self.object, annotator)
+
     def get_initial(self):
         """
-        Returns the initial value for the document using
-        its related LabelledDocument
+        Returns the initial value for the document using its related
+        LabelledDocument, or its stored prediction when the learning
+        model uses prelabelling
         """
         initial = {}
+        model_name = self.learning_model.get_name()
 
         labelled_document = LabelledDocument.objects.get_for_document(
-            self.object, self.learning_model.get_name())
+            self.object, model_name)
 
         if labelled_document:
             initial = labelled_document.deserialize_value()
+        elif self.learning_model.prelabelling:
+            prediction = DocumentPrediction.objects.get_for_document(
+                self.object, model_name)
+
+            if prediction:
+                initial = prediction.deserialize_value()
 
         return initial
 
@@ -110,11 +281,17 @@ class LabelledDocumentFormMixin(object):
         Updates or creates the LabelledDocument instance with
         form data as the value.
         """
-        LabelledDocument.objects.update_or_create_for_document(
+        labelled_document, created = LabelledDocument.objects.update_or_create_for_document(
             document=self.object,
             model_name=self.learning_model.get_name(),
             value=LabelledDocument.serialize_value(form.cleaned_data))
 
+        if created:
+            self.learning_model.document_labelled(self.object)
+
+        if self.learning_model.lease_duration:
+            self.learning_model.release_lease(self.object)
+
         return super(LabelledDocumentFormMixin, self).form_valid(form)
 
 
@@ -124,6 +301,7 @@ class BaseLearningModelLabellingView(LearningModelMixin, DocumentMixin,
     def get(self, *args, **kwargs):
         self.learning_model = self.get_learning_model()
         self.object = self.get_object()
+        self.lease_document()
         return super(BaseLearningModelLabellingView, self).get(*args, **kwargs)
 
     def post(self, *args, **kwargs):
@@ -131,6 +309,18 @@ class BaseLearningModelLabellingView(LearningModelMixin, DocumentMixin,
         self.object = self.get_object()
         return super(BaseLearningModelLabellingView, self).post(*args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        """
+        Adds the next document url for the browser to prefetch
+        """
+        context = super(BaseLearningModelLabellingView, self).get_context_data(**kwargs)
+
+        prefetched_ids = self.get_prefetched_document_ids(exclude=(self.object.pk,))
+        if prefetched_ids:
+            context['next_document_url'] = self.get_document_url(prefetched_ids[0])
+
+        return context
+
     def get_success_url(self):
         return self.get_random_unlabelled_document_url()
 
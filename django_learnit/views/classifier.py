@@ -9,6 +9,8 @@ class GenericClassifierModelLabellingMixin(object):
     """
     Adds classes in context for a generic classifier model
     """
+    # Timeout in seconds of template fragments depending only on the classes
+    fragment_cache_timeout = 24 * 60 * 60
 
     def get_classes(self):
         """
@@ -22,6 +24,8 @@ class GenericClassifierModelLabellingMixin(object):
         """
         context = super(GenericClassifierModelLabellingMixin, self).get_context_data(**kwargs)
         context['classes'] = self.get_classes()
+        context['classes_hash'] = self.learning_model.get_classes_hash()
+        context['fragment_cache_timeout'] = self.fragment_cache_timeout
 
         return context
 
@@ -55,6 +59,7 @@ class ClassifierModelLabellingMixin(GenericClassifierModelLabellingMixin):
         """
         kwargs = super(ClassifierModelLabellingMixin, self).get_form_kwargs()
         kwargs['classes'] = self.get_classes()
+        kwargs['classes_metadata'] = self.learning_model.get_classes_metadata()
 
         return kwargs
 
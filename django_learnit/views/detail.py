@@ -1,5 +1,7 @@
 from django.views.generic import TemplateView
 
+from ..models import BuildRun
+
 from .base import LearningModelMixin
 
 
@@ -23,6 +25,18 @@ class LearningModelDetailView(LearningModelMixin, TemplateView):
             .get_labelled_documents_queryset()\
             .order_by('-modified')[:10]
 
+        # Add the last build run with its measured stages
+        last_build_run = BuildRun.objects\
+            .filter(model_name=self.learning_model.get_name(), kind=BuildRun.BUILD)\
+            .order_by('-started')\
+            .first()
+
+        context['last_build_run'] = last_build_run
+
+        if last_build_run:
+            context['last_build_stages'] = last_build_run.stages.all()
+            context['last_build_metrics'] = last_build_run.metrics.all()
+
         return context
 
     def get_template_names(self):
@@ -0,0 +1,295 @@
+from functools import reduce
+
+from django.contrib.contenttypes.models import ContentType
+from django.http import (
+    Http404,
+    HttpResponseRedirect)
+from django.core.urlresolvers import reverse
+from django.views.generic import TemplateView
+
+from ..compat import resolve_awaitable
+from ..forms.classifier import (
+    SingleLabelClassifierForm,
+    MultiLabelClassifierForm)
+from ..library import get_learning_model
+from ..models import (
+    DocumentPrediction,
+    LabelledDocument)
+
+from .base import (
+    DocumentMixin,
+    LearningModelMixin)
+from .ner import get_formset_class
+
+
+class MultiTaskLabellingView(LearningModelMixin, DocumentMixin, TemplateView):
+    """
+    Labels a document for several classifier and NER learning models at once.
+
+    Learning models are given as comma separated names in the URL and must
+    share the documents model. The document is fetched once, in the
+    intersection of the learning models querysets, and the labels of all
+    learning models are saved in a single transaction. Forms and formsets
+    are prefixed with the learning model name. The next document is picked
+    randomly in the intersection, among the documents unlabelled for any
+    of the learning models, and prefetched by learning models names.
+    """
+    template_name = 'django_learnit/labelling/multitask.html'
+
+    def get_learning_models(self):
+        """
+        Returns the learning models of the URL names.
+        Raises Http404 when one is not a registered classifier or NER model
+        or when they do not share the documents model.
+        """
+        learning_models = []
+
+        for name in self.kwargs['names'].split(','):
+            learning_model = get_learning_model(name)
+
+            if not learning_model or not (
+                    learning_model.is_classifier() or
+                    learning_model.is_named_entity_recognizer()):
+                raise Http404("Classifier or NER learning model `%(name)s` is not registered" % {
+                    'name': name
+                })
+
+            learning_models.append(learning_model)
+
+        document_models = set(
+            learning_model.get_queryset().model for learning_model in learning_models)
+
+        if len(document_models) > 1:
+            raise Http404("Learning models do not share documents")
+
+        return learning_models
+
+    def get_queryset(self):
+        """
+        Returns the documents of every learning model queryset
+        """
+        return reduce(
+            lambda a, b: a & b,
+            [learning_model.get_queryset() for learning_model in self.learning_models])
+
+    def get_unlabelled_documents_queryset(self):
+        """
+        Returns the documents of every learning model queryset unlabelled
+        for any of the learning models, and not leased to another annotator
+        """
+        annotator = self.get_annotator()
+
+        return self.get_queryset() & reduce(
+            lambda a, b: a | b,
+            [
+                learning_model.exclude_leased_documents(
+                    learning_model.get_unlabelled_documents_queryset(), annotator)
+                for learning_model in self.learning_models
+            ])
+
+    def get_prefetch_session_key(self):
+        """
+        Returns the session key of the prefetched documents IDs
+        of the learning models
+        """
+        return 'django_learnit:multitask:%(names)s:prefetch' % {
+            'names': self.kwargs['names']
+        }
+
+    def get_next_unlabelled_document_ids(self, count):
+        """
+        Returns up to `count` random unlabelled documents IDs
+        """
+        return list(
+            self.get_unlabelled_documents_queryset()
+                .order_by('?')
+                .values_list('pk', flat=True)[:count])
+
+    def acquire_prefetched_document(self, document_id):
+        """
+        Returns whether the prefetched document is still unlabelled
+        for any of the learning models and available for the annotator
+        """
+        return self.get_unlabelled_documents_queryset().filter(pk=document_id).exists()
+
+    def get_next_document_id(self):
+        """
+        Returns the next document ID to label, from the prefetched
+        documents when prefetching is enabled
+        """
+        document_id = self.pop_prefetched_document_id()
+
+        if document_id is None:
+            document_ids = self.get_next_unlabelled_document_ids(1)
+            document_id = document_ids[0] if document_ids else None
+
+        return document_id
+
+    def get_document_url(self, document_id):
+        """
+        Returns the multi-task labelling url of the document
+        """
+        return reverse('django_learnit:multitask-document-labelling', kwargs={
+            'names': self.kwargs['names'],
+            'pk': document_id
+        })
+
+    def get_initials(self):
+        """
+        Returns the initial value of each learning model from the labelled
+        documents, or the stored predictions when using prelabelling,
+        with a query per table
+        """
+        prelabelling_names = [
+            learning_model.get_name() for learning_model in self.learning_models
+            if learning_model.prelabelling
+        ]
+
+        lookup = {
+            'document_content_type': ContentType.objects.get_for_model(self.object),
+            'document_id': self.object.pk
+        }
+
+        initials = {}
+
+        if prelabelling_names:
+            predictions = DocumentPrediction.objects.filter(
+                model_name__in=prelabelling_names, **lookup)
+
+            for prediction in predictions:
+                initials[prediction.model_name] = prediction.deserialize_value()
+
+        labelled_documents = LabelledDocument.objects.filter(
+            model_name__in=[m.get_name() for m in self.learning_models], **lookup)
+
+        for labelled_document in labelled_documents:
+            initials[labelled_document.model_name] = labelled_document.deserialize_value()
+
+        return initials
+
+    def get_tokens(self, learning_model):
+        """
+        Returns the document tokens of the NER learning model, kept in
+        the document cache of the request and shared by the learning
+        models using the same tokenizer
+        """
+        return self.get_document_cache().get_tokens(
+            learning_model,
+            self.object,
+            lambda: resolve_awaitable(learning_model.get_tokens(self.object)),
+            timeout=learning_model.document_cache_timeout)
+
+    def get_ner_formset(self, learning_model, data, initial):
+        """
+        Returns the labels formset of the NER learning model, initialized
+        with the outside class when the initial labels do not match the
+        tokens. Each label form has its token as `token` attribute.
+        """
+        tokens = self.get_tokens(learning_model)
+
+        if not isinstance(initial, list) or len(initial) != len(tokens):
+            initial = [{'label': learning_model.outside_class}] * len(tokens)
+
+        formset = get_formset_class(learning_model)(
+            data=data,
+            prefix=learning_model.get_name(),
+            initial=initial,
+            n_tokens=len(tokens),
+            classes_metadata=learning_model.get_classes_metadata())
+
+        for label_form, token in zip(formset, tokens):
+            label_form.token = token
+
+        return formset
+
+    def get_forms(self):
+        """
+        Returns the (learning model, form or formset) pairs, prefixed
+        with the learning model name
+        """
+        initials = self.get_initials()
+        data = self.request.POST if self.request.method == 'POST' else None
+        forms = []
+
+        for learning_model in self.learning_models:
+            initial = initials.get(learning_model.get_name())
+
+            if learning_model.is_named_entity_recognizer():
+                forms.append((learning_model, self.get_ner_formset(
+                    learning_model, data, initial)))
+                continue
+
+            if learning_model.multilabel:
+                form_class = MultiLabelClassifierForm
+            else:
+                form_class = SingleLabelClassifierForm
+
+            forms.append((learning_model, form_class(
+                learning_model.get_classes(),
+                data=data,
+                prefix=learning_model.get_name(),
+                initial=initial or {},
+                classes_metadata=learning_model.get_classes_metadata())))
+
+        return forms
+
+    def lease_document(self):
+        """
+        Leases the document to the annotator for each learning model
+        using leases
+        """
+        annotator = self.get_annotator()
+
+        if annotator is None:
+            return
+
+        for learning_model in self.learning_models:
+            if learning_model.lease_duration:
+                learning_model.acquire_lease(self.object, annotator)
+
+    def get_context_data(self, **kwargs):
+        """
+        Adds the document and the learning models forms
+        """
+        context = super(MultiTaskLabellingView, self).get_context_data(**kwargs)
+        context['document'] = self.object
+        context['learning_models'] = self.learning_models
+        context['document_detail_template_name'] = 'django_learnit/document_labelling/%(name)s_detail.html' % {
+            'name': self.learning_model.get_name()
+        }
+
+        return context
+
+    def dispatch(self, request, *args, **kwargs):
+        self.learning_models = self.get_learning_models()
+        self.learning_model = self.learning_models[0]
+        return super(MultiTaskLabellingView, self).dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        self.lease_document()
+        return self.render_to_response(self.get_context_data(forms=self.get_forms()))
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        forms = self.get_forms()
+
+        if not all([form.is_valid() for learning_model, form in forms]):
+            return self.render_to_response(self.get_context_data(forms=forms))
+
+        results = LabelledDocument.objects.update_or_create_for_document_models(
+            self.object,
+            dict(
+                (learning_model.get_name(), LabelledDocument.serialize_value(form.cleaned_data))
+                for learning_model, form in forms))
+
+        for learning_model in self.learning_models:
+            labelled_document, created = results[learning_model.get_name()]
+
+            if created:
+                learning_model.document_labelled(self.object)
+
+            if learning_model.lease_duration:
+                learning_model.release_lease(self.object)
+
+        return HttpResponseRedirect(self.get_random_unlabelled_document_url())
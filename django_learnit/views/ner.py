@@ -3,17 +3,59 @@ from functools import (
     wraps)
 from django.forms import formset_factory
 
-from ..forms.ner import NamedEntityRecognizerForm
+from ..cache import get_request_document_cache
+from ..compat import resolve_awaitable
+from ..forms.ner import (
+    NamedEntityRecognizerForm,
+    NamedEntityRecognizerFormSet)
 
 from .base import BaseLearningModelLabellingView
 from .classifier import GenericClassifierModelLabellingMixin
 
 
+# Formset classes by learning model name and classes hash
+formset_classes = {}
+
+
+def get_formset_class(learning_model):
+    """
+    Returns the `NamedEntityRecognizerForm` formset of the learning model,
+    built once per learning model classes. The number of tokens is given
+    per instance in the formset kwargs.
+    """
+    key = (learning_model.get_name(), learning_model.get_classes_hash())
+
+    if key not in formset_classes:
+        formset_classes[key] = formset_factory(
+            wraps(NamedEntityRecognizerForm)(partial(
+                NamedEntityRecognizerForm,
+                classes=learning_model.get_classes(),
+                classes_metadata=learning_model.get_classes_metadata())),
+            formset=NamedEntityRecognizerFormSet,
+            extra=0)
+
+    return formset_classes[key]
+
+
 class NamedEntityRecognizerModelLabellingMixin(GenericClassifierModelLabellingMixin):
     """
     Mixin for a NER model document labelling
     """
 
+    def get_tokens(self):
+        """
+        Returns the document tokens from the learning model.
+
+        `get_tokens` may return an awaitable, e.g. when tokens come from an
+        async model server client, which is run to completion. Tokens are
+        kept in the document cache of the request.
+        """
+        return get_request_document_cache(getattr(self, 'request', None)).get_tokens(
+            self.learning_model,
+            self.object,
+            lambda: resolve_awaitable(self.learning_model.get_tokens(self.object)),
+            timeout=self.learning_model.document_cache_timeout)
+
     def get_context_data(self, **kwargs):
         """
         Adds document tokens in the context
@@ -27,15 +69,20 @@ class NamedEntityRecognizerModelLabellingMixin(GenericClassifierModelLabellingMi
 
     def get_form_class(self):
         """
-        Returns the `NamedEntityRecognizerForm` formset
+        Returns the `NamedEntityRecognizerForm` formset of the learning model
         """
-        n_tokens = len(self.tokens)
+        return get_formset_class(self.learning_model)
 
-        return formset_factory(
-            wraps(NamedEntityRecognizerForm)(partial(NamedEntityRecognizerForm, classes=self.get_classes())),
-            min_num=n_tokens,
-            max_num=n_tokens,
-            extra=0)
+    def get_form_kwargs(self):
+        """
+        Adds the number of tokens and the classes metadata
+        for the bulk validation of labels
+        """
+        kwargs = super(NamedEntityRecognizerModelLabellingMixin, self).get_form_kwargs()
+        kwargs['n_tokens'] = len(self.tokens)
+        kwargs['classes_metadata'] = self.learning_model.get_classes_metadata()
+
+        return kwargs
 
     def get_initial(self):
         """
@@ -57,11 +104,12 @@ class NamedEntityRecognizerModelLabellingView(NamedEntityRecognizerModelLabellin
     def get(self, *args, **kwargs):
         self.learning_model = self.get_learning_model()
         self.object = self.get_object()
-        self.tokens = self.learning_model.get_tokens(self.object)
+        self.tokens = self.get_tokens()
+        self.lease_document()
         return super(BaseLearningModelLabellingView, self).get(*args, **kwargs)
 
     def post(self, *args, **kwargs):
         self.learning_model = self.get_learning_model()
         self.object = self.get_object()
-        self.tokens = self.learning_model.get_tokens(self.object)
+        self.tokens = self.get_tokens()
         return super(BaseLearningModelLabellingView, self).post(*args, **kwargs)